@@ -140,6 +140,22 @@ class CNABBuilder:
             '--hidden-import=openpyxl.worksheet',
             '--hidden-import=tabulate',
             '--hidden-import=cnab_bradesco',
+            '--hidden-import=cnab_layout',
+            '--hidden-import=cnab_mapeado',
+            '--hidden-import=cnab_colunar',
+            '--hidden-import=cnab_moeda',
+            '--hidden-import=cnab_registro',
+            '--hidden-import=cnab_paralelo',
+            '--hidden-import=cnab_cache',
+            '--hidden-import=cnab_pontual',
+            '--hidden-import=cnab_diario',
+            '--hidden-import=cnab_transformacao',
+            '--hidden-import=cnab_montagem',
+            '--hidden-import=cnab_exportacao',
+            '--hidden-import=zerar_juros_lote',
+            '--hidden-import=cnab_verificacao',
+            '--hidden-import=cnab_manifesto',
+            '--hidden-import=monitorar_pasta',
             '--hidden-import=cnab_processor',
             '--hidden-import=processar_lote',
             '--exclude-module=tkinter',
@@ -179,6 +195,22 @@ class CNABBuilder:
             '--hidden-import=pandas._libs.tslibs.timedeltas',
             '--hidden-import=openpyxl.cell',
             '--hidden-import=cnab_bradesco',
+            '--hidden-import=cnab_layout',
+            '--hidden-import=cnab_mapeado',
+            '--hidden-import=cnab_colunar',
+            '--hidden-import=cnab_moeda',
+            '--hidden-import=cnab_registro',
+            '--hidden-import=cnab_paralelo',
+            '--hidden-import=cnab_cache',
+            '--hidden-import=cnab_pontual',
+            '--hidden-import=cnab_diario',
+            '--hidden-import=cnab_transformacao',
+            '--hidden-import=cnab_montagem',
+            '--hidden-import=cnab_exportacao',
+            '--hidden-import=zerar_juros_lote',
+            '--hidden-import=cnab_verificacao',
+            '--hidden-import=cnab_manifesto',
+            '--hidden-import=monitorar_pasta',
             '--hidden-import=cnab_processor',
             '--hidden-import=processar_lote',
             '--exclude-module=matplotlib',
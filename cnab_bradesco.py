@@ -1,183 +1,328 @@
 import pandas as pd
+from openpyxl import Workbook
 from tabulate import tabulate
+import csv
 import os
 import re
 from datetime import datetime
 import locale
+import multiprocessing
+from itertools import repeat
+
+import numpy as np
+
+from cnab_layout import (decodificar_header, decodificar_detalhe, decodificar_trailer, formatar_data,
+                         registro_em_reais, decodificar_texto, CODIFICACAO_PADRAO, TAMANHO_REGISTRO,
+                         TIPOS_COBRANCA, LAYOUT_DETALHE, ZERADO)
+from cnab_moeda import (formatar_centavos, reais_para_centavos, multiplicar_centavos,
+                        centavos_para_campo)
+from cnab_mapeado import LeitorMapeado
+from cnab_colunar import (ler_colunar, colunas_para_dataframe, decodificar_registros, localizar_linhas,
+                          montar_matriz, decodificar_inteiros, decodificar_textos)
+from cnab_registro import carregar_registros
+from cnab_paralelo import ler_colunar_paralelo, LIMITE_LEITURA_PARALELA
+from cnab_cache import CacheLeitura, carregar_registros_em_cache, ler_colunar_em_cache
+from cnab_pontual import zerar_juros_no_local, zerar_juros_em_bytes
+from cnab_diario import DiarioEdicoes
+from cnab_transformacao import (transformar_arquivo, CodigoEmpresaHeader, EdicoesPontuais, ZerarJuros,
+                                TerminadorFixo, RecalcularTrailer)
+from cnab_montagem import MODELO_HEADER, MODELO_DETALHE, MODELO_TRAILER, TotaisCobranca
+from cnab_verificacao import verificar_edicao
+
+# Quantidade de títulos por bloco de tabela exibido em gerar_relatorio
+TAMANHO_BLOCO_RELATORIO = 1000
+
+# Código da empresa TC SECURITIZADORA gravado no header dos arquivos editados
+CODIGO_EMPRESA_TC = "00000000036846335521TC"
+
+# Posições e tipo de cada campo do detalhe na leitura (comparação com o Excel em excel_para_cnab)
+LEITURA_DETALHE = {nome: (inicio, fim, tipo) for nome, inicio, fim, tipo in LAYOUT_DETALHE}
+
+# Valores gravados em centavos ao reconstruir um detalhe alterado
+CAMPOS_MONETARIOS_RECONSTRUCAO = ('valor_titulo', 'valor_tarifa', 'valor_iof', 'valor_abatimento', 'descontos',
+                                  'valor_principal', 'juros_mora_multa', 'outros_creditos')
+
+
+def _converter_valores_distintos(coluna, converter):
+    """Aplica 'converter' uma única vez a cada valor distinto da coluna (células vazias: converter(None))"""
+    codigos, distintos = pd.factorize(coluna)
+    convertidos = np.empty(len(distintos) + 1, dtype=object)
+    convertidos[:] = [converter(valor) for valor in distintos] + [converter(None)]
+    return convertidos[codigos]  # Código -1 (vazio) aponta para o último
+
+
+def _inteiro_ou_none(valor):
+    try:
+        return int(str(valor).strip())
+    except (ValueError, TypeError):
+        return None
+
+
+def _normalizar_campo(coluna):
+    """Textos sem espaços nas pontas e, quando só de dígitos, sem zeros à esquerda ('' para zero ou vazio)"""
+    textos = np.char.strip(np.asarray(coluna, dtype=str))
+    return np.where(np.char.isdigit(textos), np.char.lstrip(textos, '0'), textos)
+
+
+def _posicoes_por_chave(chaves_referencia, chaves, invalida):
+    """
+    Para cada chave, a posição da linha da referência com a mesma chave, ou -1
+    se não houver nenhuma, se houver mais de uma ou se a chave for 'invalida'.
+    """
+    indice = pd.Index(chaves_referencia)
+    unicas = np.flatnonzero(~indice.duplicated(keep=False) & (chaves_referencia != invalida))
+    if unicas.size == 0:
+        return np.full(len(chaves), -1, dtype=np.int64)
+    encontradas = indice[unicas].get_indexer(chaves)
+    return np.where(encontradas >= 0, unicas[encontradas], -1)
+
+
+def _campo_centavos_coluna(centavos, largura):
+    """Versão vetorizada de centavos_para_campo: dígitos com zeros à esquerda para cada valor"""
+    textos = np.char.zfill(centavos.astype(str), largura)
+    excedentes = np.flatnonzero(np.char.str_len(textos) > largura)
+    if excedentes.size:
+        raise ValueError(f"Valor {formatar_centavos(centavos[excedentes[0]])} não cabe em {largura} posições")
+    return textos
+
 
 class CNABBradesco:
-    def __init__(self, arquivo):
+    def __init__(self, arquivo, codificacao=CODIFICACAO_PADRAO, usar_cache=False):
         self.arquivo = arquivo
+        self.codificacao = codificacao  # Campos de texto; bytes inválidos nela são lidos como cp1252
+        # Cache em disco das leituras (cnab_cache.py): guarda dados do retorno sem criptografia, só se pedido
+        self.cache = CacheLeitura() if usar_cache else None
+        self.diario = DiarioEdicoes()  # Edições pontuais pendentes (cnab_diario.py)
         self.header = None
         self.detalhes = []
         self.trailer = None
-        self.linhas_originais = []
+        self.leitor_mapeado = None
+        self.df_detalhes = None  # Detalhes lidos por ler_arquivo_paralelo (sem linha_original)
+        self._dados_exportacao = None  # Conteúdo do arquivo lido por ler_para_exportacao
         
     def ler_arquivo(self):
-        """Lê o arquivo CNAB 400 do Bradesco"""
+        """
+        Lê o arquivo CNAB 400 do Bradesco.
+        
+        Os detalhes são objetos RegistroDetalhe (cnab_registro.py): guardam apenas a
+        posição da linha no buffer do arquivo e decodificam cada campo no primeiro
+        acesso, mas podem ser usados como dicionários. Um arquivo já lido antes é
+        carregado do cache em disco, sem percorrer as linhas novamente.
+        """
         try:
-            with open(self.arquivo, 'r', encoding='utf-8') as file:
-                self.linhas_originais = file.readlines()
-                
-            if not self.linhas_originais:
+            if self.cache is not None:
+                header, detalhes, trailer = carregar_registros_em_cache(self.arquivo, self.codificacao, self.cache)
+            else:
+                header, detalhes, trailer = carregar_registros(self.arquivo, self.codificacao)
+            self.detalhes = detalhes
+            self.df_detalhes = None
+            if header is not None:
+                self.header = header
+            if trailer is not None:
+                self.trailer = trailer
+                    
+            if header is None and trailer is None and not detalhes:
                 print("Arquivo vazio.")
                 return False
-                
-            # Processa o header (registro tipo 0)
-            for linha in self.linhas_originais:
-                # Remover quebras de linha e garantir que a linha tenha pelo menos 1 caractere
-                linha = linha.strip()
-                if not linha:
-                    continue
-                    
-                if linha.startswith('0'):
-                    self.header = self._processar_header(linha)
-                elif linha.startswith('1'):
-                    self.detalhes.append(self._processar_detalhe(linha))
-                elif linha.startswith('9'):
-                    self.trailer = self._processar_trailer(linha)
                     
             return True
         except Exception as e:
             print(f"Erro ao ler o arquivo: {str(e)}")
             return False
+
+    def ler_arquivo_mapeado(self):
+        """
+        Abre o arquivo CNAB mapeado em memória (mmap), sem ler as linhas para str.
+        
+        Apenas header e trailer são decodificados; os detalhes ficam acessíveis em
+        self.leitor_mapeado e cada campo é decodificado somente quando solicitado,
+        por exemplo: self.leitor_mapeado.campo(indice, 'valor_titulo').
+        """
+        try:
+            self.fechar_mapeamento()
+            leitor = LeitorMapeado(self.arquivo, self.codificacao)
+            
+            if len(leitor) == 0:
+                leitor.fechar()
+                print("Arquivo vazio.")
+                return False
+            
+            tipos = leitor.tipos()
+            indice_header = tipos.rfind(b'0')
+            indice_trailer = tipos.rfind(b'9')
+            if indice_header != -1:
+                self.header = self._processar_header(leitor.linha(indice_header))
+            if indice_trailer != -1:
+                self.trailer = self._processar_trailer(leitor.linha(indice_trailer))
+            
+            self.leitor_mapeado = leitor
+            return True
+        except Exception as e:
+            print(f"Erro ao ler o arquivo: {str(e)}")
+            return False
+
+    def ler_arquivo_paralelo(self, processos=None):
+        """
+        Lê um arquivo muito grande dividindo a decodificação entre processos.
+        
+        Os detalhes ficam em self.df_detalhes (DataFrame, sem 'linha_original'),
+        na ordem do arquivo; relatório e exportações os utilizam normalmente.
+        """
+        try:
+            header, colunas, trailer = self._ler_colunas(paralelo=True, processos=processos)
+            self.detalhes = []
+            self.df_detalhes = colunas_para_dataframe(colunas)
+            self.header = header
+            self.trailer = trailer
+            
+            if header is None and trailer is None and self.df_detalhes.empty:
+                print("Arquivo vazio.")
+                return False
+            
+            return True
+        except Exception as e:
+            print(f"Erro ao ler o arquivo: {str(e)}")
+            return False
+
+    def ler_arquivo_automatico(self):
+        """Usa ler_arquivo_paralelo() para arquivos acima de LIMITE_LEITURA_PARALELA e ler_arquivo() nos demais"""
+        if os.path.getsize(self.arquivo) >= LIMITE_LEITURA_PARALELA:
+            return self.ler_arquivo_paralelo()
+        return self.ler_arquivo()
+
+    def fechar_mapeamento(self):
+        """Libera o arquivo aberto por ler_arquivo_mapeado()"""
+        if self.leitor_mapeado is not None:
+            self.leitor_mapeado.fechar()
+            self.leitor_mapeado = None
+
+    def dataframe_detalhes(self, incluir_linha_original=True):
+        """
+        Retorna os detalhes como DataFrame.
+        
+        Sem alterações pendentes, o DataFrame é montado pela leitura colunar (NumPy)
+        do arquivo, sem criar um dicionário por registro, em paralelo para arquivos
+        acima de LIMITE_LEITURA_PARALELA; se houver registros alterados em
+        self.detalhes, eles são usados para refletir as edições.
+        """
+        if any(detalhe.get('_alterado', False) for detalhe in self.detalhes):
+            df = pd.DataFrame(self.detalhes)
+            if not incluir_linha_original and 'linha_original' in df.columns:
+                df = df.drop('linha_original', axis=1)
+            return df
+        
+        if self.df_detalhes is not None and not incluir_linha_original:
+            return self.df_detalhes
+        
+        header, colunas, trailer = self._ler_colunas(
+            paralelo=os.path.getsize(self.arquivo) >= LIMITE_LEITURA_PARALELA,
+            incluir_linha_original=incluir_linha_original)
+        if self.header is None:
+            self.header = header
+        if self.trailer is None:
+            self.trailer = trailer
+        return colunas_para_dataframe(colunas)
+
+    def _ler_colunas(self, paralelo=False, incluir_linha_original=False, processos=None, dados=None):
+        """
+        Leitura colunar (em paralelo, se pedido), consultando antes o cache em disco.
+        'dados' é o conteúdo do arquivo, se já tiver sido lido (a leitura sequencial o aproveita).
+        """
+        leitor = None  # No cache, a leitura sequencial aproveita os bytes já lidos para o hash
+        if paralelo:
+            def leitor(caminho, incluir_linha_original=False, codificacao=self.codificacao):
+                return ler_colunar_paralelo(caminho, incluir_linha_original, processos, codificacao)
+
+        if self.cache is not None:
+            return ler_colunar_em_cache(self.arquivo, incluir_linha_original, self.codificacao,
+                                        cache=self.cache, leitor=leitor, dados=dados)
+        if leitor is None and dados is not None:
+            return decodificar_registros(np.frombuffer(dados, dtype=np.uint8), incluir_linha_original,
+                                         codificacao=self.codificacao)
+        return (leitor or ler_colunar)(self.arquivo, incluir_linha_original=incluir_linha_original,
+                                       codificacao=self.codificacao)
+
+    def iter_registros(self, arquivo=None):
+        """
+        Gera os registros do arquivo um a um, como tuplas (tipo, registro).
+        
+        Aceita um arquivo já aberto em modo texto ou binário; se omitido, abre
+        self.arquivo em modo binário e cada linha é decodificada com self.codificacao.
+        Apenas a linha corrente fica em memória, qualquer que seja o tamanho do arquivo.
+        """
+        if arquivo is None:
+            with open(self.arquivo, 'rb') as file:
+                yield from self.iter_registros(file)
+            return
+        
+        processar_header = self._processar_header
+        processar_detalhe = self._processar_detalhe
+        processar_trailer = self._processar_trailer
+        codificacao = self.codificacao
+        
+        for linha in arquivo:
+            if isinstance(linha, bytes):
+                linha = decodificar_texto(linha, codificacao)
+            # Remover quebras de linha e ignorar linhas vazias
+            linha = linha.strip()
+            if not linha:
+                continue
+            
+            tipo = linha[0]
+            if tipo == '1':
+                yield tipo, processar_detalhe(linha)
+            elif tipo == '0':
+                yield tipo, processar_header(linha)
+            elif tipo == '9':
+                yield tipo, processar_trailer(linha)
+
+    def iter_detalhes(self, arquivo=None):
+        """
+        Gera apenas os registros de detalhe (tipo 1), um a um.
+        
+        O header e o trailer encontrados durante a leitura são guardados em
+        self.header e self.trailer (o header fica disponível já no primeiro detalhe).
+        """
+        for tipo, registro in self.iter_registros(arquivo):
+            if tipo == '1':
+                yield registro
+            elif tipo == '0':
+                self.header = registro
+            else:
+                self.trailer = registro
+
+    def _fonte_detalhes(self):
+        """Retorna os detalhes carregados por ler_arquivo() ou, se não houver, lê o arquivo em streaming"""
+        if self.detalhes:
+            return self.detalhes
+        if self.df_detalhes is not None:
+            return self._iter_dataframe(self.df_detalhes)
+        return self.iter_detalhes()
+
+    def _iter_dataframe(self, df):
+        """Gera as linhas do DataFrame como dicionários, convertendo um bloco por vez"""
+        for inicio in range(0, len(df), TAMANHO_BLOCO_RELATORIO):
+            yield from df.iloc[inicio:inicio + TAMANHO_BLOCO_RELATORIO].to_dict('records')
             
     def _processar_header(self, linha):
         """Processa a linha de header (tipo 0)"""
-        # Garantir que a linha seja tratada mesmo se não tiver o tamanho padrão
-        sequencial = linha[394:400] if len(linha) >= 400 else ""
-        data_credito = linha[379:385] if len(linha) >= 385 else ""
-        
-        return {
-            'tipo_registro': linha[0:1],
-            'codigo_retorno': linha[1:2],
-            'literal_retorno': linha[2:9],
-            'codigo_servico': linha[9:11],
-            'literal_servico': linha[11:26],
-            'codigo_empresa': linha[26:46],
-            'nome_empresa': linha[46:76],
-            'codigo_banco': linha[76:79],
-            'nome_banco': linha[79:94],
-            'data_geracao': linha[94:100],
-            'densidade': linha[100:108] if len(linha) >= 108 else "",
-            'numero_aviso_bancario': linha[108:113] if len(linha) >= 113 else "",
-            'data_credito': data_credito,
-            'sequencial': sequencial,
-            'linha_original': linha
-        }
+        return decodificar_header(linha)
         
     def _processar_detalhe(self, linha):
         """Processa as linhas de detalhe (tipo 1)"""
-        # Verificar se a linha tem tamanho suficiente para cada campo
-        # Para campos obrigatórios, usar um valor padrão se não existir
-        
-        data_ocorrencia = linha[110:116] if len(linha) >= 116 else ""
-        data_vencimento = linha[146:152] if len(linha) >= 152 else ""
-        data_credito = linha[295:301] if len(linha) >= 301 else ""
-        sequencial = linha[394:400] if len(linha) >= 400 else ""
-        
-        # Calcular o valor do título de forma segura
-        if len(linha) >= 165:
-            try:
-                valor_titulo = float(linha[152:165]) / 100
-            except ValueError:
-                valor_titulo = 0.0
-        else:
-            valor_titulo = 0.0
-        
-        # Valores adicionais de forma segura
-        valor_tarifa = float(linha[175:188]) / 100 if len(linha) >= 188 else 0.0
-        valor_iof = float(linha[188:201]) / 100 if len(linha) >= 201 else 0.0
-        valor_abatimento = float(linha[227:240]) / 100 if len(linha) >= 240 else 0.0
-        descontos = float(linha[240:253]) / 100 if len(linha) >= 253 else 0.0
-        outros_creditos = float(linha[279:292]) / 100 if len(linha) >= 292 else 0.0
-        
-        return {
-            'tipo_registro': linha[0:1],
-            'codigo_inscricao': linha[1:3] if len(linha) >= 3 else "",
-            'numero_inscricao': linha[3:17] if len(linha) >= 17 else "",
-            'codigo_empresa': linha[20:37] if len(linha) >= 37 else "",
-            'nosso_numero': linha[70:82] if len(linha) >= 82 else "",
-            'nosso_numero_2': linha[134:146] if len(linha) >= 146 else "",  # Segundo campo nosso número
-            'carteira': linha[107:109] if len(linha) >= 109 else "",
-            'data_ocorrencia': self._formatar_data(data_ocorrencia) if data_ocorrencia.strip() else "",
-            'seu_numero': linha[116:126] if len(linha) >= 126 else "",
-            'data_vencimento': self._formatar_data(data_vencimento) if data_vencimento.strip() else "",
-            'valor_titulo': valor_titulo,
-            'banco_cobrador': linha[165:168] if len(linha) >= 168 else "",
-            'agencia_cobradora': linha[168:173] if len(linha) >= 173 else "",
-            'especie': linha[173:175] if len(linha) >= 175 else "",
-            'valor_tarifa': valor_tarifa,
-            'valor_iof': valor_iof,
-            'valor_abatimento': valor_abatimento,
-            'descontos': descontos,
-            'valor_principal': valor_titulo,  # Usando o mesmo valor do título
-            'juros_mora_multa': 0.0,  # Juros zerados conforme solicitado
-            'outros_creditos': outros_creditos,
-            'data_credito': self._formatar_data(data_credito) if data_credito.strip() else "",
-            'motivo_ocorrencia': linha[318:328] if len(linha) >= 328 else "",
-            'sequencial': sequencial,
-            'linha_original': linha
-        }
+        return decodificar_detalhe(linha)
         
     def _processar_trailer(self, linha):
         """Processa a linha de trailer (tipo 9)"""
-        # Valores tratados de forma segura
-        sequencial = linha[394:400] if len(linha) >= 400 else ""
-        
-        # Verificar se os campos numéricos existem
-        try:
-            valor_total_simples = float(linha[25:39]) / 100 if len(linha) >= 39 else 0.0
-        except ValueError:
-            valor_total_simples = 0.0
-            
-        try:
-            valor_total_vinculado = float(linha[47:61]) / 100 if len(linha) >= 61 else 0.0
-        except ValueError:
-            valor_total_vinculado = 0.0
-            
-        try:
-            valor_total_caucao = float(linha[69:83]) / 100 if len(linha) >= 83 else 0.0
-        except ValueError:
-            valor_total_caucao = 0.0
-            
-        try:
-            valor_total_descontado = float(linha[91:105]) / 100 if len(linha) >= 105 else 0.0
-        except ValueError:
-            valor_total_descontado = 0.0
-        
-        return {
-            'tipo_registro': linha[0:1],
-            'retorno': linha[1:2] if len(linha) >= 2 else "",
-            'tipo_registro_1': linha[2:4] if len(linha) >= 4 else "",
-            'qtd_titulos_simples': linha[17:25] if len(linha) >= 25 else "0",
-            'valor_total_simples': valor_total_simples,
-            'qtd_titulos_vinculado': linha[39:47] if len(linha) >= 47 else "0",
-            'valor_total_vinculado': valor_total_vinculado,
-            'qtd_titulos_caucao': linha[61:69] if len(linha) >= 69 else "0",
-            'valor_total_caucao': valor_total_caucao,
-            'qtd_titulos_descontado': linha[83:91] if len(linha) >= 91 else "0",
-            'valor_total_descontado': valor_total_descontado,
-            'sequencial': sequencial,
-            'linha_original': linha
-        }
+        return decodificar_trailer(linha)
 
     def _formatar_data(self, data_str):
         """Converte a data do formato DDMMAA para DD/MM/AAAA"""
-        if not data_str or data_str.strip() == '':
-            return ""
-        try:
-            data = datetime.strptime(data_str, '%d%m%y')
-            return data.strftime('%d/%m/%Y')
-        except ValueError:
-            return data_str
+        return formatar_data(data_str)
             
     def formatar_moeda(self, valor):
-        """Formata um valor para o padrão monetário brasileiro"""
-        try:
-            return f"R$ {valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
-        except (ValueError, TypeError):
-            return "R$ 0,00"
+        """Formata um valor em centavos para o padrão monetário brasileiro"""
+        return formatar_centavos(valor)
         
     def gerar_cnab_retorno(self, caminho_saida):
         """Gera um novo arquivo CNAB sem juros/multa para retorno ao banco (método seguro)"""
@@ -187,35 +332,33 @@ class CNABBradesco:
         except Exception as e:
             return False, f"Erro ao gerar arquivo CNAB: {str(e)}"
 
-    def _zerar_juros_arquivo_completo(self, caminho_saida):
+    def _zerar_juros_arquivo_completo(self, caminho_saida, dados=None):
         """
         Zera juros/multa em todo o arquivo de forma segura, como um editor de texto.
         Altera apenas as posições 266-279 de cada linha de detalhe.
+        
+        Sempre que o resultado for idêntico, o arquivo é copiado e só esses bytes
+        são sobrescritos na cópia (cnab_pontual.py); caso contrário (quebras CRLF,
+        linhas curtas...), o arquivo é reescrito em uma passagem (cnab_transformacao.py),
+        com os detalhes completados até 400 posições e gravados com quebra LF.
+        'dados' é o conteúdo do arquivo, se já tiver sido lido (não é lido de novo).
         """
         try:
-            # Ler o arquivo original como texto, preservando encoding
-            with open(self.arquivo, 'r', encoding='utf-8', newline='') as arquivo_original:
-                linhas_originais = arquivo_original.readlines()
-            
-            # Criar lista de linhas editadas
-            linhas_editadas = []
-            linhas_processadas = 0
-            
-            for linha in linhas_originais:
-                linha_editada = linha
-                
-                # Verificar se é uma linha de detalhe (tipo 1) e zerar juros
-                if linha.strip() and linha[0] == '1':
-                    linha_editada = self._zerar_juros_pontual(linha)
-                    linhas_processadas += 1
-                
-                linhas_editadas.append(linha_editada)
-            
-            # Salvar arquivo editado preservando formato original
-            with open(caminho_saida, 'w', encoding='utf-8', newline='') as arquivo_saida:
-                arquivo_saida.writelines(linhas_editadas)
+            if dados is None:
+                registros = zerar_juros_no_local(self.arquivo, caminho_saida, self.codificacao)
+            else:
+                registros = None
+                resultado = zerar_juros_em_bytes(dados, self.codificacao)
+                if resultado is not None:
+                    conteudo, registros = resultado
+                    with open(caminho_saida, 'wb') as arquivo_saida:
+                        arquivo_saida.write(conteudo)
+            if registros is None:
+                juros = ZerarJuros()
+                transformar_arquivo(self.arquivo, caminho_saida, [juros, TerminadorFixo(b'\n')], dados=dados)
+                registros = juros.registros
             
-            return True, f"Arquivo CNAB gerado com sucesso: {caminho_saida}\nJuros/multa zerados em {linhas_processadas} registro(s)"
+            return True, f"Arquivo CNAB gerado com sucesso: {caminho_saida}\nJuros/multa zerados em {registros} registro(s)"
             
         except Exception as e:
             return False, f"Erro ao gerar arquivo CNAB: {str(e)}"
@@ -223,57 +366,114 @@ class CNABBradesco:
     def exportar_para_excel(self, caminho_saida):
         """Exporta os dados para um arquivo Excel"""
         try:
-            # Criar DataFrame com os detalhes
-            df = pd.DataFrame(self.detalhes)
+            # Pasta em modo de escrita contínua: as linhas vão direto para o arquivo
+            pasta = Workbook(write_only=True)
+            planilha = pasta.create_sheet('Detalhes')
             
-            # Remover colunas que não precisam ser exportadas
-            if 'linha_original' in df.columns:
-                df = df.drop('linha_original', axis=1)
-            
-            # Definir o escritor Excel
-            writer = pd.ExcelWriter(caminho_saida, engine='openpyxl')
+            colunas = None
+            qtd_titulos = 0
+            valor_total = 0
             
-            # Salvar a planilha principal
-            df.to_excel(writer, sheet_name='Detalhes', index=False)
+            for detalhe in self._fonte_detalhes():
+                if colunas is None:
+                    # Remover colunas que não precisam ser exportadas
+                    colunas = [col for col in detalhe if col != 'linha_original']
+                    planilha.append(colunas)
+                # Valores em centavos são convertidos para reais apenas na exportação
+                em_reais = registro_em_reais(detalhe)
+                planilha.append([em_reais.get(col) for col in colunas])
+                qtd_titulos += 1
+                valor_total += detalhe['valor_principal']
             
             # Criar uma planilha de resumo
-            resumo_data = {
-                'Informação': [
-                    'Banco',
-                    'Empresa',
-                    'Data de Geração',
-                    'Data de Crédito',
-                    'Total de Títulos',
-                    'Valor Total'
-                ],
-                'Valor': [
-                    f"{self.header['codigo_banco']} - {self.header['nome_banco']}",
-                    self.header['nome_empresa'].strip(),
-                    self._formatar_data(self.header['data_geracao']),
-                    self._formatar_data(self.header['data_credito']) if self.header['data_credito'].strip() else "",
-                    len(self.detalhes),
-                    self.formatar_moeda(sum(detalhe['valor_principal'] for detalhe in self.detalhes))
-                ]
-            }
-            
-            df_resumo = pd.DataFrame(resumo_data)
-            df_resumo.to_excel(writer, sheet_name='Resumo', index=False)
+            resumo = pasta.create_sheet('Resumo')
+            resumo.append(['Informação', 'Valor'])
+            resumo.append(['Banco', f"{self.header['codigo_banco']} - {self.header['nome_banco']}"])
+            resumo.append(['Empresa', self.header['nome_empresa'].strip()])
+            resumo.append(['Data de Geração', self._formatar_data(self.header['data_geracao'])])
+            resumo.append(['Data de Crédito', self._formatar_data(self.header['data_credito']) if self.header['data_credito'].strip() else ""])
+            resumo.append(['Total de Títulos', qtd_titulos])
+            resumo.append(['Valor Total', self.formatar_moeda(valor_total)])
             
             # Salvar o arquivo
-            writer.close()
+            pasta.save(caminho_saida)
             
             return True, f"Dados exportados para Excel: {caminho_saida}"
         except Exception as e:
             return False, f"Erro ao exportar para Excel: {str(e)}"
 
+    def exportar_para_csv(self, caminho_saida):
+        """Exporta os detalhes para um arquivo CSV separado por ponto e vírgula"""
+        try:
+            with open(caminho_saida, 'w', encoding='utf-8', newline='') as arquivo_csv:
+                escritor = None
+                
+                for detalhe in self._fonte_detalhes():
+                    if escritor is None:
+                        colunas = [col for col in detalhe if col != 'linha_original']
+                        escritor = csv.DictWriter(arquivo_csv, fieldnames=colunas, delimiter=';',
+                                                  extrasaction='ignore')
+                        escritor.writeheader()
+                    escritor.writerow(registro_em_reais(detalhe))
+            
+            return True, f"Dados exportados para CSV: {caminho_saida}"
+        except Exception as e:
+            return False, f"Erro ao exportar para CSV: {str(e)}"
+
+    def ler_para_exportacao(self, paralelo=None, dados=None):
+        """
+        Lê o arquivo uma única vez para exportar(): o conteúdo fica guardado para os
+        destinos que o regravam e os detalhes são decodificados pela leitura colunar
+        (com o cache em disco, se ativo) para self.df_detalhes, sem 'linha_original'.
+        Acima de LIMITE_LEITURA_PARALELA a decodificação é dividida entre processos,
+        a menos que 'paralelo' seja informado (ex.: False quando já se está em um
+        processo de um lote paralelo). 'dados' é o conteúdo do arquivo, se já tiver
+        sido lido (o arquivo não é lido de novo). Retorna o DataFrame dos detalhes.
+        """
+        if dados is None:
+            with open(self.arquivo, 'rb') as arquivo:
+                dados = arquivo.read()
+        if paralelo is None:
+            paralelo = len(dados) >= LIMITE_LEITURA_PARALELA
+        header, colunas, trailer = self._ler_colunas(paralelo=paralelo, dados=dados)
+        self._dados_exportacao = dados
+        self.detalhes = []
+        self.df_detalhes = colunas_para_dataframe(colunas)
+        self.header = header
+        self.trailer = trailer
+        return self.df_detalhes
+
+    def exportar(self, destinos):
+        """
+        Alimenta todos os destinos (cnab_exportacao.py: CSV, Excel, retorno sem juros,
+        resumo JSON...) a partir de uma única leitura do arquivo; ver ler_para_exportacao().
+        
+        Retorna a lista de (bool, mensagem) de cada destino, na ordem informada; a
+        falha de um destino não impede os demais.
+        """
+        if self._dados_exportacao is None:
+            self.ler_para_exportacao()
+        try:
+            return [destino.exportar(self, self._dados_exportacao) for destino in destinos]
+        finally:
+            self._dados_exportacao = None  # O conteúdo do arquivo não fica retido após a exportação
+
     def gerar_relatorio(self):
         """Gera um relatório baseado nos dados processados"""
-        if not self.header or not self.detalhes:
-            print("Não há dados para gerar relatório. Execute ler_arquivo() primeiro.")
+        # Primeira passagem: totais (no modo streaming também carrega header e trailer)
+        qtd_titulos = 0
+        valor_total = 0
+        try:
+            for detalhe in self._fonte_detalhes():
+                qtd_titulos += 1
+                valor_total += detalhe['valor_principal']
+        except OSError as e:
+            print(f"Erro ao ler o arquivo: {str(e)}")
+            return
+        
+        if not self.header or not qtd_titulos:
+            print("Não há dados para gerar relatório. Verifique o arquivo informado.")
             return
-            
-        # Criar DataFrame com os detalhes
-        df = pd.DataFrame(self.detalhes)
         
         # Informações do header
         print("\n===== INFORMAÇÕES DO ARQUIVO =====")
@@ -285,49 +485,75 @@ class CNABBradesco:
         
         # Resumo dos detalhes
         print("\n===== RESUMO DE TÍTULOS =====")
-        print(f"Total de títulos: {len(self.detalhes)}")
-        
-        valor_total = sum(detalhe['valor_principal'] for detalhe in self.detalhes)
+        print(f"Total de títulos: {qtd_titulos}")
         print(f"Valor total dos títulos: {self.formatar_moeda(valor_total)}")
         
-        # Detalhes dos títulos
+        # Detalhes dos títulos, exibidos em blocos para não montar a tabela inteira em memória
         print("\n===== DETALHES DOS TÍTULOS =====")
         colunas_exibir = ['nosso_numero', 'seu_numero', 'data_ocorrencia', 
                          'data_vencimento', 'valor_titulo', 'valor_principal', 
                          'juros_mora_multa', 'data_credito']
-                         
-        if not df.empty:
-            # Formatar colunas monetárias antes de exibir
-            for col in ['valor_titulo', 'valor_principal', 'juros_mora_multa']:
-                if col in df.columns:
-                    df[col] = df[col].apply(lambda x: self.formatar_moeda(x) if pd.notnull(x) else "")
-            
-            df_exibir = df[colunas_exibir]
-            print(tabulate(df_exibir, headers='keys', tablefmt='psql', showindex=False))
-            
-            # Salvar em CSV e Excel
-            nome_arquivo = os.path.basename(self.arquivo)
-            nome_base = re.sub(r'\.TXT$', '', nome_arquivo, flags=re.IGNORECASE)
-            
-            # Para o CSV, usamos os valores originais (não formatados)
-            df_original = pd.DataFrame(self.detalhes)
-            if 'linha_original' in df_original.columns:
-                df_original = df_original.drop('linha_original', axis=1)
-                
-            df_original.to_csv(f"{nome_base}_processado.csv", index=False, sep=';')
+        colunas_monetarias = {'valor_titulo', 'valor_principal', 'juros_mora_multa'}
+        
+        bloco = []
+        for detalhe in self._fonte_detalhes():
+            bloco.append([
+                self.formatar_moeda(detalhe[col]) if col in colunas_monetarias else detalhe[col]
+                for col in colunas_exibir
+            ])
+            if len(bloco) == TAMANHO_BLOCO_RELATORIO:
+                print(tabulate(bloco, headers=colunas_exibir, tablefmt='psql'))
+                bloco = []
+        if bloco:
+            print(tabulate(bloco, headers=colunas_exibir, tablefmt='psql'))
+        
+        # Salvar em CSV e Excel
+        nome_arquivo = os.path.basename(self.arquivo)
+        nome_base = re.sub(r'\.TXT$', '', nome_arquivo, flags=re.IGNORECASE)
+        
+        # Para o CSV, usamos os valores originais (não formatados)
+        sucesso, mensagem = self.exportar_para_csv(f"{nome_base}_processado.csv")
+        if sucesso:
             print(f"\nDados exportados para {nome_base}_processado.csv")
-            
-            # Exportar para Excel
-            caminho_excel = f"{nome_base}_processado.xlsx"
-            sucesso, mensagem = self.exportar_para_excel(caminho_excel)
-            if sucesso:
-                print(mensagem)
+        
+        # Exportar para Excel
+        caminho_excel = f"{nome_base}_processado.xlsx"
+        sucesso, mensagem = self.exportar_para_excel(caminho_excel)
+        if sucesso:
+            print(mensagem)
         
         # Informações do trailer
         if self.trailer:
             print("\n===== TOTAIS DO ARQUIVO =====")
             print(f"Quantidade de títulos simples: {int(self.trailer['qtd_titulos_simples'])}")
             print(f"Valor total simples: {self.formatar_moeda(self.trailer['valor_total_simples'])}")
+            print(self.conferir_trailer(qtd_titulos, valor_total)[1])
+
+    def conferir_trailer(self, qtd_titulos=None, valor_total=None):
+        """
+        Confere a quantidade e o valor (em centavos) dos títulos com os totais do trailer.
+        
+        Sem totais informados, eles são calculados com somas vetorizadas sobre o
+        DataFrame dos detalhes. Retorna (bool, mensagem).
+        """
+        if qtd_titulos is None or valor_total is None:
+            df = self.dataframe_detalhes(incluir_linha_original=False)
+            qtd_titulos = len(df)
+            valor_total = int(df['valor_titulo'].sum()) if qtd_titulos else 0
+        
+        if not self.trailer:
+            return False, "Arquivo sem trailer para conferência"
+        
+        try:
+            qtd_trailer = sum(int(self.trailer[f'qtd_titulos_{tipo}']) for tipo in TIPOS_COBRANCA)
+        except ValueError:
+            return False, "Quantidades do trailer inválidas"
+        valor_trailer = sum(self.trailer[f'valor_total_{tipo}'] for tipo in TIPOS_COBRANCA)
+        
+        if qtd_titulos == qtd_trailer and valor_total == valor_trailer:
+            return True, f"Trailer confere: {qtd_titulos} título(s), {self.formatar_moeda(valor_total)}"
+        return False, (f"Trailer não confere: detalhes com {qtd_titulos} título(s) e {self.formatar_moeda(valor_total)}, "
+                       f"trailer com {qtd_trailer} título(s) e {self.formatar_moeda(valor_trailer)}")
 
     def _eh_linha_valida(self, linha, tipo_registro):
         """Verifica se a linha é válida para o tipo de registro especificado"""
@@ -348,7 +574,7 @@ class CNABBradesco:
         
         # Se já é um número (int ou float), converte diretamente
         if isinstance(valor_str, (int, float)):
-            return int(valor_str * 100)
+            return reais_para_centavos(valor_str)
         
         # Converte para string se não for
         valor_str = str(valor_str)
@@ -370,8 +596,7 @@ class CNABBradesco:
                     # Formato com vírgula decimal: 1234,56
                     valor_limpo = valor_limpo.replace(',', '.')
                 
-                valor_float = float(valor_limpo)
-                return int(valor_float * 100)
+                return reais_para_centavos(valor_limpo)
             
             return 0
         except (ValueError, TypeError):
@@ -409,81 +634,326 @@ class CNABBradesco:
             return '000000'
     
     def _criar_header_padrao(self, nome_empresa="TC SECURITIZADORA S.A.", codigo_empresa="00000000000005725675"):
-        """Cria um header padrão para arquivo CNAB 400"""
-        linha = ' ' * 400  # Linha de 400 caracteres
-        
-        # Tipo de registro (posição 1)
-        linha = '0' + linha[1:]
-        
-        # Código de retorno (posição 2)
-        linha = linha[:1] + '2' + linha[2:]
-        
-        # Literal "RETORNO" (posições 3-9)
-        linha = linha[:2] + 'RETORNO' + linha[9:]
-        
-        # Código de serviço (posições 10-11)
-        linha = linha[:9] + '01' + linha[11:]
-        
-        # Literal "COBRANCA" (posições 12-19)
-        linha = linha[:11] + 'COBRANCA' + linha[19:]
-        
-        # Código da empresa (posições 27-46)
-        linha = linha[:26] + codigo_empresa.ljust(20)[:20] + linha[46:]
-        
-        # Nome da empresa (posições 47-76)
-        linha = linha[:46] + nome_empresa.ljust(30)[:30] + linha[76:]
-        
-        # Código do banco (posições 77-79)
-        linha = linha[:76] + '237' + linha[79:]
-        
-        # Nome do banco (posições 80-94)
-        linha = linha[:79] + 'BRADESCO'.ljust(15) + linha[94:]
-        
-        # Data de geração (posições 95-100) - data atual
-        data_atual = datetime.now().strftime('%d%m%y')
-        linha = linha[:94] + data_atual + linha[100:]
-        
-        # Densidade (posição 101)
-        linha = linha[:100] + '0' + linha[101:]
-        
-        # Unidade de densidade (posições 102-108)
-        linha = linha[:101] + '1600000' + linha[108:]
-        
-        # Sequencial do header (posições 395-400)
-        linha = linha[:394] + '000001'
-        
-        return linha + '\n'
+        """Cria um header padrão para arquivo CNAB 400 (campos fixos já estão no modelo)"""
+        linha = MODELO_HEADER.montar({
+            'codigo_empresa': codigo_empresa[:20],
+            'nome_empresa': nome_empresa[:30],
+            'data_geracao': datetime.now().strftime('%d%m%y'),
+        }, self.codificacao)
+        return linha.decode(self.codificacao)
     
-    def _criar_trailer_padrao(self, qtd_registros, valor_total):
-        """Cria um trailer padrão para arquivo CNAB 400"""
-        linha = ' ' * 400  # Linha de 400 caracteres
-        
-        # Tipo de registro (posição 1)
-        linha = '9' + linha[1:]
-        
-        # Código de retorno (posições 2-3)
-        linha = linha[:1] + '01' + linha[3:]
-        
-        # Código do banco (posições 4-6)
-        linha = linha[:3] + '237' + linha[6:]
-        
-        # Quantidade de títulos (posições 18-25)
-        qtd_str = str(qtd_registros).zfill(8)
-        linha = linha[:17] + qtd_str + linha[25:]
-        
-        # Valor total em centavos (posições 26-39)
-        valor_centavos = int(valor_total * 100)
-        valor_str = str(valor_centavos).zfill(14)
-        linha = linha[:25] + valor_str + linha[39:]
-        
-        # Sequencial do trailer (posições 395-400)
-        sequencial_trailer = str(qtd_registros + 2).zfill(6)  # +2 para header e trailer
-        linha = linha[:394] + sequencial_trailer
+    def _criar_trailer_padrao(self, qtd_registros, valor_total, totais=None):
+        """
+        Cria um trailer padrão para arquivo CNAB 400 (valor_total em centavos).
         
-        return linha + '\n'
+        Com 'totais' (cnab_montagem.TotaisCobranca, acumulado enquanto os detalhes
+        são gravados), quantidades e valores saem separados por tipo de cobrança;
+        sem ele, todos os títulos são lançados como cobrança simples.
+        """
+        if totais is None:
+            totais = TotaisCobranca()
+            totais.quantidades['simples'] = qtd_registros
+            totais.valores['simples'] = valor_total
+        # Sequencial: +2 para header e trailer; tipos de cobrança sem títulos ficam em branco
+        linha = MODELO_TRAILER.montar(totais.campos_alterados(b'', qtd_registros + 2), self.codificacao)
+        return linha.decode(self.codificacao)
+    
+    def _atualizar_trailer(self, trailer_linha, totais, sequencial):
+        """Trailer original com os totais por tipo de cobrança e o sequencial recalculados"""
+        linha = bytearray(trailer_linha.rstrip('\r\n').encode(self.codificacao)[:TAMANHO_REGISTRO]
+                          .ljust(TAMANHO_REGISTRO))
+        MODELO_TRAILER.gravar(linha, totais.campos_alterados(linha, sequencial), self.codificacao)
+        return linha.decode(self.codificacao) + '\n'
     
+    def _coluna_excel(self, df, nome, padrao):
+        """Coluna do Excel como vetor de texto, com células vazias (ou a coluna inteira, se ausente) trocadas pelo padrão"""
+        if nome not in df.columns:
+            return np.full(len(df), str(padrao))
+        coluna = df[nome].to_numpy(dtype=object)
+        vazias = pd.isna(coluna)
+        if vazias.any():
+            coluna = coluna.copy()
+            coluna[vazias] = padrao
+        return coluna.astype(str)
+
+    def _converter_moeda_para_centavos_coluna(self, coluna):
+        """Versão vetorizada de _converter_moeda_para_centavos para uma coluna inteira (int64)"""
+        if pd.api.types.is_numeric_dtype(coluna) and not pd.api.types.is_bool_dtype(coluna):
+            reais = coluna.to_numpy(dtype=np.float64, na_value=0.0)
+            centavos = np.rint(reais * 100)
+            # Até duas casas decimais a conta em float é exata; os demais valores
+            # (meio centavo, infinito...) passam pelo arredondamento em Decimal
+            exatos = np.abs(reais * 100 - centavos) < 1e-6
+            resultado = np.where(exatos, centavos, 0).astype(np.int64)
+            if not exatos.all():
+                resultado[~exatos] = [self._converter_moeda_para_centavos(valor) for valor in reais[~exatos]]
+            return resultado
+        return _converter_valores_distintos(coluna, self._converter_moeda_para_centavos).astype(np.int64)
+
+    def _converter_data_para_ddmmaa_coluna(self, coluna):
+        """Versão vetorizada de _converter_data_para_ddmmaa (cada data distinta é convertida uma vez)"""
+        return _converter_valores_distintos(coluna, self._converter_data_para_ddmmaa)
+
+    def _campos_detalhes_excel(self, df, cnpj_empresa, codigo_empresa):
+        """
+        Campos de detalhe de todas as linhas do Excel, na ordem do registro.
+
+        Cada campo é normalizado de uma vez para a coluna inteira (zfill, ljust,
+        centavos, DDMMAA), já com a largura do layout. Retorna ([(nome, coluna)],
+        totais por tipo de cobrança para o trailer), em que nome é None nos
+        trechos em branco e coluna é um vetor de texto ou um texto constante.
+        """
+        quantidade = len(df)
+
+        def texto(nome, padrao, largura):
+            # str(valor)[:largura], completado com espaços à direita
+            return np.char.ljust(self._coluna_excel(df, nome, padrao), largura).astype(f'U{largura}')
+
+        def numero(nome, padrao, largura):
+            # str(valor).strip()[:largura] com zeros à esquerda
+            return np.char.zfill(np.char.strip(self._coluna_excel(df, nome, padrao)).astype(f'U{largura}'), largura)
+
+        def moeda(nome):
+            if nome not in df.columns:
+                return np.zeros(quantidade, dtype=np.int64)
+            return self._converter_moeda_para_centavos_coluna(df[nome])
+
+        def data(nome):
+            if nome not in df.columns:
+                return '000000'
+            return self._converter_data_para_ddmmaa_coluna(df[nome])
+
+        # Nosso número vazio mantém o campo em branco
+        nosso_numero = np.char.strip(self._coluna_excel(df, 'nosso_numero', ''))
+        nosso_numero = np.where(nosso_numero != '', np.char.zfill(nosso_numero, 12).astype('U12'), ' ' * 12)
+
+        carteira = numero('carteira', '09', 2)
+        valor_titulo = moeda('valor_titulo')
+        totais = TotaisCobranca()
+        totais.acumular_colunas(carteira, valor_titulo)
+        valor_pago = valor_titulo
+        if 'valor_principal' in df.columns:
+            # Valor pago do Excel quando preenchido; senão, o valor do título
+            valor_pago = np.where(df['valor_principal'].isna().to_numpy(), valor_titulo,
+                                  moeda('valor_principal'))
+
+        # Sequencial do Excel quando for um número; senão, a contagem a partir de 2 (header é 1)
+        sequencial = np.arange(2, quantidade + 2).astype(object)
+        if 'sequencial' in df.columns:
+            do_excel = _converter_valores_distintos(df['sequencial'], _inteiro_ou_none)
+            preenchidos = pd.notna(do_excel)
+            sequencial[preenchidos] = do_excel[preenchidos]
+
+        campos = [
+            ('tipo_registro', texto('tipo_registro', '1', 1)),                                      # 1
+            ('codigo_inscricao',
+             np.char.zfill(self._coluna_excel(df, 'codigo_inscricao', '02'), 2).astype('U2')),      # 2-3
+            ('numero_inscricao', texto('numero_inscricao', cnpj_empresa, 14)),                      # 4-17
+            (None, ' ' * 3),                                                                        # 18-20
+            ('codigo_empresa', texto('codigo_empresa', codigo_empresa, 17)),                        # 21-37
+            (None, ' ' * 33),                                                                       # 38-70
+            ('nosso_numero', nosso_numero),                                                         # 71-82
+            (None, ' ' * 25),                                                                       # 83-107
+            ('carteira', carteira),                                                                 # 108-109
+            (None, ' '),                                                                            # 110
+            ('data_ocorrencia', data('data_ocorrencia')),                                           # 111-116
+            ('seu_numero',
+             np.char.ljust(np.char.strip(self._coluna_excel(df, 'seu_numero', '')).astype('U10'), 10)),  # 117-126
+            (None, ' ' * 20),                                                                       # 127-146
+            ('data_vencimento', data('data_vencimento')),                                           # 147-152
+            ('valor_titulo', _campo_centavos_coluna(valor_titulo, 13)),                             # 153-165
+            ('banco_cobrador', texto('banco_cobrador', '237', 3)),                                  # 166-168
+            ('agencia_cobradora', texto('agencia_cobradora', '06254', 5)),                          # 169-173
+            ('especie', texto('especie', '01', 2)),                                                 # 174-175
+            ('valor_tarifa', _campo_centavos_coluna(moeda('valor_tarifa'), 13)),                    # 176-188
+            ('valor_iof', _campo_centavos_coluna(moeda('valor_iof'), 13)),                          # 189-201
+            (None, ' ' * 26),                                                                       # 202-227
+            ('valor_abatimento', _campo_centavos_coluna(moeda('valor_abatimento'), 13)),            # 228-240
+            ('descontos', _campo_centavos_coluna(moeda('descontos'), 13)),                          # 241-253
+            ('valor_principal', _campo_centavos_coluna(valor_pago, 13)),                            # 254-266
+            ('juros_mora_multa', _campo_centavos_coluna(moeda('juros_mora_multa'), 13)),            # 267-279
+            ('outros_creditos', _campo_centavos_coluna(moeda('outros_creditos'), 13)),              # 280-292
+            (None, ' ' * 3),                                                                        # 293-295
+            ('data_credito', data('data_credito')),                                                 # 296-301
+            (None, ' ' * 17),                                                                       # 302-318
+            ('motivo_ocorrencia', texto('motivo_ocorrencia', '', 10)),                              # 319-328
+            (None, ' ' * 66),                                                                       # 329-394
+            ('sequencial', np.char.zfill(sequencial.astype(str), 6)),                               # 395-400
+        ]
+        return campos, totais
+
+    @staticmethod
+    def _juntar_campos(campos, posicoes=None):
+        """Concatena os campos em linhas de 400 caracteres (só as das posições informadas, se houver)"""
+        colunas = [repeat(coluna) if isinstance(coluna, str) else (coluna if posicoes is None else coluna[posicoes]).tolist()
+                   for _, coluna in campos]
+        return [''.join(partes) for partes in zip(*colunas)]
+
+    def _montar_detalhes_excel(self, df, cnpj_empresa, codigo_empresa):
+        """
+        Monta as linhas de detalhe (sem quebra de linha) de todas as linhas do Excel:
+        os campos de _campos_detalhes_excel são concatenados uma única vez em linhas
+        de 400 caracteres.
+        Retorna (linhas, totais por tipo de cobrança para o trailer, próximo sequencial).
+        """
+        campos, totais = self._campos_detalhes_excel(df, cnpj_empresa, codigo_empresa)
+        return self._juntar_campos(campos), totais, len(df) + 2
+
+    def _ler_referencia_excel(self, caminho):
+        """
+        Arquivo CNAB de referência de excel_para_cnab, lido uma única vez em bytes.
+
+        Retorna um dicionário com o header e o trailer (bytes, sem quebra de
+        linha), o CNPJ e o código da empresa da primeira linha após o header e
+        os detalhes (linhas em bytes e matriz registros x 400), ou None se o
+        arquivo não puder ser lido.
+        """
+        try:
+            with open(caminho, 'rb') as arquivo:
+                dados = arquivo.read()
+        except OSError:
+            return None
+        vetor = np.frombuffer(dados, dtype=np.uint8)
+        inicios, fins = localizar_linhas(vetor)
+        if inicios.size == 0:
+            return None
+
+        linhas = [dados[inicio:fim] for inicio, fim in zip(inicios.tolist(), fins.tolist())]
+        matriz, _ = montar_matriz(vetor, self.codificacao, incluir_linhas=False)
+        eh_detalhe = matriz[:, 0] == ord('1')
+        referencia = {
+            'header': linhas[0],
+            'trailer': linhas[-1] if len(linhas) > 1 else None,
+            'cnpj_empresa': None,
+            'codigo_empresa': None,
+            'detalhes': [linha for linha, detalhe in zip(linhas, eh_detalhe.tolist()) if detalhe],
+            'matriz': matriz[eh_detalhe],
+        }
+        if len(linhas) > 1 and len(linhas[1]) >= 37:
+            referencia['cnpj_empresa'] = decodificar_texto(linhas[1][3:17], self.codificacao)
+            referencia['codigo_empresa'] = decodificar_texto(linhas[1][20:37], self.codificacao)
+        return referencia
+
+    def _montar_detalhes_referencia(self, df, campos, referencia):
+        """
+        Linhas de detalhe (bytes, sem quebra de linha) do Excel aproveitando o arquivo de referência.
+
+        Cada linha do Excel é casada com um detalhe da referência pelo sequencial
+        ou, se não houver, pelo nosso número (índice por hash, só com chaves
+        únicas na referência). Os campos do Excel são comparados com os valores
+        que a leitura extrai do detalhe casado (sem espaços nem zeros à esquerda):
+        linhas sem diferença são copiadas byte a byte, linhas com diferença recebem
+        só os campos alterados sobre o detalhe original, e linhas sem par são
+        montadas por inteiro. Retorna (linhas, copiadas, alteradas, novas).
+        """
+        matriz = referencia['matriz']
+        quantidade = len(df)
+        colunas = dict(campos)
+        colunas['nosso_numero_2'] = np.char.zfill(
+            np.char.strip(self._coluna_excel(df, 'nosso_numero_2', '')).astype('U12'), 12)
+
+        # Casamento: sequencial, depois nosso número
+        casadas = np.full(quantidade, -1, dtype=np.int64)
+        if 'sequencial' in df.columns:
+            if pd.api.types.is_integer_dtype(df['sequencial']):
+                sequenciais = df['sequencial'].to_numpy(dtype=np.int64)
+            else:
+                sequenciais = _converter_valores_distintos(df['sequencial'], _inteiro_ou_none)
+                sequenciais = np.where(pd.isna(sequenciais), -1, sequenciais).astype(np.int64)
+            casadas = _posicoes_por_chave(decodificar_inteiros(matriz[:, 394:400]), sequenciais, -1)
+        sem_par = casadas < 0
+        if sem_par.any():
+            inicio, fim, _ = LEITURA_DETALHE['nosso_numero']
+            por_nosso_numero = _posicoes_por_chave(_normalizar_campo(decodificar_textos(matriz[:, inicio:fim])),
+                                                   _normalizar_campo(colunas['nosso_numero'][sem_par]), '')
+            casadas[sem_par] = por_nosso_numero
+
+        # Campos do Excel diferentes do detalhe casado
+        linhas_excel = np.flatnonzero(casadas >= 0)
+        detalhes = casadas[linhas_excel]
+        alterados = {}
+        for nome, coluna in colunas.items():
+            if nome not in df.columns or isinstance(coluna, str):
+                continue
+            inicio, fim, tipo = LEITURA_DETALHE[nome]
+            do_excel = coluna[linhas_excel]
+            if tipo == ZERADO:
+                # A leitura exporta esses valores zerados
+                diferentes = _normalizar_campo(do_excel) != ''
+            else:
+                no_arquivo = matriz[detalhes, inicio:fim]
+                # Primeiro a comparação exata (caractere a caractere com os bytes do
+                # arquivo); só as diferenças passam pela decodificação e normalização
+                pontos = np.ascontiguousarray(do_excel, dtype=f'U{fim - inicio}').view(np.uint32)
+                diferentes = (pontos.reshape(-1, fim - inicio) != no_arquivo).any(axis=1)
+                if diferentes.any():
+                    diferentes[diferentes] = (
+                        _normalizar_campo(decodificar_textos(no_arquivo[diferentes], self.codificacao))
+                        != _normalizar_campo(do_excel[diferentes]))
+            if diferentes.any():
+                alterados[nome] = diferentes
+
+        linhas = [None] * quantidade
+        originais = referencia['detalhes']
+        com_alteracao = np.zeros(detalhes.size, dtype=bool)
+        for diferentes in alterados.values():
+            com_alteracao |= diferentes
+        for linha_excel, detalhe in zip(linhas_excel[~com_alteracao].tolist(), detalhes[~com_alteracao].tolist()):
+            linhas[linha_excel] = originais[detalhe]
+        for posicao in np.flatnonzero(com_alteracao).tolist():
+            linha_excel = int(linhas_excel[posicao])
+            linha = bytearray(originais[detalhes[posicao]].ljust(TAMANHO_REGISTRO))
+            MODELO_DETALHE.gravar(linha, {nome: colunas[nome][linha_excel] for nome, diferentes in alterados.items()
+                                          if diferentes[posicao]}, self.codificacao)
+            linhas[linha_excel] = bytes(linha)
+
+        novas = np.flatnonzero(casadas < 0)
+        for linha_excel, linha in zip(novas.tolist(), self._juntar_campos(campos, novas)):
+            linhas[linha_excel] = linha.encode(self.codificacao)
+
+        alteradas = int(com_alteracao.sum())
+        return linhas, detalhes.size - alteradas, alteradas, novas.size
+
+    def _trailer_referencia(self, referencia, linhas, totais, sequencial):
+        """
+        Trailer (bytes, sem quebra de linha) de excel_para_cnab com arquivo de referência.
+
+        Se os detalhes gerados são os da referência, o trailer é copiado como está:
+        os totais gravados pelo banco nem sempre batem com a soma dos detalhes. Senão,
+        os totais dos detalhes da referência são comparados com os de 'totais' e só
+        os campos que mudaram são regravados; o sequencial, só se a quantidade de
+        linhas mudou.
+        """
+        trailer = referencia['trailer']
+        if linhas == referencia['detalhes']:
+            return trailer
+
+        matriz = referencia['matriz']
+        inicio, fim, _ = LEITURA_DETALHE['carteira']
+        carteiras = decodificar_textos(matriz[:, inicio:fim], self.codificacao)
+        inicio, fim, _ = LEITURA_DETALHE['valor_titulo']
+        anteriores = TotaisCobranca()
+        anteriores.acumular_colunas(carteiras, decodificar_inteiros(matriz[:, inicio:fim]))
+
+        campos_anteriores = anteriores.campos()
+        campos = {nome: texto for nome, texto in totais.campos().items() if texto != campos_anteriores[nome]}
+        if len(linhas) != len(referencia['detalhes']):
+            campos['sequencial'] = str(sequencial).zfill(6)
+        if not campos:
+            return trailer
+        linha = bytearray(trailer[:TAMANHO_REGISTRO].ljust(TAMANHO_REGISTRO))
+        MODELO_TRAILER.gravar(linha, campos, self.codificacao)
+        return bytes(linha)
+
     def excel_para_cnab(self, arquivo_excel, arquivo_cnab_saida, arquivo_cnab_referencia=None):
-        """Converte arquivo Excel de volta para formato CNAB 400"""
+        """
+        Converte arquivo Excel de volta para formato CNAB 400.
+
+        Com um arquivo de referência, header e trailer vêm dele e as linhas do
+        Excel que correspondem a detalhes sem alteração são copiadas como estão
+        (ver _montar_detalhes_referencia); as demais são montadas do Excel. O
+        trailer só tem regravados os totais afetados (ver _trailer_referencia).
+        """
         try:
             # Ler arquivo Excel
             df = pd.read_excel(arquivo_excel)
@@ -498,220 +968,41 @@ class CNABBradesco:
                     return False, f"Coluna obrigatória '{col}' não encontrada no Excel"
             
             # Se arquivo de referência fornecido, usar header/trailer originais
-            header_linha = None
-            trailer_linha = None
+            referencia = None
             cnpj_empresa = '12345678000123'  # CNPJ exemplo
             codigo_empresa = '00000090368400035'
             
             if arquivo_cnab_referencia and os.path.exists(arquivo_cnab_referencia):
-                try:
-                    with open(arquivo_cnab_referencia, 'r', encoding='utf-8') as ref_file:
-                        linhas_ref = ref_file.readlines()
-                        if linhas_ref:
-                            header_linha = linhas_ref[0]
-                            if len(linhas_ref) > 1:
-                                trailer_linha = linhas_ref[-1]
-                            
-                            # Extrair informações do header de referência
-                            if len(linhas_ref) > 1:
-                                primeira_linha_detalhe = linhas_ref[1]
-                                if len(primeira_linha_detalhe) >= 37:
-                                    cnpj_empresa = primeira_linha_detalhe[3:17]
-                                    codigo_empresa = primeira_linha_detalhe[20:37]
-                except Exception:
-                    pass  # Se der erro, usa padrão
+                referencia = self._ler_referencia_excel(arquivo_cnab_referencia)
+                if referencia and referencia['cnpj_empresa'] is not None:
+                    cnpj_empresa = referencia['cnpj_empresa']
+                    codigo_empresa = referencia['codigo_empresa']
             
-            # Criar arquivo CNAB
-            with open(arquivo_cnab_saida, 'w', encoding='utf-8') as arquivo_saida:
-                
-                # Escrever header
-                if header_linha:
-                    arquivo_saida.write(header_linha)
-                else:
-                    header = self._criar_header_padrao()
-                    arquivo_saida.write(header)
-                
-                # Processar cada linha do Excel
-                valor_total = 0
-                sequencial = 2  # Começa em 2 (header é 1)
-                
-                for index, row in df.iterrows():
-                    # Criar linha CNAB de 400 caracteres preenchida com espaços
-                    linha = ' ' * 400
-                    
-                    # Tipo de registro (posição 1)
-                    tipo_registro = row.get('tipo_registro', '1')
-                    linha = str(tipo_registro)[0] + linha[1:]
-                    
-                    # Código de inscrição (posições 2-3)
-                    codigo_inscricao = row.get('codigo_inscricao', '02')
-                    if pd.isna(codigo_inscricao):
-                        codigo_inscricao = '02'
-                    linha = linha[:1] + str(codigo_inscricao).zfill(2)[:2] + linha[3:]
-                    
-                    # Número de inscrição/CNPJ (posições 4-17)
-                    numero_inscricao = row.get('numero_inscricao', cnpj_empresa)
-                    if pd.isna(numero_inscricao):
-                        numero_inscricao = cnpj_empresa
-                    linha = linha[:3] + str(numero_inscricao).ljust(14)[:14] + linha[17:]
-                    
-                    # Código da empresa (posições 21-37)
-                    codigo_emp = row.get('codigo_empresa', codigo_empresa)
-                    if pd.isna(codigo_emp):
-                        codigo_emp = codigo_empresa
-                    linha = linha[:20] + str(codigo_emp).ljust(17)[:17] + linha[37:]
-                    
-                    # Nosso número (posições 71-82)
-                    nosso_numero_raw = row.get('nosso_numero', '')
-                    if pd.isna(nosso_numero_raw):
-                        nosso_numero = ''
-                    else:
-                        nosso_numero = str(nosso_numero_raw).strip()
-                    
-                    if nosso_numero:
-                        nosso_numero = nosso_numero.zfill(12)[:12]
-                        linha = linha[:70] + nosso_numero + linha[82:]
-                    
-                    # Carteira (posições 108-109)
-                    carteira_raw = row.get('carteira', '09')
-                    if pd.isna(carteira_raw):
-                        carteira = '09'
-                    else:
-                        carteira = str(carteira_raw).strip()[:2]
-                    linha = linha[:107] + carteira.zfill(2) + linha[109:]
-                    
-                    # Data de ocorrência (posições 111-116)
-                    data_ocorrencia = self._converter_data_para_ddmmaa(row.get('data_ocorrencia', ''))
-                    linha = linha[:110] + data_ocorrencia + linha[116:]
-                    
-                    # Seu número (posições 117-126)
-                    seu_numero_raw = row.get('seu_numero', '')
-                    if pd.isna(seu_numero_raw):
-                        seu_numero = ''
-                    else:
-                        seu_numero = str(seu_numero_raw).strip()[:10]
-                    linha = linha[:116] + seu_numero.ljust(10) + linha[126:]
-                    
-                    # Data de vencimento (posições 147-152)
-                    data_vencimento = self._converter_data_para_ddmmaa(row.get('data_vencimento', ''))
-                    linha = linha[:146] + data_vencimento + linha[152:]
-                    
-                    # Valor do título (posições 153-165)
-                    valor_titulo = row.get('valor_titulo', 0)
-                    if pd.isna(valor_titulo):
-                        valor_titulo = 0
-                    
-                    valor_centavos = self._converter_moeda_para_centavos(valor_titulo)
-                    valor_str = str(valor_centavos).zfill(13)
-                    linha = linha[:152] + valor_str + linha[165:]
-                    valor_total += valor_centavos / 100
-                    
-                    # Banco cobrador (posições 166-168)
-                    banco_cobrador = row.get('banco_cobrador', '237')
-                    if pd.isna(banco_cobrador):
-                        banco_cobrador = '237'
-                    linha = linha[:165] + str(banco_cobrador)[:3].ljust(3) + linha[168:]
-                    
-                    # Agência cobradora (posições 169-173)
-                    agencia_cobradora = row.get('agencia_cobradora', '06254')
-                    if pd.isna(agencia_cobradora):
-                        agencia_cobradora = '06254'
-                    linha = linha[:168] + str(agencia_cobradora)[:5].ljust(5) + linha[173:]
-                    
-                    # Espécie (posições 174-175)
-                    especie = row.get('especie', '01')
-                    if pd.isna(especie):
-                        especie = '01'
-                    linha = linha[:173] + str(especie)[:2].ljust(2) + linha[175:]
-                    
-                    # Valor tarifa (posições 176-188)
-                    valor_tarifa = row.get('valor_tarifa', 0)
-                    if pd.isna(valor_tarifa):
-                        valor_tarifa = 0
-                    tarifa_centavos = self._converter_moeda_para_centavos(valor_tarifa)
-                    linha = linha[:175] + str(tarifa_centavos).zfill(13) + linha[188:]
-                    
-                    # Valor IOF (posições 189-201)
-                    valor_iof = row.get('valor_iof', 0)
-                    if pd.isna(valor_iof):
-                        valor_iof = 0
-                    iof_centavos = self._converter_moeda_para_centavos(valor_iof)
-                    linha = linha[:188] + str(iof_centavos).zfill(13) + linha[201:]
-                    
-                    # Valor abatimento (posições 228-240)
-                    valor_abatimento = row.get('valor_abatimento', 0)
-                    if pd.isna(valor_abatimento):
-                        valor_abatimento = 0
-                    abatimento_centavos = self._converter_moeda_para_centavos(valor_abatimento)
-                    linha = linha[:227] + str(abatimento_centavos).zfill(13) + linha[240:]
-                    
-                    # Descontos (posições 241-253)
-                    descontos = row.get('descontos', 0)
-                    if pd.isna(descontos):
-                        descontos = 0
-                    desconto_centavos = self._converter_moeda_para_centavos(descontos)
-                    linha = linha[:240] + str(desconto_centavos).zfill(13) + linha[253:]
-                    
-                    # Valor pago (posições 254-266) - usar valor do Excel se disponível
-                    valor_pago = row.get('valor_principal', valor_titulo)
-                    if pd.isna(valor_pago):
-                        valor_pago = valor_titulo
-                    pago_centavos = self._converter_moeda_para_centavos(valor_pago)
-                    linha = linha[:253] + str(pago_centavos).zfill(13) + linha[266:]
-                    
-                    # Juros mora multa (posições 267-279)
-                    juros_mora_multa = row.get('juros_mora_multa', 0)
-                    if pd.isna(juros_mora_multa):
-                        juros_mora_multa = 0
-                    juros_centavos = self._converter_moeda_para_centavos(juros_mora_multa)
-                    linha = linha[:266] + str(juros_centavos).zfill(13) + linha[279:]
-                    
-                    # Outros créditos (posições 280-292)
-                    outros_creditos = row.get('outros_creditos', 0)
-                    if pd.isna(outros_creditos):
-                        outros_creditos = 0
-                    creditos_centavos = self._converter_moeda_para_centavos(outros_creditos)
-                    linha = linha[:279] + str(creditos_centavos).zfill(13) + linha[292:]
-                    
-                    # Data de crédito (posições 296-301)
-                    data_credito = self._converter_data_para_ddmmaa(row.get('data_credito', ''))
-                    linha = linha[:295] + data_credito + linha[301:]
-                    
-                    # Motivo ocorrência (posições 319-328)
-                    motivo_ocorrencia = row.get('motivo_ocorrencia', '')
-                    if pd.isna(motivo_ocorrencia):
-                        motivo_ocorrencia = ''
-                    linha = linha[:318] + str(motivo_ocorrencia)[:10].ljust(10) + linha[328:]
-                    
-                    # Sequencial (posições 395-400) - usar do Excel se disponível
-                    sequencial_excel = row.get('sequencial', sequencial)
-                    if pd.isna(sequencial_excel):
-                        sequencial_final = sequencial
-                    else:
-                        try:
-                            sequencial_final = int(str(sequencial_excel).strip())
-                        except (ValueError, TypeError):
-                            sequencial_final = sequencial
-                    
-                    sequencial_str = str(sequencial_final).zfill(6)
-                    linha = linha[:394] + sequencial_str
-                    
-                    # Escrever linha
-                    arquivo_saida.write(linha + '\n')
-                    sequencial += 1
-                
-                # Escrever trailer
-                if trailer_linha:
-                    # Atualizar sequencial no trailer original
-                    trailer_modificado = trailer_linha[:394] + str(sequencial).zfill(6)
-                    if not trailer_modificado.endswith('\n'):
-                        trailer_modificado += '\n'
-                    arquivo_saida.write(trailer_modificado)
+            # Normalizar todos os campos de detalhe de uma vez, coluna a coluna
+            campos, totais = self._campos_detalhes_excel(df, cnpj_empresa, codigo_empresa)
+            sequencial = len(df) + 2
+            
+            if referencia is None:
+                with open(arquivo_cnab_saida, 'w', encoding='utf-8') as arquivo_saida:
+                    arquivo_saida.write(self._criar_header_padrao())
+                    arquivo_saida.write('\n'.join(self._juntar_campos(campos)) + '\n')
+                    arquivo_saida.write(self._criar_trailer_padrao(len(df), totais.valor_total, totais))
+                return True, f"Arquivo CNAB gerado com sucesso: {arquivo_cnab_saida}"
+            
+            # Com referência: detalhes sem alteração copiados byte a byte
+            linhas, copiadas, alteradas, novas = self._montar_detalhes_referencia(df, campos, referencia)
+            with open(arquivo_cnab_saida, 'wb') as arquivo_saida:
+                arquivo_saida.write(referencia['header'] + b'\n')
+                arquivo_saida.write(b'\n'.join(linhas) + b'\n')
+                # Trailer da referência, com apenas os totais afetados pelas linhas geradas
+                if referencia['trailer'] is not None:
+                    arquivo_saida.write(self._trailer_referencia(referencia, linhas, totais, sequencial) + b'\n')
                 else:
-                    trailer = self._criar_trailer_padrao(len(df), valor_total)
-                    arquivo_saida.write(trailer)
+                    trailer = self._criar_trailer_padrao(len(df), totais.valor_total, totais)
+                    arquivo_saida.write(trailer.encode(self.codificacao))
             
-            return True, f"Arquivo CNAB gerado com sucesso: {arquivo_cnab_saida}"
+            return True, (f"Arquivo CNAB gerado com sucesso: {arquivo_cnab_saida}\n"
+                          f"{copiadas} linha(s) copiadas da referência, {alteradas} alterada(s), {novas} nova(s)")
             
         except Exception as e:
             return False, f"Erro ao converter Excel para CNAB: {str(e)}"
@@ -925,7 +1216,7 @@ class CNABBradesco:
         # Validar e converter o valor
         try:
             if tipo == 'moeda':
-                valor_convertido = self._converter_moeda_para_float(novo_valor)
+                valor_convertido = reais_para_centavos(self._converter_moeda_para_float(novo_valor))
                 detalhe[campo] = valor_convertido
                 print(f"✅ {nome} alterado para: {self.formatar_moeda(valor_convertido)}")
             elif tipo == 'data':
@@ -998,7 +1289,7 @@ class CNABBradesco:
                 if confirmacao.lower() == 's':
                     for detalhe in self.detalhes:
                         valor_atual = detalhe.get('valor_titulo', 0)
-                        novo_valor = valor_atual * (1 + percentual / 100)
+                        novo_valor = multiplicar_centavos(valor_atual, 1 + percentual / 100)
                         detalhe['valor_titulo'] = novo_valor
                         detalhe['valor_principal'] = novo_valor
                         detalhe['_alterado'] = True
@@ -1008,7 +1299,7 @@ class CNABBradesco:
         
         elif opcao == '2':
             try:
-                valor_fixo = self._converter_moeda_para_float(input("Digite o valor a adicionar: "))
+                valor_fixo = reais_para_centavos(self._converter_moeda_para_float(input("Digite o valor a adicionar: ")))
                 confirmacao = input(f"Confirma adicionar {self.formatar_moeda(valor_fixo)} a todos? (s/N): ")
                 if confirmacao.lower() == 's':
                     for detalhe in self.detalhes:
@@ -1023,7 +1314,7 @@ class CNABBradesco:
             confirmacao = input("Confirma zerar juros/multa de todos os títulos? (s/N): ")
             if confirmacao.lower() == 's':
                 for detalhe in self.detalhes:
-                    detalhe['juros_mora_multa'] = 0.0
+                    detalhe['juros_mora_multa'] = 0
                     detalhe['_alterado'] = True
                 print(f"✅ Juros/multa zerados em {len(self.detalhes)} registros")
         
@@ -1034,7 +1325,7 @@ class CNABBradesco:
                 if confirmacao.lower() == 's':
                     for detalhe in self.detalhes:
                         valor_atual = detalhe.get('valor_titulo', 0)
-                        novo_valor = valor_atual * (1 - desconto / 100)
+                        novo_valor = multiplicar_centavos(valor_atual, 1 - desconto / 100)
                         detalhe['valor_titulo'] = novo_valor
                         detalhe['valor_principal'] = novo_valor
                         detalhe['_alterado'] = True
@@ -1160,8 +1451,10 @@ class CNABBradesco:
                     header_padrao = self._criar_header_padrao()
                     arquivo_saida.write(header_padrao)
                 
-                # Escrever detalhes (alterados e originais)
+                # Escrever detalhes (alterados e originais), totalizando-os para o trailer
+                totais = TotaisCobranca()
                 for i, detalhe in enumerate(self.detalhes, 2):
+                    totais.acumular(detalhe.get('carteira', ''), detalhe.get('valor_titulo', 0))
                     if detalhe.get('_alterado', False):
                         # Reconstruir linha com alterações
                         linha = self._reconstruir_linha_cnab(detalhe, i)
@@ -1173,20 +1466,12 @@ class CNABBradesco:
                     
                     arquivo_saida.write(linha)
                 
-                # Escrever trailer original (ou atualizado)
+                # Escrever trailer original (com totais e sequencial atualizados) ou um padrão
+                sequencial = len(self.detalhes) + 2
                 if hasattr(self, 'trailer') and isinstance(self.trailer, dict) and 'linha_original' in self.trailer:
-                    trailer_linha = self.trailer['linha_original']
-                    # Atualizar sequencial no trailer
-                    sequencial = len(self.detalhes) + 2
-                    trailer_linha = trailer_linha[:394] + str(sequencial).zfill(6)
-                    if not trailer_linha.endswith('\n'):
-                        trailer_linha += '\n'
-                    arquivo_saida.write(trailer_linha)
+                    arquivo_saida.write(self._atualizar_trailer(self.trailer['linha_original'], totais, sequencial))
                 else:
-                    # Criar trailer padrão se não existir
-                    valor_total = sum(d.get('valor_titulo', 0) for d in self.detalhes)
-                    trailer_padrao = self._criar_trailer_padrao(len(self.detalhes), valor_total)
-                    arquivo_saida.write(trailer_padrao)
+                    arquivo_saida.write(self._criar_trailer_padrao(len(self.detalhes), totais.valor_total, totais))
             
             print(f"✅ Arquivo salvo com sucesso: {nome_arquivo}")
             print(f"📊 {len(alterados)} alterações aplicadas")
@@ -1196,156 +1481,88 @@ class CNABBradesco:
             print(f"❌ Erro ao salvar arquivo: {str(e)}")
             return False
     
-    def _reconstruir_linha_cnab(self, detalhe, sequencial):
-        """Reconstrói uma linha CNAB com base nos dados alterados"""
-        linha = ' ' * 400
-        
-        # Usar método existente de conversão Excel para CNAB
-        # Criar DataFrame temporário com um registro
-        df_temp = pd.DataFrame([detalhe])
-        
-        # Usar lógica similar ao excel_para_cnab mas para uma linha
-        # Tipo de registro
-        linha = '1' + linha[1:]
-        
-        # Código de inscrição
-        codigo_inscricao = detalhe.get('codigo_inscricao', '02')
-        linha = linha[:1] + str(codigo_inscricao).zfill(2)[:2] + linha[3:]
-        
-        # CNPJ
-        numero_inscricao = detalhe.get('numero_inscricao', '12345678000123')
-        linha = linha[:3] + str(numero_inscricao).ljust(14)[:14] + linha[17:]
-        
-        # Código da empresa
-        codigo_empresa = detalhe.get('codigo_empresa', '00000090368400035')
-        linha = linha[:20] + str(codigo_empresa).ljust(17)[:17] + linha[37:]
-        
-        # Nosso número
-        nosso_numero = str(detalhe.get('nosso_numero', '')).strip().zfill(12)[:12]
-        linha = linha[:70] + nosso_numero + linha[82:]
-        
-        # Nosso número 2
-        nosso_numero_2 = str(detalhe.get('nosso_numero_2', '')).strip().zfill(12)[:12]
-        linha = linha[:134] + nosso_numero_2 + linha[146:]
-        
-        # Carteira
-        carteira = str(detalhe.get('carteira', '09')).strip()[:2].zfill(2)
-        linha = linha[:107] + carteira + linha[109:]
-        
-        # Data de ocorrência
-        data_ocorrencia = self._converter_data_para_ddmmaa(detalhe.get('data_ocorrencia', ''))
-        linha = linha[:110] + data_ocorrencia + linha[116:]
-        
-        # Seu número
-        seu_numero = str(detalhe.get('seu_numero', '')).strip()[:10].ljust(10)
-        linha = linha[:116] + seu_numero + linha[126:]
-        
-        # Data de vencimento
-        data_vencimento = self._converter_data_para_ddmmaa(detalhe.get('data_vencimento', ''))
-        linha = linha[:146] + data_vencimento + linha[152:]
-        
-        # Valor do título
-        valor_titulo = detalhe.get('valor_titulo', 0)
-        valor_centavos = int(valor_titulo * 100) if valor_titulo else 0
-        linha = linha[:152] + str(valor_centavos).zfill(13) + linha[165:]
-        
-        # Banco e agência
-        linha = linha[:165] + '237' + linha[168:]  # Banco
-        linha = linha[:168] + '06254' + linha[173:]  # Agência
-        
-        # Valores diversos
-        campos_monetarios = [
-            ('valor_tarifa', 175, 188),
-            ('valor_iof', 188, 201),
-            ('valor_abatimento', 227, 240),
-            ('descontos', 240, 253),
-            ('valor_principal', 253, 266),
-            ('juros_mora_multa', 266, 279),
-            ('outros_creditos', 279, 292)
-        ]
-        
-        for campo, inicio, fim in campos_monetarios:
-            valor = detalhe.get(campo, 0)
-            valor_centavos = int(valor * 100) if valor else 0
-            linha = linha[:inicio] + str(valor_centavos).zfill(fim - inicio) + linha[fim:]
-        
-        # Data de crédito
-        data_credito = self._converter_data_para_ddmmaa(detalhe.get('data_credito', ''))
-        linha = linha[:295] + data_credito + linha[301:]
+    def _reconstruir_linha_cnab(self, detalhe, sequencial, zerar_juros=False):
+        """Reconstrói uma linha CNAB com base nos dados alterados (opcionalmente com juros/multa zerados)"""
+        valores = {
+            'codigo_inscricao': str(detalhe.get('codigo_inscricao', '02')).zfill(2)[:2],
+            'numero_inscricao': str(detalhe.get('numero_inscricao', '12345678000123'))[:14],
+            'codigo_empresa': str(detalhe.get('codigo_empresa', '00000090368400035'))[:17],
+            'nosso_numero': str(detalhe.get('nosso_numero', '')).strip().zfill(12)[:12],
+            'nosso_numero_2': str(detalhe.get('nosso_numero_2', '')).strip().zfill(12)[:12],
+            'carteira': str(detalhe.get('carteira', '09')).strip()[:2].zfill(2),
+            'data_ocorrencia': self._converter_data_para_ddmmaa(detalhe.get('data_ocorrencia', '')),
+            'seu_numero': str(detalhe.get('seu_numero', '')).strip()[:10],
+            'data_vencimento': self._converter_data_para_ddmmaa(detalhe.get('data_vencimento', '')),
+            'data_credito': self._converter_data_para_ddmmaa(detalhe.get('data_credito', '')),
+            'sequencial': str(sequencial).zfill(6),
+        }
         
-        # Sequencial
-        linha = linha[:394] + str(sequencial).zfill(6)
+        # Valores em centavos (banco e agência cobradores já estão no modelo)
+        for campo in CAMPOS_MONETARIOS_RECONSTRUCAO:
+            inicio, fim = MODELO_DETALHE.posicoes[campo]
+            centavos = 0 if zerar_juros and campo == 'juros_mora_multa' else detalhe.get(campo, 0)
+            valores[campo] = centavos_para_campo(centavos, fim - inicio)
         
-        return linha + '\n'
-
+        return MODELO_DETALHE.montar(valores, self.codificacao).decode(self.codificacao)
 
-
-    def gerar_cnab_editado_sem_juros(self, caminho_saida):
+    def gerar_cnab_editado_sem_juros(self, caminho_saida, diario=None):
         """Gera um novo arquivo CNAB com as alterações do editor gráfico E sem juros/multa"""
         try:
             # Usar método seguro de edição (estilo editor de texto)
-            return self._editar_cnab_seguro(caminho_saida, zerar_juros=True)
+            return self._editar_cnab_seguro(caminho_saida, zerar_juros=True, diario=diario)
             
         except Exception as e:
             return False, f"Erro ao gerar arquivo CNAB: {str(e)}"
 
-    def gerar_cnab_editado(self, caminho_saida):
+    def gerar_cnab_editado(self, caminho_saida, diario=None):
         """Gera um novo arquivo CNAB com as alterações feitas no editor gráfico (método seguro)"""
         try:
             # Usar método seguro de edição (estilo editor de texto)
-            return self._editar_cnab_seguro(caminho_saida, zerar_juros=False)
+            return self._editar_cnab_seguro(caminho_saida, zerar_juros=False, diario=diario)
             
         except Exception as e:
             return False, f"Erro ao salvar arquivo: {str(e)}"
 
-    def _editar_cnab_seguro(self, caminho_saida, zerar_juros=False):
+    def registrar_edicao(self, indice, campo, valor):
+        """
+        Anota a edição de um campo do detalhe 'indice' (0 para o primeiro) no diário,
+        refletindo-a em self.detalhes quando os detalhes já foram lidos.
+        """
+        self.diario.registrar(indice, campo, valor)
+        if indice < len(self.detalhes):
+            self.detalhes[indice][campo] = valor
+            self.detalhes[indice]['_alterado'] = True
+
+    def _editar_cnab_seguro(self, caminho_saida, zerar_juros=False, diario=None):
         """
         Edita o arquivo CNAB de forma segura, como um editor de texto.
-        Altera apenas os campos específicos sem reconstruir o arquivo inteiro.
+        
+        Aplica as edições do diário (self.diario, se 'diario' não for informado) em
+        uma única passagem pelo arquivo original, sobrescrevendo apenas os campos
+        anotados, o código da empresa no header e, se pedido, os juros/multa.
+        
+        O arquivo gerado é então comparado com o original (cnab_verificacao.py):
+        se algum byte fora dessas posições (e dos totais do trailer) mudou, o
+        retorno é False com as linhas e posições alteradas.
         """
         try:
-            # Verificar se há alterações
-            alterados = [d for d in self.detalhes if d.get('_alterado', False)]
-            
-            # Ler o arquivo original como texto, preservando encoding
-            with open(self.arquivo, 'r', encoding='utf-8', newline='') as arquivo_original:
-                linhas_originais = arquivo_original.readlines()
+            header = CodigoEmpresaHeader(CODIGO_EMPRESA_TC, self.codificacao)
+            edicoes = EdicoesPontuais(self.diario if diario is None else diario, self.codificacao)
+            etapas = [header, edicoes]
+            if zerar_juros:
+                etapas.append(ZerarJuros())
+            etapas.append(RecalcularTrailer())  # Última etapa: totaliza os detalhes já editados
             
-            # Criar lista de linhas editadas
-            linhas_editadas = []
-            contador_detalhes = 0
-            alteracoes_realizadas = 0
-            header_alterado = False
-            
-            for linha in linhas_originais:
-                linha_editada = linha
-                
-                # Verificar se é uma linha de header (tipo 0) e alterar código da empresa
-                if linha.strip() and linha[0] == '0':
-                    linha_editada = self._alterar_header_codigo_empresa(linha)
-                    header_alterado = True
-                
-                # Verificar se é uma linha de detalhe (tipo 1)
-                elif linha.strip() and linha[0] == '1':
-                    if contador_detalhes < len(self.detalhes):
-                        detalhe = self.detalhes[contador_detalhes]
-                        
-                        # Se o registro foi alterado, aplicar edições pontuais
-                        if detalhe.get('_alterado', False):
-                            linha_editada = self._aplicar_edicoes_pontuais(linha, detalhe)
-                            alteracoes_realizadas += 1
-                        
-                        # Se deve zerar juros, aplicar zeramento pontual
-                        if zerar_juros:
-                            linha_editada = self._zerar_juros_pontual(linha_editada)
-                    
-                    contador_detalhes += 1
-                
-                linhas_editadas.append(linha_editada)
-            
-            # Salvar arquivo editado preservando formato original
-            with open(caminho_saida, 'w', encoding='utf-8', newline='') as arquivo_saida:
-                arquivo_saida.writelines(linhas_editadas)
+            # Conteúdo original mantido para a verificação (o destino pode ser o próprio arquivo)
+            with open(self.arquivo, 'rb') as arquivo_original:
+                dados = arquivo_original.read()
+            transformar_arquivo(self.arquivo, caminho_saida, etapas, dados=dados)
+            verificacao = verificar_edicao(dados, caminho_saida, zerar_juros, self.codificacao)
+            if not verificacao.ok:
+                return False, (f"Arquivo gerado em {caminho_saida}, mas a verificação encontrou alterações "
+                               f"fora das posições permitidas:\n{verificacao.mensagem()}")
+            alteracoes_realizadas = edicoes.registros_alterados
+            header_alterado = header.alterado
             
             # Preparar mensagem de retorno
             mensagem_partes = []
@@ -1370,186 +1587,9 @@ class CNABBradesco:
         except Exception as e:
             return False, f"Erro ao editar arquivo CNAB: {str(e)}"
 
-    def _alterar_header_codigo_empresa(self, linha_header):
-        """
-        Altera o código da empresa no header de forma pontual.
-        Aplica o código específico "00000000036846335521TC" nas posições 27-46 (20 caracteres).
-        """
-        linha_editada = linha_header.rstrip('\n\r')  # Remove quebras de linha temporariamente
-        
-        # Garantir que a linha tenha pelo menos 400 caracteres
-        if len(linha_editada) < 400:
-            linha_editada = linha_editada.ljust(400)
-        
-        # Código da empresa específico para TC SECURITIZADORA
-        codigo_empresa_tc = "00000000036846335521TC"
-        
-        # Alterar código da empresa (posições 26-46, 20 caracteres - baseado no _criar_header_padrao)
-        if len(linha_editada) >= 46:
-            codigo_ajustado = codigo_empresa_tc.ljust(20)[:20]  # Ajustar para 20 caracteres
-            linha_editada = linha_editada[:26] + codigo_ajustado + linha_editada[46:]
-        
-        # Restaurar quebra de linha original
-        return linha_editada + '\n'
-
-    def _aplicar_edicoes_pontuais(self, linha, detalhe):
-        """
-        Aplica edições pontuais em campos específicos, como um editor de texto.
-        Altera apenas as posições exatas dos campos editados.
-        """
-        linha_editada = linha.rstrip('\n\r')  # Remove quebras de linha temporariamente
-        
-        # Garantir que a linha tenha pelo menos 400 caracteres
-        if len(linha_editada) < 400:
-            linha_editada = linha_editada.ljust(400)
-        
-        # Editar NOSSO_NUMERO (posições 70-82, 12 caracteres)
-        if 'nosso_numero' in detalhe and detalhe.get('_alterado', False):
-            novo_nosso_numero = str(detalhe['nosso_numero']).strip()
-            if novo_nosso_numero:
-                # Ajustar para 12 caracteres (preencher com zeros à esquerda ou truncar)
-                novo_nosso_numero = novo_nosso_numero.zfill(12)[:12]
-                linha_editada = linha_editada[:70] + novo_nosso_numero + linha_editada[82:]
-        
-        # Editar NOSSO_NUMERO_2 (posições 37-49, 12 caracteres)
-        if 'nosso_numero_2' in detalhe and detalhe.get('_alterado', False):
-            novo_nosso_numero_2 = str(detalhe['nosso_numero_2']).strip()
-            if novo_nosso_numero_2:
-                # Ajustar para 12 caracteres (preencher com zeros à esquerda ou truncar)
-                novo_nosso_numero_2 = novo_nosso_numero_2.zfill(12)[:12]
-                linha_editada = linha_editada[:134] + novo_nosso_numero_2 + linha_editada[146:]
-        
-        # Editar CODIGO_EMPRESA (posições 20-37, 17 caracteres)
-        if 'codigo_empresa' in detalhe and detalhe.get('_alterado', False):
-            novo_codigo_empresa = str(detalhe['codigo_empresa']).strip()
-            if novo_codigo_empresa:
-                # Ajustar para 17 caracteres (preencher com espaços à direita ou truncar)
-                novo_codigo_empresa = novo_codigo_empresa.ljust(17)[:17]
-                linha_editada = linha_editada[:20] + novo_codigo_empresa + linha_editada[37:]
-        
-        # Editar SEU_NUMERO (posições 116-126, 10 caracteres)
-        if 'seu_numero' in detalhe and detalhe.get('_alterado', False):
-            novo_seu_numero = str(detalhe['seu_numero']).strip()
-            # Para SEU_NUMERO, remover a barra e dígitos à direita se existirem
-            if '/' in novo_seu_numero:
-                novo_seu_numero = novo_seu_numero.split('/')[0]
-            
-            # Ajustar para 10 caracteres (preencher com espaços à direita ou truncar)
-            novo_seu_numero = novo_seu_numero.ljust(10)[:10]
-            linha_editada = linha_editada[:116] + novo_seu_numero + linha_editada[126:]
-        
-        # Restaurar quebra de linha original
-        return linha_editada + '\n'
-
-    def _zerar_juros_pontual(self, linha):
-        """
-        Zera os juros/multa de forma pontual, alterando apenas as posições específicas.
-        Posições 266-279 (13 caracteres) = juros/mora/multa
-        """
-        linha_editada = linha.rstrip('\n\r')  # Remove quebras de linha temporariamente
-        
-        # Garantir que a linha tenha pelo menos 400 caracteres
-        if len(linha_editada) < 400:
-            linha_editada = linha_editada.ljust(400)
-        
-        # Zerar juros/multa (posições 266-279)
-        if len(linha_editada) >= 279:
-            linha_editada = linha_editada[:266] + '0000000000000' + linha_editada[279:]
-        
-        # Restaurar quebra de linha original
-        return linha_editada + '\n'
-
     def _reconstruir_linha_cnab_sem_juros(self, detalhe, sequencial):
         """Reconstrói uma linha CNAB com base nos dados alterados e zera juros/multa"""
-        linha = ' ' * 400
-        
-        # Usar método existente de conversão Excel para CNAB
-        # Criar DataFrame temporário com um registro
-        df_temp = pd.DataFrame([detalhe])
-        
-        # Usar lógica similar ao excel_para_cnab mas para uma linha
-        # Tipo de registro
-        linha = '1' + linha[1:]
-        
-        # Código de inscrição
-        codigo_inscricao = detalhe.get('codigo_inscricao', '02')
-        linha = linha[:1] + str(codigo_inscricao).zfill(2)[:2] + linha[3:]
-        
-        # CNPJ
-        numero_inscricao = detalhe.get('numero_inscricao', '12345678000123')
-        linha = linha[:3] + str(numero_inscricao).ljust(14)[:14] + linha[17:]
-        
-        # Código da empresa
-        codigo_empresa = detalhe.get('codigo_empresa', '00000090368400035')
-        linha = linha[:20] + str(codigo_empresa).ljust(17)[:17] + linha[37:]
-        
-        # Nosso número
-        nosso_numero = str(detalhe.get('nosso_numero', '')).strip().zfill(12)[:12]
-        linha = linha[:70] + nosso_numero + linha[82:]
-        
-        # Nosso número 2
-        nosso_numero_2 = str(detalhe.get('nosso_numero_2', '')).strip().zfill(12)[:12]
-        linha = linha[:134] + nosso_numero_2 + linha[146:]
-        
-        # Carteira
-        carteira = str(detalhe.get('carteira', '09')).strip()[:2].zfill(2)
-        linha = linha[:107] + carteira + linha[109:]
-        
-        # Data de ocorrência
-        data_ocorrencia = self._converter_data_para_ddmmaa(detalhe.get('data_ocorrencia', ''))
-        linha = linha[:110] + data_ocorrencia + linha[116:]
-        
-        # Seu número
-        seu_numero = str(detalhe.get('seu_numero', '')).strip()[:10].ljust(10)
-        linha = linha[:116] + seu_numero + linha[126:]
-        
-        # Data de vencimento
-        data_vencimento = self._converter_data_para_ddmmaa(detalhe.get('data_vencimento', ''))
-        linha = linha[:146] + data_vencimento + linha[152:]
-        
-        # Valor do título
-        valor_titulo = detalhe.get('valor_titulo', 0)
-        valor_centavos = int(valor_titulo * 100) if valor_titulo else 0
-        linha = linha[:152] + str(valor_centavos).zfill(13) + linha[165:]
-        
-        # Banco e agência
-        linha = linha[:165] + '237' + linha[168:]  # Banco
-        linha = linha[:168] + '06254' + linha[173:]  # Agência
-        
-        # Valores diversos (incluindo zeramento de juros)
-        campos_monetarios = [
-            ('valor_tarifa', 175, 188),
-            ('valor_iof', 188, 201),
-            ('valor_abatimento', 227, 240),
-            ('descontos', 240, 253),
-            ('valor_principal', 253, 266),
-            ('juros_mora_multa', 266, 279, True),  # Marcar para zerar
-            ('outros_creditos', 279, 292)
-        ]
-        
-        for campo_info in campos_monetarios:
-            if len(campo_info) == 4:  # Campo marcado para zerar
-                campo, inicio, fim, zerar = campo_info
-                if zerar:
-                    valor_centavos = 0  # Forçar zero para juros/multa
-                else:
-                    valor = detalhe.get(campo, 0)
-                    valor_centavos = int(valor * 100) if valor else 0
-            else:
-                campo, inicio, fim = campo_info
-                valor = detalhe.get(campo, 0)
-                valor_centavos = int(valor * 100) if valor else 0
-            
-            linha = linha[:inicio] + str(valor_centavos).zfill(fim - inicio) + linha[fim:]
-        
-        # Data de crédito
-        data_credito = self._converter_data_para_ddmmaa(detalhe.get('data_credito', ''))
-        linha = linha[:295] + data_credito + linha[301:]
-        
-        # Sequencial
-        linha = linha[:394] + str(sequencial).zfill(6)
-        
-        return linha + '\n'
+        return self._reconstruir_linha_cnab(detalhe, sequencial, zerar_juros=True)
 
 
 def main():
@@ -1564,9 +1604,9 @@ def main():
         print(f"Arquivo não encontrado: {arquivo}")
         return
     
-    # Processar o arquivo
+    # Processar o arquivo (em paralelo, se for muito grande)
     processador = CNABBradesco(arquivo)
-    if processador.ler_arquivo():
+    if processador.ler_arquivo_automatico():
         processador.gerar_relatorio()
         
         # Perguntar se deseja gerar arquivo CNAB de retorno
@@ -1583,4 +1623,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QFileDialog, QTextEdit, QLabel, 
@@ -13,6 +14,10 @@ from PyQt5.QtGui import QFont, QIcon, QColor, QPalette, QPixmap
 import locale
 
 from cnab_bradesco import CNABBradesco
+from cnab_cache import CacheLeitura
+from cnab_layout import dataframe_em_reais
+from cnab_moeda import formatar_centavos
+from cnab_diario import DiarioEdicoes
 
 # Constantes de estilo - Tema Único
 TEMA_ATUAL = {
@@ -100,6 +105,7 @@ class EditorGraficoDialog(QDialog):
         self.processador = processador
         self.alteracoes_realizadas = False
         self.dados_editados = []
+        self.diario = DiarioEdicoes()  # Edições feitas neste editor, aplicadas ao salvar
         
         # Copiar dados originais
         self.dados_editados = [detalhe.copy() for detalhe in self.processador.detalhes]
@@ -824,7 +830,7 @@ class EditorGraficoDialog(QDialog):
             # Valor (apenas visualização)
             valor = detalhe.get('valor_titulo', 0)
             if isinstance(valor, (int, float)):
-                valor_formatado = f"R$ {valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+                valor_formatado = formatar_centavos(valor)
             else:
                 valor_formatado = str(valor)
             item_valor = QTableWidgetItem(valor_formatado)
@@ -940,6 +946,7 @@ class EditorGraficoDialog(QDialog):
             # Aplicar alteração
             self.dados_editados[linha][campo] = novo_valor
             self.dados_editados[linha]['_alterado'] = True
+            self.diario.registrar(linha, campo, novo_valor)
             self.alteracoes_realizadas = True
             
             # Atualizar interface
@@ -984,6 +991,7 @@ class EditorGraficoDialog(QDialog):
                 # Atualizar dados
                 self.dados_editados[i]['nosso_numero'] = novo_valor
                 self.dados_editados[i]['_alterado'] = True
+                self.diario.registrar(i, 'nosso_numero', novo_valor)
                 
                 # Atualizar tabela
                 item = self.tabela_edicao.item(i, 1)
@@ -1039,6 +1047,7 @@ class EditorGraficoDialog(QDialog):
                 # Atualizar dados
                 self.dados_editados[i]['nosso_numero_2'] = novo_valor
                 self.dados_editados[i]['_alterado'] = True
+                self.diario.registrar(i, 'nosso_numero_2', novo_valor)
                 
                 # Atualizar tabela
                 item = self.tabela_edicao.item(i, 2)
@@ -1094,6 +1103,7 @@ class EditorGraficoDialog(QDialog):
                 # Atualizar dados
                 self.dados_editados[i]['codigo_empresa'] = novo_valor
                 self.dados_editados[i]['_alterado'] = True
+                self.diario.registrar(i, 'codigo_empresa', novo_valor)
                 
                 # Atualizar tabela
                 item = self.tabela_edicao.item(i, 3)
@@ -1159,6 +1169,7 @@ class EditorGraficoDialog(QDialog):
                 # Atualizar dados
                 self.dados_editados[i]['seu_numero'] = novo_valor_completo
                 self.dados_editados[i]['_alterado'] = True
+                self.diario.registrar(i, 'seu_numero', novo_valor_completo)
                 
                 # Atualizar tabela
                 item = self.tabela_edicao.item(i, 4)
@@ -1238,10 +1249,15 @@ class EditorGraficoDialog(QDialog):
             )
             
             if caminho_novo:
-                # Usar método do processador para gerar novo arquivo
-                sucesso, mensagem = self.processador.gerar_cnab_editado(caminho_novo)
+                # Usar método do processador para gerar novo arquivo, com as edições
+                # anteriores do processador e as deste editor; o diário do processador
+                # só passa a incluí-las depois que o arquivo for gravado
+                diario = self.processador.diario.copy()
+                diario.mesclar(self.diario)
+                sucesso, mensagem = self.processador.gerar_cnab_editado(caminho_novo, diario=diario)
                 
                 if sucesso:
+                    self.processador.diario = diario
                     QMessageBox.information(self, "Alterações Salvas",
                         f"As alterações foram salvas com sucesso!\n\n"
                         f"Arquivo gerado: {os.path.basename(caminho_novo)}\n"
@@ -1317,8 +1333,11 @@ class EditorGraficoDialog(QDialog):
             )
             
             if caminho_novo:
-                # Usar novo método do processador para gerar arquivo sem juros
-                sucesso, mensagem = self.processador.gerar_cnab_editado_sem_juros(caminho_novo)
+                # Usar novo método do processador para gerar arquivo sem juros, com uma
+                # cópia do diário: como os detalhes, o diário do processador não muda
+                diario = self.processador.diario.copy()
+                diario.mesclar(self.diario)
+                sucesso, mensagem = self.processador.gerar_cnab_editado_sem_juros(caminho_novo, diario=diario)
                 
                 # Restaurar dados originais
                 for i, dados_original in dados_originais:
@@ -1643,6 +1662,7 @@ class EditorGraficoDialog(QDialog):
                 
                 self.dados_editados[i][campo] = novo_valor
                 self.dados_editados[i]['_alterado'] = True
+                self.diario.registrar(i, campo, novo_valor)
                 
                 # Atualizar tabela
                 item = self.tabela_edicao.item(i, coluna_tabela)
@@ -2117,6 +2137,19 @@ class CNABBradescoGUI(QMainWindow):
         btn_selecionar.setMinimumWidth(150)
         arquivo_container.addWidget(btn_selecionar)
         
+        # Cache em disco das leituras (opcional: guarda os dados do retorno sem criptografia)
+        self.configuracoes = QSettings("CNAB Bradesco", "Leitor CNAB 400")
+        self.chk_cache = QCheckBox("Usar cache de leitura")
+        self.chk_cache.setChecked(self.configuracoes.value("usar_cache", False, type=bool))
+        self.chk_cache.setToolTip(f"Guarda as leituras em {CacheLeitura().diretorio} para reabrir "
+                                  "retornos mais rápido. Os dados do retorno ficam gravados sem criptografia.")
+        self.chk_cache.toggled.connect(lambda marcado: self.configuracoes.setValue("usar_cache", marcado))
+        arquivo_container.addWidget(self.chk_cache)
+        
+        btn_limpar_cache = EstiloBotao("Limpar Cache", False)
+        btn_limpar_cache.clicked.connect(self.limpar_cache)
+        arquivo_container.addWidget(btn_limpar_cache)
+        
         layout_controles.addLayout(arquivo_container)
         
         # Container para botões de ação
@@ -2291,6 +2324,12 @@ class CNABBradescoGUI(QMainWindow):
             self.lbl_tabela.setText("Arquivo selecionado. Clique em 'Processar Arquivo' para continuar.")
             self.status_bar.showMessage(f"Arquivo selecionado: {os.path.basename(arquivo)}")
             
+    def limpar_cache(self):
+        """Apaga as leituras guardadas no cache em disco"""
+        cache = CacheLeitura()
+        cache.limpar()
+        self.status_bar.showMessage(f"Cache de leitura apagado: {cache.diretorio}")
+    
     def processar_arquivo(self):
         if not self.arquivo_atual or not os.path.exists(self.arquivo_atual):
             QMessageBox.warning(self, "Arquivo Inválido", "Por favor, selecione um arquivo válido primeiro.")
@@ -2301,14 +2340,13 @@ class CNABBradescoGUI(QMainWindow):
             self.progresso.setValue(10)
         
             # Processar o arquivo CNAB
-            processador = CNABBradesco(self.arquivo_atual)
+            processador = CNABBradesco(self.arquivo_atual, usar_cache=self.chk_cache.isChecked())
             self.processador = processador  # Atribuir à propriedade da classe
-            if processador.ler_arquivo():
+            # Leitura colunar: o DataFrame é montado direto do arquivo, sem dicionários por registro
+            self.df = processador.dataframe_detalhes()
+            if processador.header is not None or not self.df.empty:
                 self.progresso.setValue(50)
                 
-                # Converter para DataFrame para a tabela
-                self.df = pd.DataFrame(processador.detalhes)
-                
                 # Preencher tabela
                 self.preencher_tabela()
                 
@@ -2349,8 +2387,8 @@ class CNABBradescoGUI(QMainWindow):
             self.tabela.setColumnCount(len(self.df.columns))
             self.tabela.setHorizontalHeaderLabels(self.df.columns)
             
-            # Preencher a tabela com os dados do DataFrame
-            for row_idx, row in self.df.iterrows():
+            # Preencher a tabela com os dados do DataFrame (valores exibidos em reais)
+            for row_idx, row in dataframe_em_reais(self.df).iterrows():
                 self.tabela.insertRow(row_idx)
                 for col_idx, value in enumerate(row):
                     item = QTableWidgetItem(str(value))
@@ -2401,7 +2439,7 @@ class CNABBradescoGUI(QMainWindow):
                     nome_arquivo += '.csv'
                     
                 # Exportar para CSV
-                self.df.to_csv(nome_arquivo, index=False, sep=';', encoding='utf-8')
+                dataframe_em_reais(self.df).to_csv(nome_arquivo, index=False, sep=';', encoding='utf-8')
                 
                 self.status_bar.showMessage(f"Arquivo exportado com sucesso: {os.path.basename(nome_arquivo)}")
                 QMessageBox.information(self, "Exportação Concluída", 
@@ -2430,7 +2468,7 @@ class CNABBradescoGUI(QMainWindow):
                     nome_arquivo += '.xlsx'
                     
                 # Exportar para Excel
-                self.df.to_excel(nome_arquivo, index=False, engine='openpyxl')
+                dataframe_em_reais(self.df).to_excel(nome_arquivo, index=False, engine='openpyxl')
                 
                 self.status_bar.showMessage(f"Arquivo exportado com sucesso: {os.path.basename(nome_arquivo)}")
                 QMessageBox.information(self, "Exportação Concluída", 
@@ -2662,7 +2700,14 @@ class CNABBradescoGUI(QMainWindow):
         """Abre o editor gráfico de arquivos CNAB"""
         try:
             # Verificar se há um arquivo carregado
-            if not hasattr(self, 'processador') or not self.processador or not self.processador.detalhes:
+            if not hasattr(self, 'processador') or not self.processador:
+                QMessageBox.warning(self, "Nenhum Arquivo", "Por favor, carregue um arquivo CNAB primeiro.")
+                return
+            
+            # A tabela é lida no modo colunar; os registros editáveis são carregados sob demanda
+            if not self.processador.detalhes:
+                self.processador.ler_arquivo()
+            if not self.processador.detalhes:
                 QMessageBox.warning(self, "Nenhum Arquivo", "Por favor, carregue um arquivo CNAB primeiro.")
                 return
             
@@ -2794,15 +2839,19 @@ class CNABBradescoGUI(QMainWindow):
                     info_grid.addWidget(valor_empresa, 2, 1)
             
             # Quantidade de títulos
-            qtd_titulos = len(processador.detalhes)
+            df = self.df if self.df is not None else pd.DataFrame()
+            qtd_titulos = len(df)
             self.valor_registros.setText(str(qtd_titulos))
             
-            # Cálculos financeiros
-            valor_total = sum(float(detalhe.get('valor_titulo', 0)) for detalhe in processador.detalhes)
-            valor_juros = sum(float(detalhe.get('valor_juros', 0)) for detalhe in processador.detalhes)
-            valor_multa = sum(float(detalhe.get('valor_multa', 0)) for detalhe in processador.detalhes)
-            valor_desconto = sum(float(detalhe.get('valor_desconto', 0)) for detalhe in processador.detalhes)
-            valor_pago = sum(float(detalhe.get('valor_pago', 0)) for detalhe in processador.detalhes)
+            # Cálculos financeiros (somas vetorizadas, em centavos, sobre as colunas do DataFrame)
+            def somar(coluna):
+                return int(df[coluna].sum()) if coluna in df.columns else 0
+            
+            valor_total = somar('valor_titulo')
+            valor_juros = somar('valor_juros')
+            valor_multa = somar('valor_multa')
+            valor_desconto = somar('valor_desconto')
+            valor_pago = somar('valor_pago')
             valor_principal = valor_total - valor_juros - valor_multa
             
             # Atualizar labels com formatação monetária
@@ -2873,10 +2922,10 @@ class CNABBradescoGUI(QMainWindow):
             estatisticas_grid.setColumnStretch(1, 1)
             
             # Análise de ocorrências
-            ocorrencias = {}
-            for detalhe in processador.detalhes:
-                cod = detalhe.get('cod_ocorrencia', '00')
-                ocorrencias[cod] = ocorrencias.get(cod, 0) + 1
+            if 'cod_ocorrencia' in df.columns:
+                ocorrencias = df['cod_ocorrencia'].value_counts().to_dict()
+            else:
+                ocorrencias = {'00': qtd_titulos} if qtd_titulos else {}
             
             # Mapeamento de códigos de ocorrência para descrições
             mapa_ocorrencias = {
@@ -3148,8 +3197,8 @@ class CNABBradescoGUI(QMainWindow):
         layout.addWidget(container_principal, 1)
 
     def formatar_moeda(self, valor):
-        """Formata um valor para o padrão monetário brasileiro"""
-        return f"R$ {valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+        """Formata um valor em centavos para o padrão monetário brasileiro"""
+        return formatar_centavos(valor)
 
 
 def main():
@@ -3164,4 +3213,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
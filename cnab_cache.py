@@ -0,0 +1,234 @@
+"""
+Cache em disco das leituras de retornos CNAB 400.
+
+O mesmo retorno costuma ser aberto várias vezes (interface gráfica, processamento
+em lote). O resultado da leitura é guardado em um arquivo .npz (vetores NumPy sem
+compressão, carregados em poucos milissegundos) cujo nome é formado pelo hash do
+conteúdo do arquivo, pela codificação e pela assinatura do leitor (versão e
+layouts). Qualquer alteração no arquivo ou no layout gera outra chave, de modo
+que entradas antigas nunca são usadas e acabam removidas pelo limite de tamanho
+(as menos usadas recentemente saem primeiro).
+
+Falhas no cache (diretório sem permissão, entrada corrompida...) nunca impedem a
+leitura: a entrada é ignorada e o arquivo é lido normalmente.
+
+As entradas contêm os dados do retorno (CNPJ, nosso número, valores, header e
+trailer) sem criptografia, por isso o cache só é usado quando pedido:
+CNABBradesco(arquivo, usar_cache=True), a opção "Usar cache de leitura" da
+interface gráfica ou --cache em processar_lote.py e monitorar_pasta.py. Ficam em
+%LOCALAPPDATA%/cnab_bradesco (Windows) ou ~/.cache/cnab_bradesco e podem ser
+apagadas com:
+    python cnab_cache.py --limpar
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from cnab_layout import LAYOUT_HEADER, LAYOUT_DETALHE, LAYOUT_TRAILER, CODIFICACAO_PADRAO, decodificar_texto
+from cnab_colunar import decodificar_registros, localizar_linhas
+from cnab_registro import RegistroDetalhe, decodificar_buffer, registros_de_posicoes
+
+# Incrementar sempre que a decodificação mudar de forma que o layout não reflita
+VERSAO_LEITOR = 1
+
+# Tamanho máximo do diretório de cache (bytes)
+TAMANHO_MAXIMO_CACHE = 512 * 1024 * 1024
+
+_EXTENSAO = '.npz'
+_METADADOS = '__metadados'
+
+# Muda quando o leitor ou qualquer um dos layouts muda, invalidando o cache
+_ASSINATURA_LEITOR = hashlib.sha1(
+    repr((VERSAO_LEITOR, LAYOUT_HEADER, LAYOUT_DETALHE, LAYOUT_TRAILER)).encode('utf-8')
+).hexdigest()[:12]
+
+
+def diretorio_cache_padrao():
+    """Diretório de cache do usuário (LOCALAPPDATA no Windows, ~/.cache nos demais)"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'cnab_bradesco')
+
+
+class CacheLeitura:
+    """Entradas do cache: metadados (JSON) e vetores NumPy, com remoção LRU por tamanho"""
+
+    def __init__(self, diretorio=None, tamanho_maximo=TAMANHO_MAXIMO_CACHE):
+        self.diretorio = diretorio or diretorio_cache_padrao()
+        self.tamanho_maximo = tamanho_maximo
+
+    def chave(self, dados, codificacao, tipo):
+        """Chave da leitura 'tipo' para o conteúdo (bytes) do arquivo"""
+        conteudo = hashlib.sha1(dados).hexdigest()
+        return f"{conteudo}-{_ASSINATURA_LEITOR}-{codificacao}-{tipo}"
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave + _EXTENSAO)
+
+    def obter(self, chave):
+        """Retorna (metadados, vetores) da entrada ou None se não existir ou estiver inválida"""
+        caminho = self._caminho(chave)
+        try:
+            with np.load(caminho, allow_pickle=False) as arquivo:
+                vetores = {nome: arquivo[nome] for nome in arquivo.files}
+            metadados = json.loads(vetores.pop(_METADADOS).tobytes().decode('utf-8'))
+            os.utime(caminho)  # Marca a entrada como usada recentemente
+        except (OSError, ValueError, KeyError, EOFError):
+            return None
+        return metadados, vetores
+
+    def guardar(self, chave, metadados, vetores):
+        """Grava a entrada (de forma atômica) e remove as menos usadas acima do limite"""
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            vetores = dict(vetores)
+            vetores[_METADADOS] = np.frombuffer(json.dumps(metadados).encode('utf-8'), dtype=np.uint8)
+            descritor, temporario = tempfile.mkstemp(suffix=_EXTENSAO, dir=self.diretorio)
+            try:
+                with os.fdopen(descritor, 'wb') as arquivo:
+                    np.savez(arquivo, **vetores)
+                os.replace(temporario, self._caminho(chave))
+            except BaseException:
+                os.remove(temporario)
+                raise
+            self.limitar_tamanho()
+        except (OSError, ValueError):
+            pass
+
+    def limitar_tamanho(self):
+        """Remove as entradas usadas há mais tempo até o cache caber em tamanho_maximo"""
+        entradas = []
+        with os.scandir(self.diretorio) as itens:
+            for item in itens:
+                if item.name.endswith(_EXTENSAO) and item.is_file():
+                    estado = item.stat()
+                    entradas.append((estado.st_mtime, estado.st_size, item.path))
+
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for _, tamanho, caminho in sorted(entradas):
+            if total <= self.tamanho_maximo:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+
+    def limpar(self):
+        """Remove todas as entradas do cache"""
+        tamanho_maximo = self.tamanho_maximo
+        self.tamanho_maximo = 0
+        try:
+            self.limitar_tamanho()
+        except OSError:
+            pass
+        finally:
+            self.tamanho_maximo = tamanho_maximo
+
+
+def _ler_bytes(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return arquivo.read()
+
+
+def carregar_registros_em_cache(caminho, codificacao=CODIFICACAO_PADRAO, cache=None):
+    """
+    Como cnab_registro.carregar_registros, consultando o cache antes de percorrer o arquivo.
+
+    O cache guarda header, trailer e as posições das linhas de detalhe; os registros
+    continuam apoiados no buffer do arquivo e decodificados sob demanda.
+    """
+    cache = cache or CacheLeitura()
+    dados = _ler_bytes(caminho)
+    chave = cache.chave(dados, codificacao, 'registros')
+
+    entrada = cache.obter(chave)
+    if entrada is not None:
+        metadados, vetores = entrada
+        detalhes = registros_de_posicoes(dados, vetores['inicios'].tolist(), vetores['fins'].tolist(),
+                                         vetores['linhas_detalhe'].tolist(), codificacao)
+        return metadados['header'], detalhes, metadados['trailer']
+
+    header, detalhes, trailer = decodificar_buffer(dados, codificacao)
+
+    # Detalhes decodificados como texto (caracteres multibyte) não têm posição fixa no buffer
+    if all(isinstance(detalhe, RegistroDetalhe) for detalhe in detalhes):
+        compartilhado = detalhes[0]._arquivo if detalhes else None
+        vetores = {
+            'inicios': np.array(compartilhado.inicios if compartilhado else [], dtype=np.int64),
+            'fins': np.array(compartilhado.fins if compartilhado else [], dtype=np.int64),
+            'linhas_detalhe': np.array([detalhe._linha for detalhe in detalhes], dtype=np.int64),
+        }
+        cache.guardar(chave, {'header': header, 'trailer': trailer}, vetores)
+    return header, detalhes, trailer
+
+
+def ler_colunar_em_cache(caminho, incluir_linha_original=False, codificacao=CODIFICACAO_PADRAO,
+                         cache=None, leitor=None, dados=None):
+    """
+    Como cnab_colunar.ler_colunar, consultando o cache antes de decodificar as colunas.
+
+    'leitor', se informado, faz a leitura em caso de ausência no cache (ex.:
+    cnab_paralelo.ler_colunar_paralelo). 'linha_original' não é guardada: quando
+    pedida, é recortada do próprio arquivo pelas posições dos detalhes. 'dados' é
+    o conteúdo do arquivo, se já tiver sido lido (evita lê-lo de novo).
+    """
+    cache = cache or CacheLeitura()
+    if dados is None:
+        dados = _ler_bytes(caminho)
+    chave = cache.chave(dados, codificacao, 'colunas')
+
+    entrada = cache.obter(chave)
+    if entrada is not None:
+        metadados, colunas = entrada
+        header, trailer = metadados['header'], metadados['trailer']
+    elif leitor is not None:
+        header, colunas, trailer = leitor(caminho, codificacao=codificacao)
+    else:
+        header, colunas, trailer = decodificar_registros(np.frombuffer(dados, dtype=np.uint8),
+                                                         codificacao=codificacao)
+
+    inicios, fins = colunas.pop('inicios_detalhe', None), colunas.pop('fins_detalhe', None)
+    if inicios is None:
+        # Posições das linhas de detalhe, na mesma ordem das colunas
+        bytes_arquivo = np.frombuffer(dados, dtype=np.uint8)
+        inicios, fins = localizar_linhas(bytes_arquivo)
+        eh_detalhe = bytes_arquivo[inicios] == ord('1')
+        inicios, fins = inicios[eh_detalhe], fins[eh_detalhe]
+        if entrada is None:
+            cache.guardar(chave, {'header': header, 'trailer': trailer},
+                          dict(colunas, inicios_detalhe=inicios, fins_detalhe=fins))
+
+    if incluir_linha_original:
+        linhas = [decodificar_texto(dados[inicio:fim], codificacao).strip()
+                  for inicio, fim in zip(inicios.tolist(), fins.tolist())]
+        colunas['linha_original'] = np.array(linhas, dtype=object)
+    return header, colunas, trailer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cache em disco das leituras de retornos CNAB 400')
+    parser.add_argument('--limpar', action='store_true', help='Apaga todas as entradas do cache')
+    args = parser.parse_args(argv)
+
+    cache = CacheLeitura()
+    if args.limpar:
+        cache.limpar()
+        print(f"Cache apagado: {cache.diretorio}")
+    else:
+        tamanho = 0
+        if os.path.isdir(cache.diretorio):
+            with os.scandir(cache.diretorio) as itens:
+                tamanho = sum(item.stat().st_size for item in itens
+                              if item.name.endswith(_EXTENSAO) and item.is_file())
+        print(f"Cache de leitura: {cache.diretorio} ({tamanho / 1024 / 1024:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+Leitura colunar (NumPy) de arquivos de retorno CNAB 400.
+
+O arquivo inteiro é carregado como um vetor uint8 e organizado em uma matriz
+(registros x 400 bytes). Cada campo do layout de detalhe é então decodificado
+em uma única operação vetorizada por coluna, sem laços Python por registro,
+e o resultado pode ser entregue diretamente ao pandas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from cnab_layout import (TAMANHO_REGISTRO, LAYOUT_DETALHE, ALFA, VALOR, DATA, QUANTIDADE, ZERADO,
+                         CODIFICACAO_PADRAO, decodificar_header, decodificar_detalhe, decodificar_trailer,
+                         decodificar_texto, formatar_data)
+
+_ESPACO = ord(' ')
+_ZERO = ord('0')
+
+# Registros copiados por vez ao montar a matriz de arquivos irregulares
+_BLOCO_MATRIZ = 10000
+
+
+def localizar_linhas(dados):
+    """Início e fim (sem terminador) de cada linha não vazia do arquivo"""
+    if dados.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    quebras = np.flatnonzero(dados == ord('\n'))
+    inicios = np.concatenate(([0], quebras + 1))
+    fins = np.concatenate((quebras, [dados.size]))
+
+    # Remover o '\r' das quebras de linha no padrão Windows
+    fins = fins - ((fins > inicios) & (dados[np.maximum(fins - 1, 0)] == ord('\r')))
+
+    preenchidas = fins > inicios
+    return inicios[preenchidas], fins[preenchidas]
+
+
+def linhas_multibyte(dados, inicios, fins, codificacao=CODIFICACAO_PADRAO):
+    """
+    Índices (em inicios/fins) das linhas com caracteres de mais de um byte na
+    codificação (ex.: UTF-8 acentuado).
+
+    Nessas linhas a posição em bytes não é a posição no texto: os campos precisam
+    ser recortados do texto decodificado, como na leitura linha a linha. Bytes
+    acima de 0x7F com um caractere cada (latin-1, cp1252) não contam.
+    """
+    vetor = dados if isinstance(dados, np.ndarray) else np.frombuffer(dados, dtype=np.uint8)
+    if vetor.size == 0 or vetor.max() < 0x80:
+        return np.empty(0, dtype=np.int64)
+
+    altos = np.flatnonzero(vetor >= 0x80)
+    linhas = np.searchsorted(inicios, altos, side='right') - 1
+    dentro = (linhas >= 0) & (altos < np.asarray(fins)[np.maximum(linhas, 0)])
+    multibyte = []
+    for linha in np.unique(linhas[dentro]).tolist():
+        inicio, fim = int(inicios[linha]), int(fins[linha])
+        if len(decodificar_texto(vetor[inicio:fim].tobytes(), codificacao)) != fim - inicio:
+            multibyte.append(linha)
+    return np.array(multibyte, dtype=np.int64)
+
+
+def carregar_matriz(caminho, codificacao=CODIFICACAO_PADRAO):
+    """Carrega o arquivo como matriz uint8 de forma (registros, 400); ver montar_matriz"""
+    return montar_matriz(np.fromfile(caminho, dtype=np.uint8), codificacao)
+
+
+def montar_matriz(dados, codificacao=CODIFICACAO_PADRAO, incluir_linhas=True):
+    """
+    Organiza os bytes de um arquivo (ou de um trecho alinhado em registros) em
+    uma matriz uint8 de forma (registros, 400).
+
+    Linhas vazias são descartadas e linhas curtas são completadas com espaços.
+    Quando todas as linhas têm 400 bytes e o mesmo terminador, a matriz é uma
+    visão sem cópia sobre os bytes lidos. Retorna (matriz, linhas), em que
+    linhas é None nesse caso ou, para arquivos irregulares, a lista com o
+    texto completo de cada linha (usada em 'linha_original'), se incluir_linhas.
+    """
+    inicios, fins = localizar_linhas(dados)
+    quantidade = inicios.size
+    if quantidade == 0:
+        return np.empty((0, TAMANHO_REGISTRO), dtype=np.uint8), None
+
+    tamanhos = fins - inicios
+    passo = int(inicios[1] - inicios[0]) if quantidade > 1 else TAMANHO_REGISTRO
+    regular = (
+        np.all(tamanhos == TAMANHO_REGISTRO)
+        and inicios[0] == 0
+        and np.all(inicios == np.arange(quantidade) * passo)
+    )
+    if regular:
+        matriz = np.lib.stride_tricks.as_strided(
+            dados, shape=(quantidade, TAMANHO_REGISTRO), strides=(passo, 1), writeable=False)
+        return matriz, None
+
+    # Arquivo irregular: copiar em blocos, completando as linhas curtas com espaços
+    matriz = np.full((quantidade, TAMANHO_REGISTRO), _ESPACO, dtype=np.uint8)
+    colunas = np.arange(TAMANHO_REGISTRO)
+    for inicio_bloco in range(0, quantidade, _BLOCO_MATRIZ):
+        fatia = slice(inicio_bloco, inicio_bloco + _BLOCO_MATRIZ)
+        posicoes = inicios[fatia, None] + colunas
+        dentro = colunas < np.minimum(tamanhos[fatia, None], TAMANHO_REGISTRO)
+        matriz[fatia] = np.where(dentro, dados[np.minimum(posicoes, dados.size - 1)], _ESPACO)
+
+    if not incluir_linhas:
+        return matriz, None
+    bytes_arquivo = dados.tobytes()
+    linhas = [decodificar_texto(bytes_arquivo[inicio:fim], codificacao).strip() for inicio, fim in zip(inicios, fins)]
+    return matriz, linhas
+
+
+def decodificar_inteiros(bloco):
+    """
+    Converte uma coluna de dígitos ASCII (n x largura) em inteiros int64.
+
+    Segue as regras de float(): espaços são aceitos apenas antes ou depois dos
+    dígitos; campos em branco ou com outros caracteres resultam em 0.
+    """
+    largura = bloco.shape[1]
+    digitos = bloco.astype(np.int64) - _ZERO
+    eh_digito = (digitos >= 0) & (digitos <= 9)
+    eh_espaco = bloco == _ESPACO
+
+    qtd_digitos = eh_digito.sum(axis=1)
+    primeiro = eh_digito.argmax(axis=1)
+    ultimo = largura - 1 - eh_digito[:, ::-1].argmax(axis=1)
+    validos = (
+        (qtd_digitos > 0)
+        & (eh_digito | eh_espaco).all(axis=1)
+        & (ultimo - primeiro + 1 == qtd_digitos)  # Sem espaços entre os dígitos
+    )
+
+    digitos[~eh_digito] = 0
+    pesos = 10 ** np.arange(largura - 1, -1, -1, dtype=np.int64)
+    valores = (digitos @ pesos) // 10 ** (largura - 1 - ultimo)  # Descontar espaços à direita
+    valores[~validos] = 0
+    return valores
+
+
+def decodificar_textos(bloco, codificacao=CODIFICACAO_PADRAO):
+    """Converte uma coluna de bytes (n x largura) em um vetor de str"""
+    largura = bloco.shape[1]
+    brutos = np.ascontiguousarray(bloco).view(f'S{largura}').ravel()
+    try:
+        return brutos.astype(f'U{largura}')  # Conversão direta, válida para ASCII
+    except UnicodeDecodeError:
+        # Só os valores distintos passam pela codificação (com cp1252 para bytes inválidos)
+        distintos, posicoes = np.unique(brutos, return_inverse=True)
+        convertidos = np.array([decodificar_texto(texto, codificacao) for texto in distintos], dtype=f'U{largura}')
+        return convertidos[posicoes.ravel()]
+
+
+def decodificar_datas(bloco, codificacao=CODIFICACAO_PADRAO):
+    """
+    Converte uma coluna DDMMAA (n x 6) para DD/MM/AAAA com formatar_data.
+
+    Cada data distinta é convertida uma única vez (e fica no cache de formatar_data);
+    campos em branco resultam em "" e datas inválidas são mantidas como estão.
+    """
+    brutos = np.ascontiguousarray(bloco).view(f'S{bloco.shape[1]}').ravel()
+    distintas, posicoes = np.unique(brutos, return_inverse=True)
+    convertidas = np.array([formatar_data(decodificar_texto(data, codificacao)) for data in distintas], dtype='U10')
+    return convertidas[posicoes.ravel()]
+
+
+def decodificar_colunas(matriz, campos=LAYOUT_DETALHE, linhas=None, incluir_linha_original=False,
+                        codificacao=CODIFICACAO_PADRAO):
+    """
+    Decodifica os campos do layout a partir da matriz de registros, uma coluna por vez.
+
+    Valores são convertidos direto dos dígitos ASCII; apenas as colunas de texto
+    usam 'codificacao'. linhas, quando informado, traz o texto completo de cada
+    registro para 'linha_original'.
+    """
+    colunas = {}
+    for nome, inicio, fim, tipo in campos:
+        bloco = matriz[:, inicio:fim]
+        if tipo == VALOR:
+            colunas[nome] = decodificar_inteiros(bloco)  # Centavos (int64)
+        elif tipo == DATA:
+            colunas[nome] = decodificar_datas(bloco, codificacao)
+        elif tipo == ZERADO:
+            colunas[nome] = np.zeros(matriz.shape[0], dtype=np.int64)
+        elif tipo == QUANTIDADE:
+            textos = decodificar_textos(bloco, codificacao)
+            colunas[nome] = np.where(np.char.strip(textos) == '', '0', textos)
+        elif tipo == ALFA:
+            colunas[nome] = decodificar_textos(bloco, codificacao)
+        else:
+            raise ValueError(f"Tipo de campo desconhecido para '{nome}': {tipo}")
+
+    if incluir_linha_original:
+        if linhas is not None:
+            colunas['linha_original'] = np.array(linhas, dtype=object)
+        else:
+            colunas['linha_original'] = np.char.strip(decodificar_textos(matriz, codificacao))
+    return colunas
+
+
+def ler_colunar(caminho, incluir_linha_original=False, codificacao=CODIFICACAO_PADRAO):
+    """
+    Lê o arquivo no modo colunar.
+
+    Retorna (header, colunas, trailer): header e trailer como dicionários (os mesmos
+    de CNABBradesco) e colunas como dicionário nome -> vetor NumPy dos detalhes.
+    """
+    return decodificar_registros(np.fromfile(caminho, dtype=np.uint8), incluir_linha_original, codificacao)
+
+
+def decodificar_registros(dados, incluir_linha_original=False, codificacao=CODIFICACAO_PADRAO):
+    """
+    Decodifica os registros de um vetor de bytes (arquivo inteiro ou trecho); ver ler_colunar.
+
+    Linhas com caracteres de mais de um byte (linhas_multibyte) são decodificadas
+    como texto, campo a campo pelo layout, e sobrescrevem o que a matriz de bytes
+    daria para elas.
+    """
+    matriz, linhas = montar_matriz(dados, codificacao, incluir_linhas=incluir_linha_original)
+    tipos = matriz[:, 0]
+
+    textos = {}
+    if dados.size and dados.max() >= 0x80:
+        inicios, fins = localizar_linhas(dados)  # Mesmas linhas (e ordem) da matriz
+        for indice in linhas_multibyte(dados, inicios, fins, codificacao).tolist():
+            textos[indice] = decodificar_texto(dados[inicios[indice]:fins[indice]].tobytes(), codificacao).strip()
+
+    def linha(indice):
+        if indice in textos:
+            return textos[indice]
+        if linhas is not None:
+            return linhas[indice]
+        return decodificar_texto(bytes(matriz[indice]), codificacao).strip()
+
+    header = None
+    trailer = None
+    indices_header = np.flatnonzero(tipos == ord('0'))
+    indices_trailer = np.flatnonzero(tipos == ord('9'))
+    if indices_header.size:
+        header = decodificar_header(linha(indices_header[-1]))
+    if indices_trailer.size:
+        trailer = decodificar_trailer(linha(indices_trailer[-1]))
+
+    eh_detalhe = tipos == ord('1')
+    linhas_detalhe = None
+    if linhas is not None and incluir_linha_original:
+        linhas_detalhe = [linhas[i] for i in np.flatnonzero(eh_detalhe)]
+    colunas = decodificar_colunas(matriz[eh_detalhe], linhas=linhas_detalhe,
+                                  incluir_linha_original=incluir_linha_original, codificacao=codificacao)
+
+    # Detalhes multibyte: campos recortados do texto, como na leitura linha a linha
+    if textos:
+        posicoes = np.cumsum(eh_detalhe) - 1  # Linha da matriz -> posição entre os detalhes
+        if incluir_linha_original:
+            colunas['linha_original'] = colunas['linha_original'].astype(object)
+        for indice, texto in textos.items():
+            if not eh_detalhe[indice]:
+                continue
+            for nome, valor in decodificar_detalhe(texto).items():
+                if nome in colunas:
+                    colunas[nome][posicoes[indice]] = valor
+    return header, colunas, trailer
+
+
+def colunas_para_dataframe(colunas):
+    """Monta o DataFrame diretamente a partir dos vetores, sem passar por dicionários por registro"""
+    return pd.DataFrame(colunas, copy=False)
@@ -0,0 +1,134 @@
+"""
+Diário de edições de um retorno CNAB 400.
+
+As edições feitas nos editores não precisam mais ficar espalhadas em registros
+marcados com '_alterado': cada uma é anotada como (registro, campo, valor), em
+que registro é a posição do detalhe no arquivo (0 para o primeiro). O diário
+pode ser salvo em disco (JSON), carregado, mesclado com outro e reaplicado, por
+exemplo, às mesmas correções de um retorno baixado novamente.
+
+O diário é aplicado pela etapa cnab_transformacao.EdicoesPontuais, que sobrescreve
+apenas os bytes dos campos anotados, na mesma passagem pelo arquivo que as
+demais transformações.
+"""
+
+import json
+
+from cnab_layout import CODIFICACAO_PADRAO
+
+VERSAO_DIARIO = 1
+
+
+def _numero(largura):
+    """Identificador numérico: zeros à esquerda; vazio mantém o valor do arquivo"""
+    def formatar(valor):
+        valor = str(valor).strip()
+        return valor.zfill(largura)[:largura] if valor else None
+    return formatar
+
+
+def _texto(largura):
+    """Texto alinhado à esquerda com espaços; vazio mantém o valor do arquivo"""
+    def formatar(valor):
+        valor = str(valor).strip()
+        return valor.ljust(largura)[:largura] if valor else None
+    return formatar
+
+
+def _seu_numero(valor):
+    """Seu número sem a barra e os dígitos à direita dela (vazio limpa o campo)"""
+    valor = str(valor).strip().split('/')[0]
+    return valor.ljust(10)[:10]
+
+
+# Campos do detalhe que podem ser editados: nome -> (início, fim, formatação)
+CAMPOS_EDITAVEIS = {
+    'codigo_empresa': (20, 37, _texto(17)),
+    'nosso_numero': (70, 82, _numero(12)),
+    'seu_numero': (116, 126, _seu_numero),
+    'nosso_numero_2': (134, 146, _numero(12)),
+}
+
+
+class DiarioEdicoes:
+    """Edições pendentes (registro, campo, valor); a última edição de um mesmo campo prevalece"""
+
+    def __init__(self, edicoes=()):
+        self._edicoes = {}  # (registro, campo) -> valor, na ordem em que foram feitas
+        for registro, campo, valor in edicoes:
+            self.registrar(registro, campo, valor)
+
+    def registrar(self, registro, campo, valor):
+        """Anota uma edição; campos fora de CAMPOS_EDITAVEIS são recusados"""
+        if campo not in CAMPOS_EDITAVEIS:
+            raise KeyError(f"Campo não editável: {campo}")
+        if registro < 0:
+            raise IndexError(f"Registro inválido: {registro}")
+        chave = (int(registro), campo)
+        self._edicoes.pop(chave, None)  # Reanotar move a edição para o fim
+        self._edicoes[chave] = str(valor)
+
+    def mesclar(self, outro):
+        """Acrescenta as edições de outro diário, que prevalecem sobre as deste"""
+        for registro, campo, valor in outro:
+            self.registrar(registro, campo, valor)
+        return self
+
+    def copy(self):
+        return DiarioEdicoes(self)
+
+    def limpar(self):
+        self._edicoes.clear()
+
+    def __iter__(self):
+        for (registro, campo), valor in self._edicoes.items():
+            yield registro, campo, valor
+
+    def __len__(self):
+        return len(self._edicoes)
+
+    def __bool__(self):
+        return bool(self._edicoes)
+
+    def registros(self):
+        """Posições dos registros com alguma edição, em ordem"""
+        return sorted({registro for registro, _ in self._edicoes})
+
+    def salvar(self, caminho):
+        """Grava o diário em JSON"""
+        conteudo = {
+            'versao': VERSAO_DIARIO,
+            'edicoes': [[registro, campo, valor] for registro, campo, valor in self],
+        }
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(conteudo, arquivo, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Lê um diário gravado por salvar()"""
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            conteudo = json.load(arquivo)
+        if conteudo.get('versao') != VERSAO_DIARIO:
+            raise ValueError(f"Versão de diário não suportada: {conteudo.get('versao')}")
+        return cls(conteudo['edicoes'])
+
+    def trechos_por_registro(self, codificacao=CODIFICACAO_PADRAO):
+        """
+        Registro -> lista de (início, fim, bytes) a gravar, já formatados.
+
+        Valores que não ocupam exatamente a largura do campo na codificação
+        (ex.: caracteres de mais de um byte em UTF-8) geram ValueError, pois
+        deslocariam os campos seguintes.
+        """
+        trechos = {}
+        for (registro, campo), valor in self._edicoes.items():
+            inicio, fim, formatar = CAMPOS_EDITAVEIS[campo]
+            texto = formatar(valor)
+            if texto is None:
+                continue
+            conteudo = texto.encode(codificacao)
+            if len(conteudo) != fim - inicio:
+                raise ValueError(f"Valor '{valor}' de {campo} (registro {registro + 1}) "
+                                 f"não ocupa {fim - inicio} bytes em {codificacao}")
+            trechos.setdefault(registro, []).append((inicio, fim, conteudo))
+        return trechos
@@ -0,0 +1,95 @@
+"""
+Exportação em leque: vários destinos alimentados por uma única leitura.
+
+CNABBradesco.exportar(destinos) lê o arquivo uma vez (bytes), decodifica os
+detalhes uma vez (leitura colunar) e entrega o resultado a cada destino
+registrado: CSV, Excel, retorno sem juros e resumo em JSON. Nenhum destino lê o
+arquivo de novo; em um lote de centenas de arquivos isso elimina as leituras e
+decodificações repetidas de cada exportação.
+
+Um destino é qualquer objeto com exportar(processador, dados) -> (bool, mensagem),
+em que processador é o CNABBradesco já lido (header, trailer e df_detalhes em
+centavos) e dados é o conteúdo original do arquivo.
+"""
+
+import json
+import os
+
+from cnab_layout import dataframe_em_reais, formatar_data, TIPOS_COBRANCA
+from cnab_moeda import formatar_centavos
+from cnab_montagem import TotaisCobranca
+
+
+class Destino:
+    """Base dos destinos de exportação"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def exportar(self, processador, dados):
+        raise NotImplementedError
+
+
+class DestinoCSV(Destino):
+    """Detalhes em CSV separado por ponto e vírgula, com valores em reais"""
+
+    def exportar(self, processador, dados):
+        try:
+            dataframe_em_reais(processador.df_detalhes).to_csv(self.caminho, index=False, sep=';')
+            return True, f"Dados exportados para CSV: {self.caminho}"
+        except Exception as e:
+            return False, f"Erro ao exportar para CSV: {str(e)}"
+
+
+class DestinoExcel(Destino):
+    """Planilha de detalhes e resumo (CNABBradesco.exportar_para_excel)"""
+
+    def exportar(self, processador, dados):
+        return processador.exportar_para_excel(self.caminho)
+
+
+class DestinoRetornoSemJuros(Destino):
+    """Retorno com juros/multa zerados, gravado a partir do conteúdo já lido"""
+
+    def exportar(self, processador, dados):
+        return processador._zerar_juros_arquivo_completo(self.caminho, dados=dados)
+
+
+class DestinoResumo(Destino):
+    """Resumo do arquivo em JSON: header, quantidade e valor dos títulos e conferência do trailer"""
+
+    def exportar(self, processador, dados):
+        try:
+            with open(self.caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump(resumo_arquivo(processador), arquivo, ensure_ascii=False, indent=2)
+            return True, f"Resumo exportado para JSON: {self.caminho}"
+        except Exception as e:
+            return False, f"Erro ao exportar resumo: {str(e)}"
+
+
+def resumo_arquivo(processador):
+    """Resumo (dicionário serializável) de um CNABBradesco lido por ler_para_exportacao()"""
+    df = processador.df_detalhes
+    header = processador.header or {}
+
+    totais = TotaisCobranca()
+    if len(df):
+        totais.acumular_colunas(df['carteira'].to_numpy(dtype=str), df['valor_titulo'].to_numpy())
+    confere, conferencia = processador.conferir_trailer(totais.quantidade, totais.valor_total)
+
+    return {
+        'arquivo': os.path.basename(processador.arquivo),
+        'banco': f"{header.get('codigo_banco', '')} - {header.get('nome_banco', '').strip()}" if header else '',
+        'empresa': header.get('nome_empresa', '').strip(),
+        'data_geracao': formatar_data(header.get('data_geracao', '')),
+        'data_credito': formatar_data(header.get('data_credito', '')),
+        'qtd_titulos': totais.quantidade,
+        'valor_total_centavos': totais.valor_total,
+        'valor_total': formatar_centavos(totais.valor_total),
+        'por_tipo_cobranca': {
+            tipo: {'qtd_titulos': totais.quantidades[tipo], 'valor_total_centavos': totais.valores[tipo]}
+            for tipo in TIPOS_COBRANCA
+        },
+        'trailer_confere': confere,
+        'conferencia_trailer': conferencia,
+    }
@@ -0,0 +1,223 @@
+"""
+Layout declarativo do CNAB 400 do Bradesco (arquivo de retorno).
+
+Cada tipo de registro (header, detalhe e trailer) é descrito por uma tabela
+de campos no formato (nome, início, fim, tipo), com posições no padrão de
+fatiamento do Python (base 0, fim exclusivo). As tabelas são compiladas uma
+única vez, na importação do módulo, em funções decodificadoras especializadas
+que montam o dicionário do registro em uma única expressão.
+
+Linhas menores que 400 caracteres (ver docs/TRATAMENTO_CNAB_SEM_SEQUENCIAL.md)
+são completadas com espaços em um único passo antes do fatiamento, em vez de
+verificar o tamanho da linha campo a campo.
+
+Valores monetários são lidos como centavos inteiros (ver cnab_moeda.py).
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+from cnab_moeda import centavos_de_texto
+
+TAMANHO_REGISTRO = 400
+
+# Codificação dos campos de texto e alternativa para bytes inválidos nela (retornos latin-1/cp1252)
+CODIFICACAO_PADRAO = 'utf-8'
+CODIFICACAO_ALTERNATIVA = 'cp1252'
+
+# Datas distintas mantidas em cache por formatar_data (um retorno tem poucas centenas)
+TAMANHO_CACHE_DATAS = 4096
+
+# Tipos de campo
+ALFA = 'alfa'              # Texto, fatiado como está no arquivo
+VALOR = 'valor'            # Valor monetário, mantido em centavos (int)
+DATA = 'data'              # Data DDMMAA, convertida para DD/MM/AAAA
+QUANTIDADE = 'quantidade'  # Contador numérico mantido como texto ('0' se vazio)
+ZERADO = 'zerado'          # Valor monetário sempre zerado na leitura (0 centavos)
+
+LAYOUT_HEADER = [
+    ('tipo_registro', 0, 1, ALFA),
+    ('codigo_retorno', 1, 2, ALFA),
+    ('literal_retorno', 2, 9, ALFA),
+    ('codigo_servico', 9, 11, ALFA),
+    ('literal_servico', 11, 26, ALFA),
+    ('codigo_empresa', 26, 46, ALFA),
+    ('nome_empresa', 46, 76, ALFA),
+    ('codigo_banco', 76, 79, ALFA),
+    ('nome_banco', 79, 94, ALFA),
+    ('data_geracao', 94, 100, ALFA),
+    ('densidade', 100, 108, ALFA),
+    ('numero_aviso_bancario', 108, 113, ALFA),
+    ('data_credito', 379, 385, ALFA),
+    ('sequencial', 394, 400, ALFA),
+]
+
+LAYOUT_DETALHE = [
+    ('tipo_registro', 0, 1, ALFA),
+    ('codigo_inscricao', 1, 3, ALFA),
+    ('numero_inscricao', 3, 17, ALFA),
+    ('codigo_empresa', 20, 37, ALFA),
+    ('nosso_numero', 70, 82, ALFA),
+    ('nosso_numero_2', 134, 146, ALFA),  # Segundo campo nosso número
+    ('carteira', 107, 109, ALFA),
+    ('data_ocorrencia', 110, 116, DATA),
+    ('seu_numero', 116, 126, ALFA),
+    ('data_vencimento', 146, 152, DATA),
+    ('valor_titulo', 152, 165, VALOR),
+    ('banco_cobrador', 165, 168, ALFA),
+    ('agencia_cobradora', 168, 173, ALFA),
+    ('especie', 173, 175, ALFA),
+    ('valor_tarifa', 175, 188, VALOR),
+    ('valor_iof', 188, 201, VALOR),
+    ('valor_abatimento', 227, 240, VALOR),
+    ('descontos', 240, 253, VALOR),
+    ('valor_principal', 152, 165, VALOR),  # Usando o mesmo valor do título
+    ('juros_mora_multa', 266, 279, ZERADO),  # Juros zerados conforme solicitado
+    ('outros_creditos', 279, 292, VALOR),
+    ('data_credito', 295, 301, DATA),
+    ('motivo_ocorrencia', 318, 328, ALFA),
+    ('sequencial', 394, 400, ALFA),
+]
+
+LAYOUT_TRAILER = [
+    ('tipo_registro', 0, 1, ALFA),
+    ('retorno', 1, 2, ALFA),
+    ('tipo_registro_1', 2, 4, ALFA),
+    ('qtd_titulos_simples', 17, 25, QUANTIDADE),
+    ('valor_total_simples', 25, 39, VALOR),
+    ('qtd_titulos_vinculado', 39, 47, QUANTIDADE),
+    ('valor_total_vinculado', 47, 61, VALOR),
+    ('qtd_titulos_caucao', 61, 69, QUANTIDADE),
+    ('valor_total_caucao', 69, 83, VALOR),
+    ('qtd_titulos_descontado', 83, 91, QUANTIDADE),
+    ('valor_total_descontado', 91, 105, VALOR),
+    ('sequencial', 394, 400, ALFA),
+]
+
+# Tipos de cobrança totalizados no trailer e o código de carteira (detalhe) de cada um;
+# carteiras sem tipo próprio (ex.: 09) são totalizadas como cobrança simples
+TIPOS_COBRANCA = ('simples', 'vinculado', 'caucao', 'descontado')
+TIPO_COBRANCA_CARTEIRA = {'02': 'vinculado', '03': 'caucao', '04': 'descontado'}
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_DATAS)
+def formatar_data(data_str):
+    """
+    Converte a data do formato DDMMAA para DD/MM/AAAA.
+
+    O resultado fica em cache: strptime é executado uma única vez por data
+    distinta, qualquer que seja o registro (header, detalhe ou trailer).
+    """
+    if not data_str or data_str.strip() == '':
+        return ""
+    try:
+        data = datetime.strptime(data_str, '%d%m%y')
+        return data.strftime('%d/%m/%Y')
+    except ValueError:
+        return data_str
+
+
+def converter_quantidade(qtd_str):
+    """Mantém o contador como texto, usando '0' para campos vazios"""
+    return qtd_str if qtd_str.strip() else "0"
+
+
+# Expressão gerada para cada tipo de campo; {fatia} é substituído pelo fatiamento da linha
+_EXPRESSOES = {
+    ALFA: '{fatia}',
+    VALOR: '_valor({fatia})',
+    DATA: '_data({fatia})',
+    QUANTIDADE: '_quantidade({fatia})',
+    ZERADO: '0',
+}
+
+
+def compilar_layout(campos, nome_funcao='decodificar', tamanho=TAMANHO_REGISTRO):
+    """
+    Compila uma tabela de campos em uma função decodificadora especializada.
+
+    A função gerada recebe a linha (sem quebra de linha) e devolve o dicionário
+    do registro, incluindo 'linha_original' com a linha exatamente como lida.
+    """
+    itens = []
+    for nome, inicio, fim, tipo in campos:
+        if tipo not in _EXPRESSOES:
+            raise ValueError(f"Tipo de campo desconhecido para '{nome}': {tipo}")
+        expressao = _EXPRESSOES[tipo].format(fatia=f"l[{inicio}:{fim}]")
+        itens.append(f"        {nome!r}: {expressao},\n")
+
+    codigo = (
+        f"def {nome_funcao}(linha):\n"
+        f"    l = linha if len(linha) >= {tamanho} else linha.ljust({tamanho})\n"
+        f"    return {{\n"
+        f"{''.join(itens)}"
+        f"        'linha_original': linha,\n"
+        f"    }}\n"
+    )
+
+    namespace = {
+        '_valor': centavos_de_texto,
+        '_data': formatar_data,
+        '_quantidade': converter_quantidade,
+    }
+    exec(compile(codigo, f"<layout {nome_funcao}>", 'exec'), namespace)
+    funcao = namespace[nome_funcao]
+    funcao.__doc__ = f"Decodificador gerado a partir do layout ({len(campos)} campos)"
+    return funcao
+
+
+decodificar_header = compilar_layout(LAYOUT_HEADER, 'decodificar_header')
+decodificar_detalhe = compilar_layout(LAYOUT_DETALHE, 'decodificar_detalhe')
+decodificar_trailer = compilar_layout(LAYOUT_TRAILER, 'decodificar_trailer')
+
+
+# Campos indexados por tipo de registro e nome, para acesso campo a campo
+CAMPOS_POR_TIPO = {
+    tipo: {nome: (inicio, fim, tipo_campo) for nome, inicio, fim, tipo_campo in campos}
+    for tipo, campos in (('0', LAYOUT_HEADER), ('1', LAYOUT_DETALHE), ('9', LAYOUT_TRAILER))
+}
+
+# Campos monetários (em centavos) de todos os tipos de registro
+CAMPOS_MONETARIOS = frozenset(
+    nome for campos in (LAYOUT_HEADER, LAYOUT_DETALHE, LAYOUT_TRAILER)
+    for nome, _, _, tipo_campo in campos if tipo_campo in (VALOR, ZERADO)
+)
+
+
+def registro_em_reais(registro):
+    """Cópia do registro com os campos monetários convertidos de centavos para reais (exportação)"""
+    return {nome: valor / 100 if nome in CAMPOS_MONETARIOS else valor for nome, valor in registro.items()}
+
+
+def dataframe_em_reais(df):
+    """Cópia do DataFrame com as colunas monetárias convertidas de centavos para reais (exportação)"""
+    convertidas = {coluna: df[coluna] / 100 for coluna in df.columns if coluna in CAMPOS_MONETARIOS}
+    return df.assign(**convertidas) if convertidas else df.copy()
+
+
+def decodificar_texto(dados, codificacao=CODIFICACAO_PADRAO):
+    """Decodifica bytes de texto; se não forem válidos na codificação informada, usa cp1252"""
+    try:
+        return str(dados, codificacao)
+    except UnicodeDecodeError:
+        return str(dados, CODIFICACAO_ALTERNATIVA, 'replace')
+
+
+def decodificar_campo(dados, tipo_campo, codificacao=CODIFICACAO_PADRAO):
+    """
+    Decodifica um único campo a partir dos bytes fatiados da linha (bytes ou memoryview).
+
+    Valores são convertidos direto dos dígitos ASCII; apenas campos de texto
+    passam pela codificação informada.
+    """
+    if tipo_campo == ALFA:
+        return decodificar_texto(dados, codificacao)
+    if tipo_campo == VALOR:
+        return centavos_de_texto(bytes(dados))
+    if tipo_campo == DATA:
+        return formatar_data(decodificar_texto(dados, codificacao))
+    if tipo_campo == QUANTIDADE:
+        return converter_quantidade(decodificar_texto(dados, codificacao))
+    if tipo_campo == ZERADO:
+        return 0
+    raise ValueError(f"Tipo de campo desconhecido: {tipo_campo}")
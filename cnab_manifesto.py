@@ -0,0 +1,177 @@
+"""
+Manifesto do processamento em lote: o que já foi processado e com que resultado.
+
+processar_lote.py grava na pasta de saída um manifesto em JSON com cada arquivo
+de entrada (caminho, tamanho, data de modificação e hash SHA-256 do conteúdo),
+as saídas geradas e os totais. Em uma nova execução sobre a mesma pasta, os
+arquivos inalterados são pulados e só os novos ou alterados são processados; as
+saídas consolidadas são refeitas a partir do CSV já exportado de cada arquivo
+(o fragmento), sem ler os retornos de novo.
+
+O manifesto é regravado de forma atômica à medida que os arquivos terminam (no
+máximo a cada INTERVALO_GRAVACAO segundos, e sempre ao final), de modo que um
+lote interrompido continua de onde parou.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from cnab_layout import CAMPOS_MONETARIOS
+
+NOME_MANIFESTO = 'manifesto_lote.json'
+
+# Incrementar quando o formato das entradas ou dos fragmentos mudar (manifestos antigos são ignorados)
+VERSAO_MANIFESTO = 1
+
+# Intervalo mínimo entre duas gravações do manifesto durante o lote (segundos)
+INTERVALO_GRAVACAO = 2.0
+
+_TAMANHO_BLOCO = 1024 * 1024
+
+
+def identificar_arquivo(caminho, dados=None, estado=None):
+    """
+    Caminho absoluto, tamanho, data de modificação (ns) e hash SHA-256 do conteúdo do arquivo.
+
+    Com 'dados' (o conteúdo já lido), o hash é calculado sobre eles e o arquivo
+    não é lido de novo; 'estado' é então o os.stat obtido antes dessa leitura.
+    """
+    # A data é lida antes do conteúdo: se o arquivo mudar durante a leitura, a próxima execução percebe
+    if dados is not None:
+        resumo = hashlib.sha256(dados)
+    else:
+        estado = os.stat(caminho)
+        resumo = hashlib.sha256()
+        with open(caminho, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(_TAMANHO_BLOCO), b''):
+                resumo.update(bloco)
+    return {
+        'caminho': os.path.abspath(caminho),
+        'tamanho': estado.st_size,
+        'mtime_ns': estado.st_mtime_ns,
+        'hash': resumo.hexdigest(),
+    }
+
+
+def carregar_fragmento(caminho):
+    """
+    Detalhes (em centavos) de um CSV exportado por DestinoCSV, como foram lidos do retorno.
+
+    Campos de texto são mantidos como texto (zeros à esquerda, espaços) e os
+    valores em reais voltam a centavos inteiros.
+    """
+    df = pd.read_csv(caminho, sep=';', keep_default_na=False,
+                     dtype=defaultdict(lambda: str, dict.fromkeys(CAMPOS_MONETARIOS, float)))
+    for coluna in df.columns:
+        if coluna in CAMPOS_MONETARIOS:
+            df[coluna] = np.rint(df[coluna].to_numpy() * 100).astype(np.int64)
+    return df
+
+
+class ManifestoLote:
+    """Arquivos já processados em uma pasta de saída (nome do arquivo -> entrada)"""
+
+    def __init__(self, pasta_saida, ignorar_existente=False):
+        self.pasta_saida = pasta_saida
+        self.caminho = os.path.join(pasta_saida, NOME_MANIFESTO)
+        self.entradas = {} if ignorar_existente else self._carregar()
+        self._alterado = False
+        self._gravado_em = float('-inf')
+
+    def _carregar(self):
+        """Entradas do manifesto gravado, ou nenhuma se não existir, estiver inválido ou for de outra versão"""
+        try:
+            with open(self.caminho, encoding='utf-8') as arquivo:
+                conteudo = json.load(arquivo)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(conteudo, dict) or conteudo.get('versao') != VERSAO_MANIFESTO:
+            return {}
+        return conteudo.get('arquivos', {})
+
+    def _saida(self, nome):
+        return os.path.join(self.pasta_saida, nome)
+
+    def pendente(self, arquivo, saidas):
+        """
+        True se 'arquivo' precisa ser processado: novo, alterado, ou sem alguma das
+        saídas pedidas ('csv', 'excel', 'cnab') na pasta de saída.
+
+        Arquivos com outra data de modificação mas o mesmo conteúdo (hash) não são
+        reprocessados; o fragmento (CSV) também precisa estar como foi gravado.
+        """
+        entrada = self.entradas.get(os.path.basename(arquivo))
+        if entrada is None:
+            return True
+        gravadas = entrada['saidas']
+        if any(tipo not in gravadas or not os.path.isfile(self._saida(gravadas[tipo])) for tipo in saidas):
+            return True
+
+        try:
+            fragmento = os.stat(self._saida(gravadas['csv']))
+            estado = os.stat(arquivo)
+        except (OSError, KeyError):
+            return True
+        if [fragmento.st_size, fragmento.st_mtime_ns] != entrada['fragmento'] or estado.st_size != entrada['tamanho']:
+            return True
+        if estado.st_mtime_ns != entrada['mtime_ns'] or os.path.abspath(arquivo) != entrada['caminho']:
+            identificacao = identificar_arquivo(arquivo)
+            if identificacao['hash'] != entrada['hash']:
+                return True
+            entrada.update(identificacao)
+            self._alterado = True
+        return False
+
+    def registrar(self, resumo):
+        """Registra um arquivo processado com sucesso (resumo de processar_lote.processar_arquivo)"""
+        saidas = resumo['saidas']
+        fragmento = None
+        if 'csv' in saidas:
+            estado = os.stat(self._saida(saidas['csv']))
+            fragmento = [estado.st_size, estado.st_mtime_ns]
+        self.entradas[resumo['arquivo']] = dict(
+            resumo['identificacao'],
+            saidas=saidas,
+            fragmento=fragmento,
+            qtd_titulos=resumo['qtd_titulos'],
+            valor_total=resumo['valor_total'],
+            processado_em=datetime.now().isoformat(timespec='seconds'),
+        )
+        self._alterado = True
+        self.gravar(forcar=False)
+
+    def remover(self, nome):
+        """Esquece um arquivo (ex.: falhou nesta execução); as saídas já gravadas são mantidas"""
+        if self.entradas.pop(nome, None) is not None:
+            self._alterado = True
+
+    def fragmento(self, nome):
+        """Detalhes (em centavos, com a coluna arquivo_origem) de um arquivo já processado"""
+        df = carregar_fragmento(self._saida(self.entradas[nome]['saidas']['csv']))
+        df['arquivo_origem'] = nome
+        return df
+
+    def gravar(self, forcar=True):
+        """Grava o manifesto (de forma atômica); sem 'forcar', no máximo a cada INTERVALO_GRAVACAO segundos"""
+        if not self._alterado or (not forcar and time.monotonic() - self._gravado_em < INTERVALO_GRAVACAO):
+            return
+        conteudo = {'versao': VERSAO_MANIFESTO, 'arquivos': self.entradas}
+        descritor, temporario = tempfile.mkstemp(suffix='.tmp', dir=self.pasta_saida)
+        try:
+            with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+                json.dump(conteudo, arquivo, ensure_ascii=False, indent=1)
+            os.replace(temporario, self.caminho)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        self._alterado = False
+        self._gravado_em = time.monotonic()
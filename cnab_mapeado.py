@@ -0,0 +1,196 @@
+"""
+Leitor de arquivos de retorno CNAB 400 mapeados em memória (mmap).
+
+O arquivo não é lido para objetos str linha a linha: os limites de cada
+registro são localizados no buffer mapeado (por passo fixo de 400, 401 ou 402
+bytes quando o arquivo é regular, ou procurando as quebras de linha) e os
+campos são fatiados diretamente do buffer via memoryview, sendo decodificados
+apenas quando solicitados.
+"""
+
+import mmap
+from array import array
+
+from cnab_layout import TAMANHO_REGISTRO, CAMPOS_POR_TIPO, CODIFICACAO_PADRAO, decodificar_campo, decodificar_texto
+
+_RETORNO = ord('\r')
+
+
+class LeitorMapeado:
+    """Acesso somente leitura aos registros de um retorno CNAB mapeado em memória"""
+
+    def __init__(self, caminho, codificacao=CODIFICACAO_PADRAO):
+        self.caminho = caminho
+        self.codificacao = codificacao  # Usada apenas nos campos de texto
+        self.passo = None  # Tamanho fixo de cada registro com terminador, quando detectado
+        self._arquivo = open(caminho, 'rb')
+        self._mapa = None
+        self._buffer = memoryview(b'')
+        self._inicios = None
+        self._fins = None
+        self._quantidade = 0
+        self._terminador = 0
+
+        try:
+            if self._tamanho_arquivo() > 0:
+                self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+                self._buffer = memoryview(self._mapa)
+            if not self._detectar_passo_fixo():
+                self._localizar_quebras()
+        except Exception:
+            self.fechar()
+            raise
+
+    def _tamanho_arquivo(self):
+        self._arquivo.seek(0, 2)
+        tamanho = self._arquivo.tell()
+        self._arquivo.seek(0)
+        return tamanho
+
+    def _detectar_passo_fixo(self):
+        """Verifica se todos os registros têm 400 bytes seguidos do mesmo terminador"""
+        mapa = self._mapa
+        if mapa is None:
+            return True  # Arquivo vazio: nenhum registro
+
+        tamanho = len(mapa)
+        primeira_quebra = mapa.find(b'\n', 0, TAMANHO_REGISTRO + 2)
+
+        if primeira_quebra == TAMANHO_REGISTRO:
+            terminador = 1
+        elif primeira_quebra == TAMANHO_REGISTRO + 1 and mapa[TAMANHO_REGISTRO] == _RETORNO:
+            terminador = 2
+        elif primeira_quebra == -1 and tamanho % TAMANHO_REGISTRO == 0 and mapa.find(b'\n') == -1:
+            terminador = 0
+        else:
+            return False
+
+        passo = TAMANHO_REGISTRO + terminador
+        quantidade, resto = divmod(tamanho, passo)
+        if resto == TAMANHO_REGISTRO:
+            quantidade += 1  # Último registro sem quebra de linha
+        elif resto != 0:
+            return False
+
+        # Conferir os terminadores de todos os registros de uma só vez
+        if terminador:
+            quebras = self._buffer[passo - 1::passo]
+            if quebras.tobytes().count(b'\n') != len(quebras):
+                return False
+            if terminador == 2:
+                retornos = self._buffer[TAMANHO_REGISTRO::passo]
+                if retornos.tobytes().count(b'\r') != len(retornos):
+                    return False
+
+        self.passo = passo
+        self._terminador = terminador
+        self._quantidade = quantidade
+        return True
+
+    def _localizar_quebras(self):
+        """Localiza os registros procurando as quebras de linha (arquivos irregulares)"""
+        mapa = self._mapa
+        buffer = self._buffer
+        inicios = array('q')
+        fins = array('q')
+        tamanho = len(mapa)
+        posicao = 0
+
+        while posicao < tamanho:
+            quebra = mapa.find(b'\n', posicao)
+            if quebra == -1:
+                quebra = tamanho
+            fim = quebra
+            while fim > posicao and buffer[fim - 1] in (_RETORNO, 0x20):
+                fim -= 1
+            if fim > posicao:  # Ignorar linhas vazias
+                inicios.append(posicao)
+                fins.append(fim)
+            posicao = quebra + 1
+
+        self._inicios = inicios
+        self._fins = fins
+        self._quantidade = len(inicios)
+
+    def __len__(self):
+        return self._quantidade
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+    def fechar(self):
+        """
+        Libera o mapeamento e fecha o arquivo.
+
+        Fatias obtidas em fatia() que ainda estejam em uso continuam válidas: o
+        mapeamento só é desfeito quando a última delas é descartada. O arquivo é
+        fechado de qualquer forma.
+        """
+        self._buffer.release()
+        self._buffer = memoryview(b'')
+        if self._mapa is not None:
+            try:
+                self._mapa.close()
+            except BufferError:
+                pass  # Há fatias em uso; o mapeamento é liberado junto com elas
+            self._mapa = None
+        if not self._arquivo.closed:
+            self._arquivo.close()
+        self._quantidade = 0
+
+    def limites(self, indice):
+        """Retorna (início, fim) do registro no buffer, sem o terminador de linha"""
+        if indice < 0:
+            indice += self._quantidade
+        if not 0 <= indice < self._quantidade:
+            raise IndexError(f"Registro {indice} fora do arquivo ({self._quantidade} registros)")
+        if self.passo is not None:
+            inicio = indice * self.passo
+            return inicio, inicio + TAMANHO_REGISTRO
+        return self._inicios[indice], self._fins[indice]
+
+    def tipo(self, indice):
+        """Tipo do registro ('0', '1' ou '9') lido do primeiro byte"""
+        inicio, _ = self.limites(indice)
+        return chr(self._buffer[inicio])
+
+    def fatia(self, indice, inicio, fim):
+        """Fatia bruta (memoryview, sem cópia) das posições [inicio:fim] do registro; continua válida após fechar()"""
+        inicio_registro, fim_registro = self.limites(indice)
+        return self._buffer[inicio_registro + inicio:min(inicio_registro + fim, fim_registro)]
+
+    def linha(self, indice):
+        """Linha completa do registro como str (usada para header, trailer e linha_original)"""
+        inicio, fim = self.limites(indice)
+        return decodificar_texto(self._buffer[inicio:fim], self.codificacao).strip()
+
+    def campo(self, indice, nome):
+        """Decodifica apenas o campo solicitado, conforme o layout do tipo do registro"""
+        inicio_registro, fim_registro = self.limites(indice)
+        campos = CAMPOS_POR_TIPO.get(chr(self._buffer[inicio_registro]))
+        if campos is None or nome not in campos:
+            raise KeyError(nome)
+
+        inicio, fim, tipo_campo = campos[nome]
+        dados = self._buffer[inicio_registro + inicio:min(inicio_registro + fim, fim_registro)]
+        if len(dados) < fim - inicio:
+            # Linha curta: completar com espaços, como na leitura em modo texto
+            dados = dados.tobytes().ljust(fim - inicio)
+        return decodificar_campo(dados, tipo_campo, self.codificacao)
+
+    def tipos(self):
+        """Primeiro byte de todos os registros, em ordem (ex.: b'011119')"""
+        if self.passo is not None:
+            return self._buffer[0:self._quantidade * self.passo:self.passo].tobytes()
+        buffer = self._buffer
+        return bytes(buffer[inicio] for inicio in self._inicios)
+
+    def indices_detalhes(self):
+        """Índices dos registros de detalhe (tipo 1)"""
+        tipos = self.tipos()
+        if tipos.count(b'1') == len(tipos) - 2 and tipos[:1] == b'0' and tipos[-1:] == b'9':
+            return range(1, len(tipos) - 1)
+        return [i for i, tipo in enumerate(tipos) if tipo == 0x31]
@@ -0,0 +1,65 @@
+"""
+Valores monetários do CNAB 400 em centavos inteiros.
+
+No arquivo os valores são gravados como dígitos em centavos. Eles são mantidos
+como int (int64 nos vetores NumPy/pandas) da leitura até a gravação, de modo
+que somas e conferências com o trailer são exatas e a regravação nunca perde
+um centavo. A conversão para reais fica restrita à exibição e à exportação.
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+_UM = Decimal('1')
+
+
+def _arredondar(valor):
+    """Arredonda um Decimal para o inteiro mais próximo (meio para cima)"""
+    return int(valor.quantize(_UM, rounding=ROUND_HALF_UP))
+
+
+def centavos_de_texto(valor_str):
+    """Converte um campo numérico do arquivo (str ou bytes) em centavos, com 0 para campos inválidos"""
+    try:
+        return int(valor_str)
+    except ValueError:
+        return 0
+
+
+def reais_para_centavos(valor):
+    """Converte um valor em reais (int, float, Decimal ou texto com ponto decimal) para centavos"""
+    try:
+        reais = Decimal(str(valor))
+    except InvalidOperation:
+        return 0
+    if not reais.is_finite():
+        return 0
+    return _arredondar(reais * 100)
+
+
+def multiplicar_centavos(centavos, fator):
+    """Aplica um fator (ex.: 1.1 para +10%) a um valor em centavos, arredondando para o centavo"""
+    return _arredondar(Decimal(int(centavos)) * Decimal(str(fator)))
+
+
+def centavos_para_reais(centavos):
+    """Valor em reais para exibição e exportação (aceita int ou vetores NumPy/pandas)"""
+    return centavos / 100
+
+
+def formatar_centavos(centavos):
+    """Formata centavos no padrão monetário brasileiro (R$ 1.234,56) sem passar por float"""
+    try:
+        centavos = int(centavos)
+    except (ValueError, TypeError):
+        return "R$ 0,00"
+    sinal = '-' if centavos < 0 else ''
+    reais, resto = divmod(abs(centavos), 100)
+    return f"R$ {sinal}{reais:,}".replace(',', '.') + f",{resto:02d}"
+
+
+def centavos_para_campo(centavos, largura):
+    """Dígitos do campo no arquivo (zeros à esquerda) para um valor em centavos"""
+    texto = str(int(centavos or 0)).zfill(largura)
+    if len(texto) > largura:
+        raise ValueError(f"Valor {formatar_centavos(centavos)} não cabe em {largura} posições")
+    return texto
@@ -0,0 +1,165 @@
+"""
+Montagem de registros CNAB 400 a partir de modelos pré-alocados.
+
+Cada tipo de registro tem um modelo: um bytearray de 400 posições (mais a quebra
+de linha) com os campos fixos já gravados (tipo de registro, literais, banco...).
+Montar um registro copia o modelo uma única vez e grava cada campo no lugar, por
+atribuição de fatia, em vez de remontar a linha inteira a cada campo.
+
+As posições dos campos vêm do layout declarativo de cnab_layout.py, com os
+acréscimos necessários para a gravação (ex.: valor pago, que a leitura não usa).
+
+TotaisCobranca acumula quantidade e valor dos títulos por tipo de cobrança à
+medida que os detalhes são gravados, para que o trailer saia correto sem uma
+segunda passagem pelos registros.
+"""
+
+import numpy as np
+
+from cnab_layout import (LAYOUT_HEADER, LAYOUT_DETALHE, LAYOUT_TRAILER, TAMANHO_REGISTRO,
+                         CODIFICACAO_PADRAO, TIPOS_COBRANCA, TIPO_COBRANCA_CARTEIRA)
+from cnab_moeda import centavos_para_campo
+
+
+def _posicoes(layout, **extras):
+    """Nome -> (início, fim) dos campos do layout, com os campos extras informados"""
+    posicoes = {nome: (inicio, fim) for nome, inicio, fim, _ in layout}
+    posicoes.update(extras)
+    return posicoes
+
+
+POSICOES_HEADER = _posicoes(LAYOUT_HEADER)
+
+# Na leitura, 'valor_principal' repete o valor do título; na gravação é o valor pago (254-266)
+POSICOES_DETALHE = _posicoes(LAYOUT_DETALHE, valor_principal=(253, 266))
+
+# Na gravação o trailer leva o código de retorno (2-3) e o do banco (4-6)
+POSICOES_TRAILER = _posicoes(LAYOUT_TRAILER, codigo_retorno=(1, 3), codigo_banco=(3, 6))
+
+
+class ModeloRegistro:
+    """Registro pré-montado: espaços, campos fixos e quebra de linha, copiado a cada montagem"""
+
+    def __init__(self, posicoes, fixos=None, tamanho=TAMANHO_REGISTRO, terminador=b'\n',
+                 codificacao=CODIFICACAO_PADRAO):
+        self.posicoes = posicoes
+        self.codificacao = codificacao
+        self._modelo = bytearray(b' ' * tamanho + terminador)
+        self.gravar(self._modelo, fixos or {}, codificacao)
+
+    def gravar(self, linha, valores, codificacao=None):
+        """Grava valores já formatados em um registro existente (bytearray com ao menos 400 posições)"""
+        codificacao = codificacao or self.codificacao
+        for nome, valor in valores.items():
+            inicio, fim = self.posicoes[nome]
+            conteudo = str(valor).encode(codificacao)
+            if len(conteudo) > fim - inicio:
+                raise ValueError(f"Valor '{valor}' não cabe no campo {nome} ({fim - inicio} posições)")
+            linha[inicio:fim] = conteudo.ljust(fim - inicio)
+
+    def montar(self, valores, codificacao=None):
+        """
+        Novo registro (bytearray, com quebra de linha) com os valores já formatados
+        gravados sobre o modelo; valores menores que o campo são completados com
+        espaços e maiores geram ValueError.
+        """
+        linha = bytearray(self._modelo)
+        self.gravar(linha, valores, codificacao)
+        return linha
+
+
+MODELO_HEADER = ModeloRegistro(POSICOES_HEADER, {
+    'tipo_registro': '0',
+    'codigo_retorno': '2',
+    'literal_retorno': 'RETORNO',
+    'codigo_servico': '01',
+    'literal_servico': 'COBRANCA',
+    'codigo_banco': '237',
+    'nome_banco': 'BRADESCO',
+    'densidade': '01600000',  # Densidade (0) e unidade de densidade (1600000)
+    'sequencial': '000001',
+})
+
+MODELO_DETALHE = ModeloRegistro(POSICOES_DETALHE, {
+    'tipo_registro': '1',
+    'banco_cobrador': '237',
+    'agencia_cobradora': '06254',
+})
+
+MODELO_TRAILER = ModeloRegistro(POSICOES_TRAILER, {
+    'tipo_registro': '9',
+    'codigo_retorno': '01',
+    'codigo_banco': '237',
+})
+
+
+class TotaisCobranca:
+    """Quantidade e valor (centavos) dos títulos por tipo de cobrança, para o trailer"""
+
+    def __init__(self):
+        self.quantidades = dict.fromkeys(TIPOS_COBRANCA, 0)
+        self.valores = dict.fromkeys(TIPOS_COBRANCA, 0)
+
+    @staticmethod
+    def tipo(carteira):
+        """Tipo de cobrança do código de carteira de um detalhe"""
+        return TIPO_COBRANCA_CARTEIRA.get(str(carteira).strip().zfill(2), 'simples')
+
+    def acumular(self, carteira, centavos):
+        """Conta um título da carteira informada"""
+        tipo = self.tipo(carteira)
+        self.quantidades[tipo] += 1
+        self.valores[tipo] += int(centavos or 0)
+
+    def acumular_colunas(self, carteiras, centavos):
+        """Conta de uma vez os títulos de vetores de carteiras (texto) e valores (centavos)"""
+        carteiras = np.char.zfill(np.char.strip(np.asarray(carteiras, dtype=str)), 2)
+        centavos = np.asarray(centavos, dtype=np.int64)
+        simples = np.ones(len(carteiras), dtype=bool)
+        for codigo, tipo in TIPO_COBRANCA_CARTEIRA.items():
+            do_tipo = carteiras == codigo
+            simples &= ~do_tipo
+            self.quantidades[tipo] += int(do_tipo.sum())
+            self.valores[tipo] += int(centavos[do_tipo].sum())
+        self.quantidades['simples'] += int(simples.sum())
+        self.valores['simples'] += int(centavos[simples].sum())
+
+    @property
+    def quantidade(self):
+        return sum(self.quantidades.values())
+
+    @property
+    def valor_total(self):
+        return sum(self.valores.values())
+
+    def campos_alterados(self, trailer, sequencial=None):
+        """
+        Campos de campos() cujo valor difere do gravado no trailer (bytes ou texto).
+
+        Campos em branco valem zero, de modo que um trailer já correto não é tocado
+        e os tipos de cobrança sem títulos continuam em branco.
+        """
+        if isinstance(trailer, str):
+            trailer = trailer.encode('ascii', 'replace')
+        alterados = {}
+        for nome, texto in self.campos(sequencial).items():
+            inicio, fim = POSICOES_TRAILER[nome]
+            atual = trailer[inicio:fim].strip()
+            if not (atual or b'0').isdigit() or int(atual or 0) != int(texto):
+                alterados[nome] = texto
+        return alterados
+
+    def campos(self, sequencial=None):
+        """Campos do trailer já formatados (nome -> texto), com o sequencial se informado"""
+        campos = {}
+        for tipo in TIPOS_COBRANCA:
+            inicio, fim = POSICOES_TRAILER[f'qtd_titulos_{tipo}']
+            quantidade = str(self.quantidades[tipo]).zfill(fim - inicio)
+            if len(quantidade) > fim - inicio:
+                raise ValueError(f"Quantidade de títulos ({quantidade}) não cabe em {fim - inicio} posições")
+            campos[f'qtd_titulos_{tipo}'] = quantidade
+            inicio, fim = POSICOES_TRAILER[f'valor_total_{tipo}']
+            campos[f'valor_total_{tipo}'] = centavos_para_campo(self.valores[tipo], fim - inicio)
+        if sequencial is not None:
+            campos['sequencial'] = str(sequencial).zfill(6)
+        return campos
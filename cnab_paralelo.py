@@ -0,0 +1,102 @@
+"""
+Leitura colunar em paralelo de retornos CNAB 400 muito grandes.
+
+O arquivo é dividido em faixas de bytes alinhadas no início de um registro
+(logo após uma quebra de linha). Cada faixa é decodificada por cnab_colunar em
+um processo separado (ProcessPoolExecutor) e os vetores resultantes são
+concatenados na ordem original do arquivo.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cnab_colunar import decodificar_registros, ler_colunar
+from cnab_layout import CODIFICACAO_PADRAO
+
+# Tamanho a partir do qual a leitura é feita em paralelo automaticamente (bytes)
+LIMITE_LEITURA_PARALELA = 64 * 1024 * 1024
+
+# Tamanho mínimo de cada faixa, para não abrir processos para trechos pequenos (bytes)
+TAMANHO_MINIMO_FAIXA = 8 * 1024 * 1024
+
+
+def dividir_em_faixas(caminho, partes):
+    """
+    Divide o arquivo em até 'partes' faixas (início, fim) de bytes.
+
+    Cada corte é deslocado para logo após a próxima quebra de linha, de modo
+    que nenhum registro fique dividido entre duas faixas.
+    """
+    tamanho = os.path.getsize(caminho)
+    cortes = [0]
+    with open(caminho, 'rb') as arquivo:
+        for parte in range(1, partes):
+            posicao = max(tamanho * parte // partes, cortes[-1])
+            arquivo.seek(posicao)
+            while True:
+                trecho = arquivo.read(4096)
+                if not trecho:
+                    posicao = tamanho
+                    break
+                quebra = trecho.find(b'\n')
+                if quebra != -1:
+                    posicao += quebra + 1
+                    break
+                posicao += len(trecho)
+            if posicao >= tamanho:
+                break
+            if posicao > cortes[-1]:
+                cortes.append(posicao)
+    cortes.append(tamanho)
+    return list(zip(cortes[:-1], cortes[1:]))
+
+
+def _ler_faixa(caminho, inicio, fim, incluir_linha_original, codificacao):
+    """Processo de trabalho: lê e decodifica uma faixa do arquivo"""
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        dados = np.frombuffer(arquivo.read(fim - inicio), dtype=np.uint8)
+
+    return decodificar_registros(dados, incluir_linha_original, codificacao)
+
+
+def ler_colunar_paralelo(caminho, incluir_linha_original=False, processos=None, codificacao=CODIFICACAO_PADRAO):
+    """
+    Lê o arquivo no modo colunar dividindo o trabalho entre processos.
+
+    Retorna (header, colunas, trailer), exatamente como cnab_colunar.ler_colunar.
+    Arquivos pequenos demais para mais de uma faixa são lidos no próprio processo.
+    """
+    processos = processos or os.cpu_count() or 1
+    partes = min(processos, max(1, os.path.getsize(caminho) // TAMANHO_MINIMO_FAIXA))
+    faixas = dividir_em_faixas(caminho, partes) if partes > 1 else []
+    if len(faixas) < 2:
+        return ler_colunar(caminho, incluir_linha_original, codificacao)
+
+    with ProcessPoolExecutor(max_workers=min(processos, len(faixas))) as executor:
+        resultados = list(executor.map(
+            _ler_faixa,
+            [caminho] * len(faixas),
+            [inicio for inicio, _ in faixas],
+            [fim for _, fim in faixas],
+            [incluir_linha_original] * len(faixas),
+            [codificacao] * len(faixas),
+        ))
+
+    # Como na leitura sequencial, prevalecem o último header e o último trailer do arquivo
+    header = None
+    trailer = None
+    for header_faixa, _, trailer_faixa in resultados:
+        if header_faixa is not None:
+            header = header_faixa
+        if trailer_faixa is not None:
+            trailer = trailer_faixa
+
+    # As faixas são concatenadas na ordem do arquivo, mantendo a sequência dos registros
+    colunas = {
+        nome: np.concatenate([resultado[1][nome] for resultado in resultados])
+        for nome in resultados[0][1]
+    }
+    return header, colunas, trailer
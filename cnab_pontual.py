@@ -0,0 +1,146 @@
+"""
+Edição pontual, direto nos bytes, de arquivos de retorno CNAB 400.
+
+Em vez de ler cada linha como texto, remontá-la e regravar o arquivo inteiro, o
+arquivo é copiado (cópia feita pelo sistema operacional) e apenas os bytes dos
+campos alterados são sobrescritos na cópia mapeada em memória (numpy.memmap).
+A leitura se limita a localizar os registros; a escrita toca somente os bytes
+alterados, de modo que espaços, quebras de linha e todo o resto do arquivo
+permanecem exatamente como no original.
+"""
+
+import os
+import shutil
+
+import numpy as np
+
+from cnab_layout import TAMANHO_REGISTRO, CODIFICACAO_PADRAO
+from cnab_colunar import localizar_linhas
+from cnab_transformacao import POSICAO_JUROS
+
+
+def _passo_fixo(dados):
+    """
+    Tamanho de cada registro com o terminador (401 para '\\n', 402 para
+    '\\r\\n') quando todos têm 400 bytes seguidos do mesmo terminador, conferindo
+    apenas os terminadores; None para os demais arquivos.
+    """
+    primeira = np.flatnonzero(dados[:TAMANHO_REGISTRO + 2] == ord('\n'))
+    if not primeira.size:
+        return None
+    quebra = int(primeira[0])
+    retorno = quebra > 0 and dados[quebra - 1] == ord('\r')
+    passo = quebra + 1
+    if quebra - retorno != TAMANHO_REGISTRO or dados.size % passo:
+        return None
+    retornos = dados[quebra - 1::passo] == ord('\r')
+    if not np.all(dados[quebra::passo] == ord('\n')) or not (retornos.all() if retorno else not retornos.any()):
+        return None
+    return passo
+
+
+def _posicoes_detalhes(dados):
+    """
+    Início de cada linha de detalhe, ou None se a edição em bytes não produziria
+    exatamente o mesmo arquivo que a reescrita por cnab_transformacao.transformar_arquivo.
+
+    Isso acontece quando um detalhe termina em '\\r\\n' (a quebra seria
+    convertida), tem menos de 400 bytes (seria completado com espaços) ou não
+    tem quebra de linha no fim do arquivo (ela seria acrescentada). As duas
+    edições trabalham em bytes, então caracteres de mais de um byte não mudam
+    as posições.
+
+    Arquivos de registros com tamanho fixo (o caso comum) são resolvidos pelos
+    terminadores; os demais passam pela varredura completa.
+    """
+    passo = _passo_fixo(dados)
+    if passo is not None:
+        inicios = np.flatnonzero(dados[::passo] == ord('1')) * passo
+        if passo != TAMANHO_REGISTRO + 1 and inicios.size:
+            return None
+        return inicios
+
+    # Registros de tamanhos variados ou quebras misturadas: varredura completa
+    if np.any(dados == ord('\r')):
+        return None
+
+    inicios, fins = localizar_linhas(dados)
+    eh_detalhe = dados[inicios] == ord('1')
+    inicios, fins = inicios[eh_detalhe], fins[eh_detalhe]
+    if inicios.size and (np.any(fins - inicios < TAMANHO_REGISTRO) or fins[-1] == dados.size):
+        return None
+    return inicios
+
+
+def _validar_conteudo(inicio_campo, fim_campo, conteudo):
+    if len(conteudo) != fim_campo - inicio_campo:
+        raise ValueError(f"Conteúdo com {len(conteudo)} bytes para um campo de {fim_campo - inicio_campo}")
+
+
+def sobrescrever_campo(origem, destino, inicio_campo, fim_campo, conteudo, codificacao=CODIFICACAO_PADRAO):
+    """
+    Copia 'origem' para 'destino' e grava 'conteudo' (bytes) nas posições
+    [inicio_campo:fim_campo] de todos os registros de detalhe da cópia.
+
+    Retorna a quantidade de registros alterados, ou None (sem criar o destino)
+    quando o arquivo precisa ser reescrito; ver _posicoes_detalhes. 'codificacao'
+    é mantida por compatibilidade: a edição é feita em bytes.
+    """
+    _validar_conteudo(inicio_campo, fim_campo, conteudo)
+
+    if os.path.getsize(origem) == 0:
+        shutil.copyfile(origem, destino)
+        return 0
+
+    dados = np.memmap(origem, dtype=np.uint8, mode='r')
+    try:
+        inicios = _posicoes_detalhes(dados)
+    finally:
+        del dados
+    if inicios is None:
+        return None
+
+    if not (os.path.exists(destino) and os.path.samefile(origem, destino)):
+        shutil.copyfile(origem, destino)
+    if inicios.size:
+        copia = np.memmap(destino, dtype=np.uint8, mode='r+')
+        try:
+            copia[inicios[:, None] + np.arange(inicio_campo, fim_campo)] = np.frombuffer(conteudo, dtype=np.uint8)
+            copia.flush()
+        finally:
+            del copia
+    return int(inicios.size)
+
+
+def sobrescrever_campo_em_bytes(dados, inicio_campo, fim_campo, conteudo, codificacao=CODIFICACAO_PADRAO):
+    """
+    Como sobrescrever_campo, sobre o conteúdo de um arquivo já lido (bytes).
+
+    Retorna (conteúdo alterado, quantidade de registros alterados) ou None quando
+    o arquivo precisa ser reescrito.
+    """
+    _validar_conteudo(inicio_campo, fim_campo, conteudo)
+
+    if not dados:
+        return bytes(dados), 0
+    inicios = _posicoes_detalhes(np.frombuffer(dados, dtype=np.uint8))
+    if inicios is None:
+        return None
+    copia = bytearray(dados)
+    if inicios.size:
+        vista = np.frombuffer(copia, dtype=np.uint8)
+        vista[inicios[:, None] + np.arange(inicio_campo, fim_campo)] = np.frombuffer(conteudo, dtype=np.uint8)
+        del vista  # Libera o bytearray (vistas abertas impedem redimensioná-lo)
+    return copia, int(inicios.size)
+
+
+def zerar_juros_no_local(origem, destino, codificacao=CODIFICACAO_PADRAO):
+    """Copia o arquivo zerando apenas os juros/multa (posições 266-279) de cada detalhe; ver sobrescrever_campo"""
+    inicio, fim = POSICAO_JUROS
+    return sobrescrever_campo(origem, destino, inicio, fim, b'0' * (fim - inicio), codificacao)
+
+
+def zerar_juros_em_bytes(dados, codificacao=CODIFICACAO_PADRAO):
+    """Zera os juros/multa (posições 266-279) de cada detalhe no conteúdo já lido; ver sobrescrever_campo_em_bytes"""
+    inicio, fim = POSICAO_JUROS
+    return sobrescrever_campo_em_bytes(dados, inicio, fim, b'0' * (fim - inicio), codificacao)
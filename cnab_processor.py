@@ -2,6 +2,21 @@ import os
 import pandas as pd
 import re
 from datetime import datetime
+from cnab_transformacao import Etapa, RecalcularTrailer, transformar_arquivo
+
+
+class ValorPagoSemEncargos(Etapa):
+    """Etapa de gerar_cnab_sem_juros: valor pago igual ao valor do título, juros e multa zerados"""
+    
+    tipos = (b'1',)
+    
+    def aplicar(self, registro):
+        # Detalhes incompletos não entram no arquivo gerado (como em read_cnab)
+        if len(registro.dados.strip()) < 400:
+            return False
+        
+        # Valor pago (253-266) recebe o valor do título (152-165); juros e multa (266-292) zerados
+        registro.gravar(253, registro.campo(152, 165) + b'0' * 26)
 
 class CNABProcessor:
     def __init__(self):
@@ -102,37 +117,9 @@ class CNABProcessor:
     def gerar_cnab_sem_juros(self, output_file):
         if not self.data or not self.header or not self.trailer:
             return False
-            
-        with open(output_file, 'w') as file:
-            # Escrever o cabeçalho
-            file.write(self.header)
-            
-            # Escrever os registros de detalhe modificados
-            for registro in self.data:
-                linha = registro['linha_original']
-                
-                # Atualizar o valor principal para ser igual ao valor do título
-                valor_titulo_centavos = int(registro['valor_titulo'] * 100)
-                valor_titulo_str = str(valor_titulo_centavos).zfill(13)
-                
-                # Zerar juros e multas
-                zeros = "0".zfill(13)
-                
-                # Substituir valores na linha
-                nova_linha = linha[:152] + valor_titulo_str + linha[165:253] + valor_titulo_str + zeros + zeros + linha[292:]
-                
-                # Garantir que o número sequencial esteja no final da linha
-                if 'sequencial' in registro and registro['sequencial']:
-                    sequencial = registro['sequencial'].rjust(7, '0')
-                    # Manter o sequencial original na mesma posição
-                    # Encontrar a posição correta para o sequencial (últimos 7 caracteres)
-                    nova_linha = nova_linha[:-7] + sequencial
-                
-                file.write(nova_linha)
-            
-            # Escrever o trailer
-            file.write(self.trailer)
-            
+        
+        # Uma única passagem pelo arquivo lido; o trailer é recalculado sem os detalhes descartados
+        transformar_arquivo(self.filename, output_file, [ValorPagoSemEncargos(), RecalcularTrailer()])
         return True
     
     @staticmethod
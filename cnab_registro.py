@@ -0,0 +1,186 @@
+"""
+Registros de detalhe compactos, decodificados sob demanda.
+
+O arquivo é lido uma única vez para um buffer de bytes compartilhado e cada
+registro de detalhe guarda apenas a posição da sua linha nesse buffer. Os campos
+são decodificados no primeiro acesso (como atributo ou como chave) e memorizados
+no próprio registro, de modo que um registro nunca acessado ocupa algumas dezenas
+de bytes em vez de um dicionário com todos os campos e a linha original.
+
+A classe se comporta como um dicionário (get, [], update, copy, in, items...),
+então o editor interativo, o editor gráfico e o pandas a utilizam sem mudanças.
+"""
+
+from array import array
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from cnab_layout import (LAYOUT_DETALHE, CODIFICACAO_PADRAO, decodificar_campo, decodificar_texto,
+                         decodificar_header, decodificar_detalhe, decodificar_trailer)
+from cnab_colunar import localizar_linhas, linhas_multibyte
+
+# Nome -> (início, fim, tipo) dos campos do detalhe, na ordem do layout
+_CAMPOS = {nome: (inicio, fim, tipo) for nome, inicio, fim, tipo in LAYOUT_DETALHE}
+_CHAVES = tuple(_CAMPOS) + ('linha_original',)
+
+# Marca um campo do layout removido com del
+_REMOVIDO = object()
+
+
+class BufferArquivo:
+    """Conteúdo do arquivo e limites (sem terminador) de cada linha, compartilhados pelos registros"""
+
+    __slots__ = ('dados', 'inicios', 'fins', 'codificacao')
+
+    def __init__(self, dados, inicios, fins, codificacao=CODIFICACAO_PADRAO):
+        self.dados = dados
+        self.inicios = inicios
+        self.fins = fins
+        self.codificacao = codificacao  # Usada apenas nos campos de texto
+
+
+class RegistroDetalhe(MutableMapping):
+    """Registro de detalhe (tipo 1) apoiado em uma linha do buffer do arquivo"""
+
+    # Os campos decodificados ficam em um único dicionário, criado no primeiro acesso,
+    # para que registros nunca lidos não paguem por um slot de cada campo
+    __slots__ = ('_arquivo', '_linha', '_valores')
+
+    def __init__(self, arquivo, linha):
+        self._arquivo = arquivo
+        self._linha = linha
+        self._valores = None
+
+    def _decodificar(self, chave):
+        """Decodifica um campo do layout (ou a linha original) direto do buffer"""
+        arquivo = self._arquivo
+        inicio_linha = arquivo.inicios[self._linha]
+        fim_linha = arquivo.fins[self._linha]
+        if chave == 'linha_original':
+            return decodificar_texto(arquivo.dados[inicio_linha:fim_linha], arquivo.codificacao).strip()
+
+        inicio, fim, tipo = _CAMPOS[chave]
+        dados = arquivo.dados[inicio_linha + inicio:min(inicio_linha + fim, fim_linha)]
+        if len(dados) < fim - inicio:
+            dados = dados.ljust(fim - inicio)  # Linha curta: completar com espaços
+        return decodificar_campo(dados, tipo, arquivo.codificacao)
+
+    def __getattr__(self, nome):
+        # Acesso como atributo (registro.valor_titulo) aos campos do layout
+        if nome in _CAMPOS or nome == 'linha_original':
+            try:
+                return self[nome]
+            except KeyError:
+                pass
+        raise AttributeError(nome)
+
+    def __getitem__(self, chave):
+        valores = self._valores
+        if valores is not None and chave in valores:
+            valor = valores[chave]
+            if valor is _REMOVIDO:
+                raise KeyError(chave)
+            return valor
+        if chave in _CAMPOS or chave == 'linha_original':
+            valor = self._decodificar(chave)
+            if valores is None:
+                valores = self._valores = {}
+            valores[chave] = valor
+            return valor
+        raise KeyError(chave)
+
+    def __setitem__(self, chave, valor):
+        if self._valores is None:
+            self._valores = {}
+        self._valores[chave] = valor
+
+    def __delitem__(self, chave):
+        self[chave]  # KeyError se não existir
+        if chave in _CAMPOS or chave == 'linha_original':
+            self._valores[chave] = _REMOVIDO
+        else:
+            del self._valores[chave]
+
+    def __contains__(self, chave):
+        valores = self._valores
+        if valores is not None and chave in valores:
+            return valores[chave] is not _REMOVIDO
+        return chave in _CAMPOS or chave == 'linha_original'
+
+    def __iter__(self):
+        valores = self._valores or {}
+        for chave in _CHAVES:
+            if valores.get(chave) is not _REMOVIDO:
+                yield chave
+        for chave in list(valores):
+            if chave not in _CAMPOS and chave != 'linha_original':
+                yield chave
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"RegistroDetalhe({dict(self)!r})"
+
+    def copy(self):
+        """Cópia independente, que compartilha o buffer e os campos já decodificados"""
+        copia = RegistroDetalhe(self._arquivo, self._linha)
+        if self._valores:
+            copia._valores = dict(self._valores)
+        return copia
+
+
+def carregar_registros(caminho, codificacao=CODIFICACAO_PADRAO):
+    """
+    Lê o arquivo para um buffer compartilhado e localiza os registros.
+
+    Retorna (header, detalhes, trailer): header e trailer como dicionários e
+    detalhes como lista de RegistroDetalhe. Nenhuma linha de detalhe é decodificada
+    na leitura; os campos de texto usam 'codificacao' quando acessados (com cp1252
+    para bytes inválidos nela). Linhas com caracteres multibyte (UTF-8 acentuado)
+    ou com espaços à esquerda são decodificadas como texto, exatamente como na
+    leitura linha a linha, pois nelas a posição em bytes não corresponde à do texto.
+    """
+    with open(caminho, 'rb') as arquivo:
+        dados = arquivo.read()
+    return decodificar_buffer(dados, codificacao)
+
+
+def decodificar_buffer(dados, codificacao=CODIFICACAO_PADRAO):
+    """Localiza os registros no conteúdo (bytes) de um arquivo; ver carregar_registros"""
+    vetor = np.frombuffer(dados, dtype=np.uint8)
+    inicios, fins = localizar_linhas(vetor)
+    compartilhado = BufferArquivo(dados, array('q', inicios.tolist()), array('q', fins.tolist()), codificacao)
+    multibyte = set(linhas_multibyte(vetor, inicios, fins, codificacao).tolist())
+
+    header = None
+    trailer = None
+    detalhes = []
+    for indice, (inicio, fim) in enumerate(zip(compartilhado.inicios, compartilhado.fins)):
+        # Detalhes com um byte por caractere (ASCII, latin-1): as posições em bytes valem
+        if dados[inicio] == 0x31 and indice not in multibyte:
+            detalhes.append(RegistroDetalhe(compartilhado, indice))
+            continue
+
+        linha = decodificar_texto(dados[inicio:fim], codificacao).strip()
+        if not linha:
+            continue
+        if linha[0] == '1':
+            detalhes.append(decodificar_detalhe(linha))
+        elif linha[0] == '0':
+            header = decodificar_header(linha)
+        elif linha[0] == '9':
+            trailer = decodificar_trailer(linha)
+
+    return header, detalhes, trailer
+
+
+def registros_de_posicoes(dados, inicios, fins, linhas_detalhe, codificacao=CODIFICACAO_PADRAO):
+    """
+    Recria os detalhes a partir de posições já conhecidas (ex.: do cache de leitura),
+    sem percorrer o arquivo: inicios e fins delimitam todas as linhas e
+    linhas_detalhe traz, em ordem, o índice da linha de cada detalhe.
+    """
+    compartilhado = BufferArquivo(dados, array('q', inicios), array('q', fins), codificacao)
+    return [RegistroDetalhe(compartilhado, indice) for indice in linhas_detalhe]
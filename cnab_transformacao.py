@@ -0,0 +1,240 @@
+"""
+Reescrita de arquivos CNAB 400 em uma única passagem, por etapas.
+
+Cada transformação (código da empresa no header, edições pontuais, zeramento de
+juros, renumeração do sequencial, totais do trailer...) é uma etapa. transformar_arquivo lê o
+arquivo original linha a linha em modo binário, com buffer, passa cada registro
+por todas as etapas e grava o resultado em seguida, de modo que a memória usada
+não depende do tamanho do arquivo e acrescentar uma etapa não acrescenta outra
+passagem pelo arquivo.
+
+Linhas que nenhuma etapa altera são copiadas byte a byte; as quebras de linha
+são mantidas, a menos que uma etapa as troque (TerminadorFixo).
+"""
+
+import io
+import os
+import shutil
+import tempfile
+
+from cnab_layout import TAMANHO_REGISTRO, CODIFICACAO_PADRAO
+from cnab_moeda import centavos_de_texto
+from cnab_montagem import POSICOES_DETALHE, POSICOES_TRAILER, TotaisCobranca
+
+# Buffer de leitura e de escrita (bytes)
+TAMANHO_BUFFER = 1024 * 1024
+
+# Posições (início, fim) dos juros/mora/multa e do sequencial nos registros
+POSICAO_JUROS = (266, 279)
+POSICAO_SEQUENCIAL = (394, 400)
+
+
+class Registro:
+    """Uma linha do arquivo em transformação: conteúdo (sem terminador), terminador e tipo"""
+
+    __slots__ = ('dados', 'terminador', 'tipo', 'indice')
+
+    def __init__(self, dados, terminador, tipo, indice):
+        self.dados = dados
+        self.terminador = terminador
+        self.tipo = tipo      # b'0', b'1', b'9'...
+        self.indice = indice  # Posição do detalhe no arquivo (0 para o primeiro); None nos demais
+
+    def campo(self, inicio, fim):
+        """Bytes das posições [inicio:fim], completados com espaços em linhas curtas"""
+        return bytes(self.dados[inicio:fim]).ljust(fim - inicio)
+
+    def gravar(self, inicio, conteudo):
+        """Sobrescreve as posições a partir de 'inicio' (linhas curtas são completadas até 400 com espaços)"""
+        dados = self.dados
+        if type(dados) is not bytearray:
+            dados = self.dados = bytearray(dados)
+        fim = inicio + len(conteudo)
+        tamanho = len(dados)
+        if tamanho < TAMANHO_REGISTRO or tamanho < fim:
+            dados.extend(b' ' * (max(TAMANHO_REGISTRO, fim) - tamanho))
+        dados[inicio:fim] = conteudo
+
+
+class Etapa:
+    """
+    Base das etapas de transformação.
+
+    aplicar(registro) é chamado, em ordem, para cada registro de um dos tipos em
+    'tipos' e altera o registro no lugar; retornar False descarta o registro.
+    """
+
+    tipos = (b'0', b'1', b'9')
+
+    def aplicar(self, registro):
+        raise NotImplementedError
+
+
+class GravarHeader(Etapa):
+    """Sobrescreve posições do header, ex.: [(26, 46, b'...')] para o código da empresa"""
+
+    tipos = (b'0',)
+
+    def __init__(self, trechos):
+        self.trechos = trechos
+        self.alterado = False
+
+    def aplicar(self, registro):
+        for inicio, _, conteudo in self.trechos:
+            registro.gravar(inicio, conteudo)
+        self.alterado = True
+
+
+class CodigoEmpresaHeader(GravarHeader):
+    """Grava o código da empresa (20 caracteres, posições 26-46) no header"""
+
+    def __init__(self, codigo_empresa, codificacao=CODIFICACAO_PADRAO):
+        super().__init__([(26, 46, codigo_empresa.ljust(20)[:20].encode(codificacao))])
+
+
+class EdicoesPontuais(Etapa):
+    """Aplica as edições de um diário (cnab_diario.DiarioEdicoes) aos detalhes anotados"""
+
+    tipos = (b'1',)
+
+    def __init__(self, diario, codificacao=CODIFICACAO_PADRAO):
+        self.trechos = diario.trechos_por_registro(codificacao)
+        self.registros_alterados = 0
+
+    def aplicar(self, registro):
+        trechos = self.trechos.get(registro.indice)
+        if trechos:
+            for inicio, _, conteudo in trechos:
+                registro.gravar(inicio, conteudo)
+            self.registros_alterados += 1
+
+
+class ZerarCampo(Etapa):
+    """Zera (preenche com '0') as posições [inicio:fim] de todos os detalhes"""
+
+    tipos = (b'1',)
+
+    def __init__(self, inicio, fim):
+        self.inicio = inicio
+        self.zeros = b'0' * (fim - inicio)
+        self.registros = 0
+
+    def aplicar(self, registro):
+        registro.gravar(self.inicio, self.zeros)
+        self.registros += 1
+
+
+class ZerarJuros(ZerarCampo):
+    """Zera juros/mora/multa (posições 266-279) de todos os detalhes"""
+
+    def __init__(self):
+        super().__init__(*POSICAO_JUROS)
+
+
+class Renumerar(Etapa):
+    """Renumera o sequencial (posições 394-400) de todos os registros gravados, a partir de 1"""
+
+    def __init__(self, inicial=1):
+        self.proximo = inicial
+
+    def aplicar(self, registro):
+        inicio, fim = POSICAO_SEQUENCIAL
+        registro.gravar(inicio, str(self.proximo).zfill(fim - inicio).encode('ascii'))
+        self.proximo += 1
+
+
+class TerminadorFixo(Etapa):
+    """Troca a quebra de linha dos registros dos tipos informados (ex.: b'\\n' nos detalhes)"""
+
+    def __init__(self, terminador=b'\n', tipos=(b'1',)):
+        self.terminador = terminador
+        self.tipos = tipos
+
+    def aplicar(self, registro):
+        registro.terminador = self.terminador
+
+
+class RecalcularTrailer(Etapa):
+    """
+    Recalcula o trailer durante a própria passagem: os detalhes são totalizados por
+    tipo de cobrança (quantidade e valor do título) à medida que passam e, ao chegar
+    o trailer, os totais e o sequencial final são gravados nele.
+
+    Deve ser a última etapa, para totalizar os detalhes já alterados e apenas os
+    que serão gravados. Só os campos cujo valor muda são regravados, e o
+    sequencial apenas em trailers com 400 posições.
+    """
+
+    def __init__(self):
+        self.totais = TotaisCobranca()
+        self.registros = 0
+        self._carteira = POSICOES_DETALHE['carteira']
+        self._valor = POSICOES_DETALHE['valor_titulo']
+
+    def aplicar(self, registro):
+        self.registros += 1
+        if registro.tipo == b'1':
+            carteira = registro.campo(*self._carteira).decode('ascii', 'replace')
+            self.totais.acumular(carteira, centavos_de_texto(registro.campo(*self._valor)))
+        elif registro.tipo == b'9':
+            completo = len(registro.dados) >= TAMANHO_REGISTRO
+            campos = self.totais.campos_alterados(registro.dados, self.registros if completo else None)
+            for nome, texto in campos.items():
+                registro.gravar(POSICOES_TRAILER[nome][0], texto.encode('ascii'))
+
+
+def transformar_arquivo(origem, destino, etapas, dados=None):
+    """
+    Grava em 'destino' o arquivo 'origem' transformado pelas etapas, em uma única passagem.
+
+    O destino é gravado em um arquivo temporário na mesma pasta e só substitui o
+    anterior ao final, o que permite usar o próprio arquivo de origem como destino.
+    'dados' é o conteúdo da origem, se já tiver sido lido (a origem não é lida de novo).
+    Retorna a quantidade de registros e de detalhes gravados.
+    """
+    etapas_por_tipo = {}
+    for etapa in etapas:
+        for tipo in etapa.tipos:
+            etapas_por_tipo.setdefault(tipo, []).append(etapa)
+
+    registros = 0
+    detalhes = 0
+    indice_detalhe = 0
+    pasta = os.path.dirname(os.path.abspath(destino))
+    descritor, temporario = tempfile.mkstemp(suffix='.tmp', dir=pasta)
+    try:
+        entrada = io.BytesIO(dados) if dados is not None else open(origem, 'rb', buffering=TAMANHO_BUFFER)
+        with entrada, \
+                os.fdopen(descritor, 'wb', buffering=TAMANHO_BUFFER) as saida:
+            shutil.copymode(origem, temporario)
+            for linha in entrada:
+                tipo = linha[:1]
+                indice = None
+                if tipo == b'1':
+                    indice = indice_detalhe
+                    indice_detalhe += 1
+
+                etapas_linha = etapas_por_tipo.get(tipo)
+                if etapas_linha:
+                    conteudo = linha.rstrip(b'\r\n')
+                    registro = Registro(conteudo, linha[len(conteudo):], tipo, indice)
+                    descartar = False
+                    for etapa in etapas_linha:
+                        if etapa.aplicar(registro) is False:
+                            descartar = True
+                            break
+                    if descartar:
+                        continue
+                    linha = registro.dados + registro.terminador
+
+                saida.write(linha)
+                if tipo in (b'0', b'1', b'9'):
+                    registros += 1
+                    detalhes += tipo == b'1'
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+    return registros, detalhes
@@ -0,0 +1,256 @@
+"""
+Verificação de arquivos CNAB 400 editados contra o original.
+
+A edição segura (CNABBradesco._editar_cnab_seguro) promete alterar apenas
+algumas posições: o código da empresa no header (27-46), os campos editáveis
+dos detalhes (21-37, 71-82, 117-126, 135-146), os juros/multa (267-279) e, no
+trailer, os totais e o sequencial recalculados. Os dois arquivos são
+organizados em matrizes (registros x 400 bytes) e comparados em uma única
+operação vetorizada; todo byte alterado fora das posições permitidas é
+relatado com o número da linha.
+
+Os totais e o sequencial do trailer só são aceitos quando iguais aos
+recalculados a partir dos detalhes do arquivo gerado.
+"""
+
+import numpy as np
+
+from cnab_layout import TAMANHO_REGISTRO, CODIFICACAO_PADRAO, decodificar_texto
+from cnab_colunar import localizar_linhas, montar_matriz, decodificar_inteiros, decodificar_textos
+from cnab_diario import CAMPOS_EDITAVEIS
+from cnab_montagem import POSICOES_HEADER, POSICOES_DETALHE, POSICOES_TRAILER, TotaisCobranca
+from cnab_transformacao import POSICAO_JUROS
+
+# Quantidade máxima de divergências detalhadas no resultado (o total é sempre contado)
+LIMITE_DIVERGENCIAS = 100
+
+# Registros comparados por vez (a comparação de cada bloco ocupa _BLOCO_LINHAS x 400 bytes)
+_BLOCO_LINHAS = 10000
+
+_DETALHE = ord('1')
+_HEADER = ord('0')
+_TRAILER = ord('9')
+_RETORNO = ord('\r')
+_QUEBRA = ord('\n')
+
+
+def _mascara(faixas):
+    """Vetor de 400 posições com True nas faixas (início, fim) informadas"""
+    mascara = np.zeros(TAMANHO_REGISTRO, dtype=bool)
+    for inicio, fim in faixas:
+        mascara[inicio:fim] = True
+    return mascara
+
+
+def posicoes_permitidas(zerar_juros=True):
+    """Faixas (início, fim) que a edição segura pode alterar no header e nos detalhes"""
+    detalhe = [(inicio, fim) for inicio, fim, _ in CAMPOS_EDITAVEIS.values()]
+    if zerar_juros:
+        detalhe.append(POSICAO_JUROS)
+    return {'header': [POSICOES_HEADER['codigo_empresa']], 'detalhe': detalhe}
+
+
+class ResultadoVerificacao:
+    """Divergências encontradas (limitadas a LIMITE_DIVERGENCIAS) e problemas de estrutura"""
+
+    def __init__(self):
+        self.divergencias = []  # Dicionários: linha, inicio, fim (posições 1-400), original, gravado
+        self.linhas_divergentes = 0
+        self.problemas = []  # Mensagens: quantidade de linhas, quebras de linha, tamanhos
+        self.completo = True  # False quando as divergências foram limitadas
+
+    @property
+    def ok(self):
+        return not self.linhas_divergentes and not self.problemas
+
+    def mensagem(self, limite=10):
+        """Descrição das divergências para exibição (no máximo 'limite' delas)"""
+        if self.ok:
+            return "Verificação concluída: apenas as posições permitidas foram alteradas"
+        partes = list(self.problemas)
+        if self.linhas_divergentes:
+            partes.append(f"{self.linhas_divergentes} linha(s) com bytes alterados fora das posições permitidas:")
+            for divergencia in self.divergencias[:limite]:
+                partes.append(f"  Linha {divergencia['linha']}, posições {divergencia['inicio']}-{divergencia['fim']}: "
+                              f"'{divergencia['original']}' -> '{divergencia['gravado']}'")
+            if len(self.divergencias) > limite or not self.completo:
+                partes.append("  ...")
+        return "\n".join(partes)
+
+
+def _ler(arquivo):
+    """Vetor uint8 com o conteúdo de um caminho, de bytes ou de um vetor já carregado"""
+    if isinstance(arquivo, np.ndarray):
+        return arquivo
+    if isinstance(arquivo, (bytes, bytearray, memoryview)):
+        return np.frombuffer(arquivo, dtype=np.uint8)
+    return np.fromfile(arquivo, dtype=np.uint8)
+
+
+def _registros(dados, codificacao):
+    """
+    (matriz, inicios, fins) dos registros do arquivo.
+
+    Arquivos em que todo registro tem 400 bytes e o mesmo terminador (o caso
+    comum) viram uma visão sem cópia, sem procurar as quebras de linha byte a
+    byte; os demais passam por montar_matriz.
+    """
+    primeira = np.flatnonzero(dados[:TAMANHO_REGISTRO + 2] == _QUEBRA)
+    if primeira.size:
+        quebra = int(primeira[0])
+        retorno = quebra > 0 and dados[quebra - 1] == _RETORNO
+        passo = quebra + 1
+        if quebra - retorno == TAMANHO_REGISTRO and dados.size % passo == 0:
+            quebras = dados[quebra::passo] == _QUEBRA
+            retornos = dados[quebra - 1::passo] == _RETORNO
+            if quebras.all() and (retornos.all() if retorno else not retornos.any()):
+                quantidade = dados.size // passo
+                inicios = np.arange(quantidade, dtype=np.int64) * passo
+                matriz = np.lib.stride_tricks.as_strided(
+                    dados, shape=(quantidade, TAMANHO_REGISTRO), strides=(passo, 1), writeable=False)
+                return matriz, inicios, inicios + TAMANHO_REGISTRO
+
+    inicios, fins = localizar_linhas(dados)
+    matriz, _ = montar_matriz(dados, codificacao, incluir_linhas=False)
+    return matriz, inicios, fins
+
+
+def _com_retorno(dados, fins):
+    """Linhas cuja quebra é '\\r\\n' (o fim localizado aponta para o '\\r')"""
+    dentro = fins < dados.size
+    return dentro & (dados[np.minimum(fins, dados.size - 1)] == _RETORNO)
+
+
+def _campos_trailer_aceitos(saida, tipos):
+    """Faixas dos totais e do sequencial do trailer aceitos, por linha de trailer do arquivo gerado"""
+    detalhes = tipos == _DETALHE
+    inicio, fim = POSICOES_DETALHE['carteira']
+    carteiras = decodificar_textos(saida[:, inicio:fim][detalhes])
+    inicio, fim = POSICOES_DETALHE['valor_titulo']
+    centavos = decodificar_inteiros(saida[:, inicio:fim][detalhes])
+
+    totais = TotaisCobranca()
+    totais.acumular_colunas(carteiras, centavos)
+    registros = int(np.count_nonzero(detalhes) + np.count_nonzero((tipos == _HEADER) | (tipos == _TRAILER)))
+
+    aceitos = {}
+    for linha in np.flatnonzero(tipos == _TRAILER):
+        trailer = saida[linha].tobytes()
+        divergentes = totais.campos_alterados(trailer, registros)
+        aceitos[int(linha)] = [POSICOES_TRAILER[nome] for nome in totais.campos(registros) if nome not in divergentes]
+    return aceitos
+
+
+def _faixas_alteradas(proibidas):
+    """Faixas contíguas (início, fim) das posições True de uma linha"""
+    colunas = np.flatnonzero(proibidas)
+    quebras = np.flatnonzero(np.diff(colunas) > 1)
+    inicios = np.concatenate(([colunas[0]], colunas[quebras + 1]))
+    fins = np.concatenate((colunas[quebras], [colunas[-1]])) + 1
+    return zip(inicios.tolist(), fins.tolist())
+
+
+def _linhas_alteradas(original, gerado, proibidas):
+    """
+    Linhas das duas matrizes com algum byte diferente nas posições True de
+    'proibidas', comparadas em blocos de _BLOCO_LINHAS registros.
+    """
+    alteradas = np.empty(original.shape[0], dtype=bool)
+    for inicio in range(0, original.shape[0], _BLOCO_LINHAS):
+        bloco = slice(inicio, inicio + _BLOCO_LINHAS)
+        diferentes = original[bloco] != gerado[bloco]
+        diferentes &= proibidas
+        diferentes.any(axis=1, out=alteradas[bloco])
+    return alteradas
+
+
+def verificar_edicao(original, gerado, zerar_juros=True, codificacao=CODIFICACAO_PADRAO,
+                     limite=LIMITE_DIVERGENCIAS):
+    """
+    Compara o arquivo gerado pela edição segura com o original.
+
+    'original' e 'gerado' podem ser caminhos, bytes ou vetores uint8. Com
+    zerar_juros=False, alterações nos juros/multa (267-279) também são relatadas.
+    Linhas curtas completadas com espaços até 400 posições não contam como
+    alteração. Retorna um ResultadoVerificacao.
+    """
+    resultado = ResultadoVerificacao()
+    dados_original, dados_gerado = _ler(original), _ler(gerado)
+
+    matriz_original, inicios_original, fins_original = _registros(dados_original, codificacao)
+    matriz_gerado, inicios_gerado, fins_gerado = _registros(dados_gerado, codificacao)
+    if inicios_original.size != inicios_gerado.size:
+        resultado.problemas.append(f"Quantidade de linhas alterada: {inicios_original.size} -> {inicios_gerado.size}")
+        return resultado
+
+    # Estrutura: quebras de linha e tamanhos (só é aceito completar linhas curtas até 400)
+    quebras = np.flatnonzero(_com_retorno(dados_original, fins_original) != _com_retorno(dados_gerado, fins_gerado))
+    if quebras.size:
+        resultado.problemas.append(f"Quebra de linha alterada em {quebras.size} linha(s), "
+                                   f"a partir da linha {quebras[0] + 1}")
+    tamanhos_original = fins_original - inicios_original
+    tamanhos_gerado = fins_gerado - inicios_gerado
+    completadas = (tamanhos_original < TAMANHO_REGISTRO) & (tamanhos_gerado == TAMANHO_REGISTRO)
+    tamanhos = np.flatnonzero((tamanhos_original != tamanhos_gerado) & ~completadas)
+    if tamanhos.size:
+        resultado.problemas.append(f"Tamanho de linha alterado em {tamanhos.size} linha(s), "
+                                   f"a partir da linha {tamanhos[0] + 1}")
+
+    # Bytes além da posição 400 (raros): comparados linha a linha
+    for linha in np.flatnonzero((tamanhos_original > TAMANHO_REGISTRO) & (tamanhos_original == tamanhos_gerado)):
+        excedente_original = dados_original[inicios_original[linha] + TAMANHO_REGISTRO:fins_original[linha]]
+        excedente_gerado = dados_gerado[inicios_gerado[linha] + TAMANHO_REGISTRO:fins_gerado[linha]]
+        if not np.array_equal(excedente_original, excedente_gerado):
+            resultado.problemas.append(f"Linha {linha + 1}: bytes alterados após a posição {TAMANHO_REGISTRO}")
+
+    tipos = matriz_original[:, 0]
+    permitidas = posicoes_permitidas(zerar_juros)
+
+    # Detalhes: comparados em blocos, descontando as posições permitidas
+    proibidas_detalhe = ~_mascara(permitidas['detalhe'])
+    linhas = np.flatnonzero(_linhas_alteradas(matriz_original, matriz_gerado, proibidas_detalhe)
+                            & (tipos == _DETALHE))
+
+    # Demais registros (header, trailer e linhas de outros tipos), com as próprias posições permitidas
+    proibidas = {}
+    outras = np.flatnonzero(tipos != _DETALHE)
+    if outras.size:
+        trailers = None
+        mascaras = {}
+        for linha in outras.tolist():
+            alteradas = matriz_original[linha] != matriz_gerado[linha]
+            if not alteradas.any():
+                continue
+            if tipos[linha] == _HEADER:
+                faixas = permitidas['header']
+            elif tipos[linha] == _TRAILER:
+                if trailers is None:
+                    trailers = _campos_trailer_aceitos(matriz_gerado, matriz_gerado[:, 0])
+                faixas = trailers.get(linha, [])
+            else:
+                faixas = []
+            chave = tuple(faixas)
+            if chave not in mascaras:
+                mascaras[chave] = ~_mascara(faixas)
+            alteradas &= mascaras[chave]
+            if alteradas.any():
+                proibidas[linha] = alteradas
+        linhas = np.union1d(linhas, np.fromiter(proibidas, dtype=np.int64))
+
+    resultado.linhas_divergentes = int(linhas.size)
+    for linha in linhas.tolist():
+        alteradas = proibidas.get(linha)
+        if alteradas is None:
+            alteradas = (matriz_original[linha] != matriz_gerado[linha]) & proibidas_detalhe
+        for inicio, fim in _faixas_alteradas(alteradas):
+            resultado.divergencias.append({
+                'linha': linha + 1,
+                'inicio': inicio + 1,
+                'fim': fim,
+                'original': decodificar_texto(matriz_original[linha, inicio:fim].tobytes(), codificacao),
+                'gravado': decodificar_texto(matriz_gerado[linha, inicio:fim].tobytes(), codificacao),
+            })
+            if len(resultado.divergencias) >= limite:
+                resultado.completo = False
+                return resultado
+    return resultado
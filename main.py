@@ -1,4 +1,5 @@
 import sys
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from cnab_bradesco_gui import CNABBradescoGUI
 
@@ -12,4 +13,5 @@ def main():
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
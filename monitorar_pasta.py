@@ -0,0 +1,326 @@
+"""
+Processamento contínuo de uma pasta de entrada de retornos CNAB 400.
+
+Os retornos chegam do banco ao longo do dia; em vez de esperar o lote noturno,
+este comando fica observando a pasta de entrada e processa cada arquivo .TXT
+assim que ele termina de ser gravado:
+
+- no Linux a pasta é observada por inotify (o arquivo é processado quando quem
+  o grava o fecha, ou quando é movido para a pasta); nos demais sistemas, por
+  varredura periódica (os.scandir), e o arquivo só é processado depois de
+  ficar ESPERA_ESTAVEL segundos sem mudar de tamanho nem de data;
+- cada arquivo vai para um pool de processos que executa a mesma exportação
+  do lote (processar_lote.processar_arquivo: CSV, Excel e retorno sem juros);
+- ao terminar, o arquivo é movido para a pasta de arquivados (ou para a de
+  erros, se não pôde ser processado).
+
+Arquivos que estavam na pasta ao iniciar também são processados. Um arquivo em
+processamento quando o comando é interrompido fica na entrada e é processado de
+novo na próxima execução.
+
+Uso:
+    python monitorar_pasta.py ENTRADA [-o SAIDA] [--arquivados PASTA] [--erros PASTA]
+                              [--formatos csv xlsx retorno] [--jobs N] [--intervalo S] [--cache]
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import multiprocessing
+import os
+import select
+import shutil
+import signal
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from processar_lote import FORMATOS, processar_arquivo, formatar_moeda
+
+# Intervalo entre varreduras da pasta quando não há inotify (segundos)
+INTERVALO_VARREDURA = 1.0
+
+# Tempo sem mudança de tamanho e data para considerar um arquivo completo (varredura)
+ESPERA_ESTAVEL = 1.0
+
+# Intervalo de verificação enquanto há arquivos aguardando ou em processamento (segundos)
+_INTERVALO_ATIVO = 0.2
+
+# inotify(7)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_EVENTO = struct.Struct('iIII')
+
+
+def _eh_retorno(nome):
+    return nome.upper().endswith('.TXT')
+
+
+class ObservadorVarredura:
+    """Observa a pasta por varredura periódica; os arquivos encontrados ainda precisam ficar estáveis"""
+
+    completos = False
+
+    def __init__(self, pasta, intervalo=INTERVALO_VARREDURA):
+        self.pasta = pasta
+        self.intervalo = intervalo
+        self._ultima = float('-inf')
+
+    def aguardar(self, limite):
+        """Nomes dos arquivos .TXT da pasta, esperando no máximo 'limite' segundos"""
+        espera = self._ultima + self.intervalo - time.monotonic()
+        if espera > limite:
+            time.sleep(limite)
+            return set()
+        time.sleep(max(espera, 0))
+        self._ultima = time.monotonic()
+        with os.scandir(self.pasta) as itens:
+            return {item.name for item in itens if _eh_retorno(item.name) and item.is_file()}
+
+    def fechar(self):
+        pass
+
+
+class ObservadorInotify:
+    """
+    Observa a pasta por inotify (Linux): só chegam os arquivos fechados após a
+    gravação ou movidos para a pasta, que já estão completos.
+    """
+
+    completos = True
+
+    def __init__(self, pasta, intervalo=INTERVALO_VARREDURA):
+        self.pasta = pasta
+        self.intervalo = intervalo  # Espera máxima por eventos quando não há nada pendente
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._descritor = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._descritor < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        if libc.inotify_add_watch(self._descritor, os.fsencode(pasta), _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+            erro = ctypes.get_errno()
+            os.close(self._descritor)
+            raise OSError(erro, 'inotify_add_watch')
+
+    def aguardar(self, limite):
+        """Nomes dos arquivos .TXT fechados ou movidos para a pasta, esperando no máximo 'limite' segundos"""
+        prontos, _, _ = select.select([self._descritor], [], [], limite)
+        if not prontos:
+            return set()
+        dados = os.read(self._descritor, 64 * 1024)
+        nomes = set()
+        posicao = 0
+        while posicao < len(dados):
+            _, mascara, _, tamanho = _EVENTO.unpack_from(dados, posicao)
+            posicao += _EVENTO.size
+            if mascara & _IN_Q_OVERFLOW:
+                # Eventos perdidos: a pasta inteira é varrida de novo
+                with os.scandir(self.pasta) as itens:
+                    nomes.update(item.name for item in itens if _eh_retorno(item.name) and item.is_file())
+            nome = os.fsdecode(dados[posicao:posicao + tamanho].rstrip(b'\0'))
+            posicao += tamanho
+            if _eh_retorno(nome):
+                nomes.add(nome)
+        return nomes
+
+    def fechar(self):
+        os.close(self._descritor)
+
+
+def criar_observador(pasta, intervalo=INTERVALO_VARREDURA):
+    """inotify quando disponível (Linux), senão varredura a cada 'intervalo' segundos"""
+    if sys.platform.startswith('linux'):
+        try:
+            return ObservadorInotify(pasta, intervalo)
+        except (OSError, AttributeError):
+            pass
+    return ObservadorVarredura(pasta, intervalo)
+
+
+def _estado(caminho):
+    """(tamanho, data de modificação) do arquivo, ou None se não existir ou não puder ser aberto"""
+    try:
+        estado = os.stat(caminho)
+        # No Windows, um arquivo ainda aberto para gravação por outro programa não pode ser aberto
+        with open(caminho, 'rb'):
+            pass
+    except OSError:
+        return None
+    return estado.st_size, estado.st_mtime_ns
+
+
+def mover_para(caminho, pasta):
+    """Move o arquivo para a pasta; se já houver um com o mesmo nome, acrescenta data e hora ao nome"""
+    os.makedirs(pasta, exist_ok=True)
+    destino = os.path.join(pasta, os.path.basename(caminho))
+    if os.path.exists(destino):
+        nome_base, extensao = os.path.splitext(os.path.basename(caminho))
+        destino = os.path.join(pasta, f"{nome_base}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{extensao}")
+    shutil.move(caminho, destino)
+    return destino
+
+
+def monitorar(entrada, pasta_saida, pasta_arquivados, pasta_erros, exportar_excel=True, gerar_cnab=True,
+              processos=None, observador=None, espera=ESPERA_ESTAVEL, ao_concluir=None, parar=None,
+              usar_cache=False):
+    """
+    Processa os retornos que chegam em 'entrada' até 'parar' (threading.Event) ser sinalizado.
+
+    'observador' é o ObservadorInotify ou ObservadorVarredura da pasta (padrão:
+    criar_observador). 'ao_concluir(resumo, destino, latencia)' é chamado no
+    processo principal quando cada arquivo termina, com o resumo de
+    processar_arquivo, o caminho para onde a entrada foi movida (None se não
+    pôde ser movida) e os segundos desde que ela foi vista. Com usar_cache=True,
+    as leituras passam pelo cache em disco (cnab_cache.py).
+
+    Um arquivo substituído por outro com o mesmo nome enquanto era processado
+    não é movido: o novo conteúdo é processado (e relatado) em seguida.
+    """
+    processos = processos or os.cpu_count() or 1
+    for pasta in (pasta_saida, pasta_arquivados, pasta_erros):
+        os.makedirs(pasta, exist_ok=True)
+
+    observador = observador or criar_observador(entrada)
+    aguardando = {}      # caminho -> [estado, desde quando está nesse estado, chegada]
+    fechados = set()     # Caminhos já fechados por quem gravou (inotify): não precisam esperar
+    em_andamento = {}    # tarefa -> (caminho, estado ao ser enviado, chegada)
+    ignorados = set()    # Caminhos em processamento ou que não puderam ser movidos da entrada
+    reavisados = set()   # Caminhos ignorados que tiveram eventos: conferidos de novo ao concluir
+
+    def anotar(nomes, completos):
+        agora = time.monotonic()
+        for nome in nomes:
+            caminho = os.path.join(entrada, nome)
+            if caminho in ignorados:
+                reavisados.add(caminho)
+                continue
+            aguardando.setdefault(caminho, [None, agora, agora])
+            if completos:
+                fechados.add(caminho)
+
+    # Arquivos que já estavam na pasta podem estar sendo gravados: passam pela espera
+    with os.scandir(entrada) as itens:
+        anotar([item.name for item in itens if _eh_retorno(item.name) and item.is_file()], False)
+
+    try:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            while parar is None or not parar.is_set():
+                ativo = aguardando or em_andamento
+                anotar(observador.aguardar(_INTERVALO_ATIVO if ativo else observador.intervalo),
+                       observador.completos)
+
+                # Arquivos fechados, ou sem mudança de tamanho e data há 'espera' segundos, vão para o pool
+                agora = time.monotonic()
+                for caminho, (anterior, desde, chegada) in list(aguardando.items()):
+                    estado = _estado(caminho)
+                    if estado is None:
+                        if not os.path.exists(caminho):
+                            del aguardando[caminho]  # Removido ou renomeado antes de ser processado
+                            fechados.discard(caminho)
+                    elif caminho in fechados or (estado == anterior and agora - desde >= espera):
+                        del aguardando[caminho]
+                        fechados.discard(caminho)
+                        ignorados.add(caminho)
+                        tarefa = executor.submit(processar_arquivo, caminho, pasta_saida, exportar_excel,
+                                                 gerar_cnab, False, usar_cache)
+                        em_andamento[tarefa] = (caminho, estado, chegada)
+                    elif estado != anterior:
+                        aguardando[caminho] = [estado, agora, chegada]
+
+                # Arquivos concluídos: entrada movida para arquivados (ou erros)
+                for tarefa in [tarefa for tarefa in em_andamento if tarefa.done()]:
+                    caminho, estado, chegada = em_andamento.pop(tarefa)
+                    try:
+                        resumo, _ = tarefa.result()
+                    except Exception as e:
+                        resumo = {'arquivo': os.path.basename(caminho), 'sucesso': False, 'qtd_titulos': 0,
+                                  'valor_total': 0, 'mensagens': [f"  Erro ao processar o arquivo: {e}"],
+                                  'segundos': 0.0}
+                    # Substituído por outro com o mesmo nome durante o processamento: processar o novo conteúdo
+                    if caminho in reavisados:
+                        reavisados.discard(caminho)
+                        if _estado(caminho) != estado:
+                            ignorados.discard(caminho)
+                            anotar([os.path.basename(caminho)], False)
+                            continue
+                    try:
+                        destino = mover_para(caminho, pasta_arquivados if resumo['sucesso'] else pasta_erros)
+                        ignorados.discard(caminho)
+                    except OSError as e:
+                        resumo['mensagens'].append(f"  Erro ao mover o arquivo: {e}")
+                        destino = None
+                    # Um arquivo com o mesmo nome pode ter chegado enquanto este era movido
+                    if caminho in reavisados and caminho not in ignorados:
+                        reavisados.discard(caminho)
+                        anotar([os.path.basename(caminho)], False)
+                    if ao_concluir:
+                        ao_concluir(resumo, destino, time.monotonic() - chegada)
+    finally:
+        observador.fechar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Processa continuamente os retornos CNAB que chegam em uma pasta')
+    parser.add_argument('entrada', help='Pasta de entrada observada (arquivos .TXT)')
+    parser.add_argument('-o', '--saida', help='Pasta das saídas (padrão: ENTRADA/processados)')
+    parser.add_argument('--arquivados', help='Pasta para onde vão os arquivos processados (padrão: ENTRADA/arquivados)')
+    parser.add_argument('--erros', help='Pasta para onde vão os arquivos com erro (padrão: ENTRADA/erros)')
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=list(FORMATOS),
+                        help='Saídas geradas (padrão: todas; o CSV é sempre gerado)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Arquivos processados ao mesmo tempo (padrão: núcleos da máquina)')
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_VARREDURA,
+                        help=f'Intervalo da varredura sem inotify, em segundos (padrão: {INTERVALO_VARREDURA})')
+    parser.add_argument('--cache', action='store_true',
+                        help='Usa o cache em disco das leituras (guarda dados dos retornos; ver cnab_cache.py)')
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error('--jobs deve ser pelo menos 1')
+    if not os.path.isdir(args.entrada):
+        print(f"Pasta não encontrada: {args.entrada}")
+        return 2
+
+    pasta_saida = args.saida or os.path.join(args.entrada, 'processados')
+    pasta_arquivados = args.arquivados or os.path.join(args.entrada, 'arquivados')
+    pasta_erros = args.erros or os.path.join(args.entrada, 'erros')
+    # Saídas (*_retorno.TXT) ou arquivos movidos para a própria entrada voltariam a ser processados
+    for opcao, pasta in (('--saida', pasta_saida), ('--arquivados', pasta_arquivados), ('--erros', pasta_erros)):
+        if os.path.realpath(pasta) == os.path.realpath(args.entrada):
+            parser.error(f'{opcao} não pode ser a própria pasta de entrada')
+    observador = criar_observador(args.entrada, args.intervalo)
+    modo = 'inotify' if isinstance(observador, ObservadorInotify) else 'varredura'
+    print(f"Observando {args.entrada} ({modo}, {args.jobs} job(s)) -> {pasta_saida}. Ctrl+C para encerrar.")
+
+    def exibir(resumo, destino, latencia):
+        hora = datetime.now().strftime('%H:%M:%S')
+        if resumo['sucesso']:
+            print(f"[{hora}] ✅ {resumo['arquivo']}: {resumo['qtd_titulos']} título(s), "
+                  f"{formatar_moeda(resumo['valor_total'])}, {resumo['segundos']:.2f}s "
+                  f"({latencia:.2f}s desde a chegada) -> {destino}")
+        else:
+            print(f"[{hora}] ❌ {resumo['arquivo']} -> {destino or 'mantido na entrada'}")
+            for mensagem in resumo['mensagens']:
+                print(mensagem)
+        sys.stdout.flush()
+
+    # SIGTERM (serviço, agendador) encerra como Ctrl+C: o laço termina e as saídas em andamento são concluídas
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    try:
+        monitorar(args.entrada, pasta_saida, pasta_arquivados, pasta_erros,
+                  exportar_excel='xlsx' in args.formatos, gerar_cnab='retorno' in args.formatos,
+                  processos=args.jobs, observador=observador, ao_concluir=exibir, parar=parar,
+                  usar_cache=args.cache)
+    except KeyboardInterrupt:
+        pass
+    print("\nEncerrado.")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,16 +1,359 @@
 import os
 import sys
-import pandas as pd
+import argparse
+import fnmatch
+import json
+import multiprocessing
 import glob
 import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import repeat
+from openpyxl import Workbook
 from cnab_bradesco import CNABBradesco
+from cnab_exportacao import DestinoCSV, DestinoExcel, DestinoRetornoSemJuros
+from cnab_layout import dataframe_em_reais
+from cnab_manifesto import ManifestoLote, identificar_arquivo
+from cnab_moeda import formatar_centavos, centavos_para_reais
+
+# Padrão dos arquivos procurados nas pastas
+PADRAO_ARQUIVOS = '*.TXT'
+
+# Formatos de saída de cada arquivo (o CSV é sempre gerado)
+FORMATOS = ('csv', 'xlsx', 'retorno')
 
 def formatar_moeda(valor):
-    """Formata um valor para o padrão monetário brasileiro"""
-    return f"R$ {valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+    """Formata um valor em centavos para o padrão monetário brasileiro"""
+    return formatar_centavos(valor)
+
+class ConsolidacaoLote:
+    """
+    Saídas consolidadas do lote, gravadas à medida que cada arquivo termina.
+    
+    As linhas de cada arquivo são acrescentadas ao CSV consolidado (e à planilha
+    Detalhes do Excel, em modo de escrita contínua) assim que ele é processado;
+    para os resumos guarda-se apenas a quantidade e o valor de cada arquivo. A
+    memória usada depende do maior arquivo, não do lote inteiro. Os arquivos
+    consolidados só são criados quando chega o primeiro título.
+    """
+    
+    def __init__(self, caminho_csv, caminho_excel=None):
+        self.caminho_csv = caminho_csv
+        self.caminho_excel = caminho_excel
+        self.por_arquivo = {}  # arquivo_origem -> [qtd_titulos, valor_total em centavos]
+        self._csv = None
+        self._pasta = None
+        self._detalhes = None
+    
+    def acrescentar(self, df):
+        """Acrescenta os detalhes (em centavos, com a coluna arquivo_origem) de um arquivo"""
+        if df is None or df.empty:
+            return
+        df_reais = dataframe_em_reais(df)
+        
+        if self._csv is None:
+            self._csv = open(self.caminho_csv, 'w', encoding='utf-8', newline='')
+            df_reais.to_csv(self._csv, index=False, sep=';')
+        else:
+            df_reais.to_csv(self._csv, index=False, sep=';', header=False)
+        
+        if self.caminho_excel:
+            if self._pasta is None:
+                self._pasta = Workbook(write_only=True)
+                self._detalhes = self._pasta.create_sheet('Detalhes')
+                self._detalhes.append(list(df_reais.columns))
+            for linha in df_reais.astype(object).where(df_reais.notna(), None).itertuples(index=False):
+                self._detalhes.append(list(linha))
+        
+        for arquivo, grupo in df.groupby('arquivo_origem'):
+            totais = self.por_arquivo.setdefault(arquivo, [0, 0])
+            totais[0] += int(grupo['nosso_numero'].count())
+            totais[1] += int(grupo['valor_principal'].sum())
+    
+    @property
+    def vazia(self):
+        return self._csv is None
+    
+    def fechar(self, arquivos_processados, total_titulos, valor_total):
+        """Fecha o CSV e grava no Excel o resumo por arquivo e o resumo geral"""
+        if self._csv is not None:
+            self._csv.close()
+        if self._pasta is None:
+            return
+        
+        # Criar resumo por arquivo
+        resumo = self._pasta.create_sheet('Resumo_por_Arquivo')
+        resumo.append(['arquivo_origem', 'qtd_titulos', 'valor_total'])
+        for arquivo in sorted(self.por_arquivo):
+            qtd_titulos, valor = self.por_arquivo[arquivo]
+            resumo.append([arquivo, qtd_titulos, centavos_para_reais(valor)])
+        
+        # Criar resumo geral
+        geral = self._pasta.create_sheet('Resumo_Geral')
+        geral.append(['Informação', 'Valor'])
+        geral.append(['Total de Arquivos Processados', arquivos_processados])
+        geral.append(['Total de Títulos', total_titulos])
+        geral.append(['Valor Total', formatar_moeda(valor_total)])
+        geral.append(['Data de Processamento', datetime.now().strftime("%d/%m/%Y %H:%M:%S")])
+        
+        self._pasta.save(self.caminho_excel)
+
+def processar_arquivo(arquivo, pasta_saida, exportar_excel=False, gerar_cnab=False, paralelo=None, usar_cache=False):
+    """
+    Processa um arquivo do lote: leitura única, CSV e, se pedidos, Excel e CNAB de retorno.
+    
+    Pode rodar em um processo separado: em vez de imprimir, devolve as mensagens
+    de progresso para que o processo principal as exiba na ordem dos arquivos.
+    Retorna (resumo, df), em que resumo é um dicionário pequeno (arquivo, sucesso,
+    qtd_titulos, valor_total em centavos, segundos, mensagens, identificacao do
+    arquivo para o manifesto e saidas geradas por tipo) e df são os detalhes (em
+    centavos) com a coluna arquivo_origem, ou None se o arquivo não foi processado.
+    """
+    inicio = time.perf_counter()
+    nome_arquivo = os.path.basename(arquivo)
+    resumo = {'arquivo': nome_arquivo, 'sucesso': False, 'qtd_titulos': 0, 'valor_total': 0, 'mensagens': [],
+              'saidas': {}}
+    mensagens = resumo['mensagens']
+    
+    # Criar instância do processador CNAB
+    processador = CNABBradesco(arquivo, usar_cache=usar_cache)
+    
+    # Ler e decodificar o arquivo uma única vez; todas as exportações partem desta leitura
+    try:
+        # Data antes da leitura e hash do próprio conteúdo exportado (o arquivo é lido uma única vez)
+        estado = os.stat(arquivo)
+        with open(arquivo, 'rb') as entrada:
+            dados = entrada.read()
+        resumo['identificacao'] = identificar_arquivo(arquivo, dados, estado)
+        df = processador.ler_para_exportacao(paralelo=paralelo, dados=dados)
+    except Exception as e:
+        mensagens.append(f"  Erro ao ler o arquivo: {str(e)}")
+        df = None
+    
+    if df is None or (processador.header is None and df.empty):
+        mensagens.append(f"  Erro ao processar o arquivo.")
+        resumo['segundos'] = time.perf_counter() - inicio
+        return resumo, None
+    
+    # Calcular valor total (em centavos)
+    resumo['sucesso'] = True
+    resumo['qtd_titulos'] = len(df)
+    resumo['valor_total'] = int(df['valor_principal'].sum())
+    
+    mensagens.append(f"  Títulos processados: {resumo['qtd_titulos']}")
+    mensagens.append(f"  Valor total: {formatar_moeda(resumo['valor_total'])}")
+    
+    # Criar nome base para os arquivos de saída
+    nome_base = re.sub(r'\.TXT$', '', nome_arquivo, flags=re.IGNORECASE)
+    
+    # Destinos da exportação: CSV sempre; Excel e CNAB de retorno se solicitados
+    destinos = [('csv', 'CSV exportado', 'Erro ao exportar CSV',
+                 DestinoCSV(os.path.join(pasta_saida, f"{nome_base}_processado.csv")))]
+    if exportar_excel:
+        destinos.append(('excel', 'Excel exportado', 'Erro ao exportar Excel',
+                         DestinoExcel(os.path.join(pasta_saida, f"{nome_base}_processado.xlsx"))))
+    if gerar_cnab:
+        destinos.append(('cnab', 'CNAB de retorno gerado', 'Erro ao gerar CNAB',
+                         DestinoRetornoSemJuros(os.path.join(pasta_saida, f"{nome_base}_retorno.TXT"))))
+    
+    resultados = processador.exportar([destino for _, _, _, destino in destinos])
+    for (tipo, rotulo, rotulo_erro, destino), (sucesso, mensagem) in zip(destinos, resultados):
+        if sucesso:
+            resumo['saidas'][tipo] = os.path.basename(destino.caminho)
+            mensagens.append(f"  {rotulo}: {os.path.basename(destino.caminho)}")
+        else:
+            mensagens.append(f"  {rotulo_erro}: {mensagem}")
+    
+    df['arquivo_origem'] = nome_arquivo
+    resumo['segundos'] = time.perf_counter() - inicio
+    return resumo, df
+
+def _processar_arquivos(arquivos, pasta_saida, exportar_excel, gerar_cnab, processos, usar_cache=False):
+    """
+    Gera (resumo, df) de cada arquivo, na ordem da lista.
+    
+    Com mais de um processo, os arquivos são distribuídos em um pool de processos
+    (cada um lê os seus arquivos sem dividir a leitura em outros processos) e os
+    resultados chegam ao processo principal na ordem original.
+    """
+    if processos <= 1 or len(arquivos) <= 1:
+        for arquivo in arquivos:
+            yield processar_arquivo(arquivo, pasta_saida, exportar_excel, gerar_cnab, usar_cache=usar_cache)
+        return
+    
+    with ProcessPoolExecutor(max_workers=min(processos, len(arquivos))) as executor:
+        yield from executor.map(processar_arquivo, arquivos, repeat(pasta_saida), repeat(exportar_excel),
+                                repeat(gerar_cnab), repeat(False), repeat(usar_cache))
+
+def listar_arquivos(entradas, padrao=PADRAO_ARQUIVOS):
+    """
+    Arquivos das entradas, sem repetições e em ordem: pastas (arquivos que
+    atendem ao padrão, sem diferenciar maiúsculas), padrões glob e arquivos.
+    """
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = [os.path.join(entrada, nome) for nome in os.listdir(entrada)
+                          if fnmatch.fnmatch(nome.upper(), padrao.upper())]
+        else:
+            candidatos = glob.glob(entrada)
+        arquivos.extend(caminho for caminho in candidatos if os.path.isfile(caminho))
+    return sorted(set(os.path.abspath(caminho) for caminho in arquivos))
+
+
+def nomes_repetidos(arquivos, nome_saida=None):
+    """
+    Arquivos que gravariam saídas com o mesmo nome na pasta de saída (ex.: RET.TXT
+    de duas pastas), agrupados pelo nome sem diferenciar maiúsculas: {nome: [caminhos]}.
+    
+    'nome_saida(caminho)' é o nome usado nas saídas (padrão: o nome do arquivo
+    sem a extensão, como em {nome_base}_processado.csv).
+    """
+    nome_saida = nome_saida or (lambda caminho: os.path.splitext(os.path.basename(caminho))[0])
+    grupos = defaultdict(list)
+    for arquivo in arquivos:
+        grupos[nome_saida(arquivo).casefold()].append(arquivo)
+    return {nome: caminhos for nome, caminhos in grupos.items() if len(caminhos) > 1}
+
+
+def mensagem_nomes_repetidos(repetidos):
+    """Descrição, para o usuário, dos grupos de nomes_repetidos"""
+    linhas = ["Arquivos com o mesmo nome gravariam as mesmas saídas; renomeie-os ou processe-os em lotes separados:"]
+    for caminhos in repetidos.values():
+        linhas.append("  " + ", ".join(caminhos))
+    return "\n".join(linhas)
+
+
+def executar_lote(arquivos, pasta_saida, exportar_excel=False, gerar_cnab=False, processos=None,
+                  reprocessar=False, exibir=print, usar_cache=False):
+    """
+    Processa os arquivos informados, sem interação, e grava as saídas em pasta_saida.
+    
+    'processos' é a quantidade de arquivos processados ao mesmo tempo (padrão:
+    núcleos da máquina); com 1, os arquivos são processados um a um neste processo.
+    
+    A pasta de saída guarda um manifesto (cnab_manifesto.py): arquivos já
+    processados e inalterados são pulados, e os consolidados são refeitos a
+    partir dos CSVs de cada arquivo. Com reprocessar=True, o manifesto é
+    ignorado e todos os arquivos são processados de novo.
+    
+    O progresso é passado, linha a linha, a 'exibir' (None para não exibir).
+    Com usar_cache=True, as leituras passam pelo cache em disco (cnab_cache.py).
+    Retorna o resumo do lote (serializável em JSON), com a situação, a
+    quantidade de títulos, o valor e o tempo de cada arquivo.
+    
+    As saídas e o manifesto usam o nome de cada arquivo: arquivos com o mesmo
+    nome (de pastas diferentes, por exemplo) geram ValueError antes de qualquer
+    processamento; ver nomes_repetidos.
+    """
+    repetidos = nomes_repetidos(arquivos)
+    if repetidos:
+        raise ValueError(mensagem_nomes_repetidos(repetidos))
+    processos = processos or os.cpu_count() or 1
+    exibir = exibir or (lambda *_: None)
+    inicio = time.perf_counter()
+    os.makedirs(pasta_saida, exist_ok=True)
+    
+    # Arquivos novos, alterados ou sem as saídas pedidas; os demais vêm do manifesto
+    manifesto = ManifestoLote(pasta_saida, ignorar_existente=reprocessar)
+    saidas = ['csv'] + ['excel'] * exportar_excel + ['cnab'] * gerar_cnab
+    pendentes = [arquivo for arquivo in arquivos if manifesto.pendente(arquivo, saidas)]
+    if len(pendentes) < len(arquivos):
+        exibir(f"{len(arquivos) - len(pendentes)} arquivo(s) sem alterações desde o último processamento.")
+    if pendentes:
+        exibir(f"Processando {len(pendentes)} arquivo(s) ({min(processos, len(pendentes))} processo(s)).")
+    
+    # Resultados consolidados
+    total_arquivos = len(arquivos)
+    arquivos_processados = 0
+    total_titulos = 0
+    valor_total = 0
+    por_arquivo = []
+    
+    # Saídas consolidadas, gravadas à medida que cada arquivo termina
+    caminho_csv_consolidado = os.path.join(pasta_saida, "consolidado.csv")
+    caminho_excel_consolidado = os.path.join(pasta_saida, "consolidado.xlsx")
+    consolidacao = ConsolidacaoLote(caminho_csv_consolidado, caminho_excel_consolidado if exportar_excel else None)
+    
+    # Processar os pendentes (em paralelo, se houver mais de um processo); progresso na ordem dos arquivos
+    resultados = _processar_arquivos(pendentes, pasta_saida, exportar_excel, gerar_cnab, processos, usar_cache)
+    pendentes = set(pendentes)
+    try:
+        for i, arquivo in enumerate(arquivos, 1):
+            if arquivo in pendentes:
+                resumo, df = next(resultados)
+                exibir(f"\n[{i}/{total_arquivos}] Processando: {resumo['arquivo']}")
+                for mensagem in resumo['mensagens']:
+                    exibir(mensagem)
+                if resumo['sucesso']:
+                    manifesto.registrar(resumo)
+                else:
+                    manifesto.remover(resumo['arquivo'])
+                situacao = 'processado' if resumo['sucesso'] else 'erro'
+            else:
+                # Já processado: totais do manifesto e detalhes do CSV do arquivo
+                nome_arquivo = os.path.basename(arquivo)
+                entrada = manifesto.entradas[nome_arquivo]
+                resumo = {'arquivo': nome_arquivo, 'sucesso': True, 'qtd_titulos': entrada['qtd_titulos'],
+                          'valor_total': entrada['valor_total'], 'saidas': entrada['saidas'], 'mensagens': [],
+                          'segundos': 0.0}
+                exibir(f"\n[{i}/{total_arquivos}] Sem alterações: {resumo['arquivo']} (já processado)")
+                df = manifesto.fragmento(resumo['arquivo'])
+                situacao = 'sem_alteracao'
+            
+            por_arquivo.append({
+                'arquivo': resumo['arquivo'],
+                'caminho': arquivo,
+                'situacao': situacao,
+                'qtd_titulos': resumo['qtd_titulos'],
+                'valor_total_centavos': resumo['valor_total'],
+                'segundos': round(resumo['segundos'], 3),
+                'saidas': resumo['saidas'],
+                'mensagens': [mensagem.strip() for mensagem in resumo['mensagens']],
+            })
+            
+            if resumo['sucesso']:
+                arquivos_processados += 1
+                total_titulos += resumo['qtd_titulos']
+                valor_total += resumo['valor_total']
+                
+                # Acrescentar às saídas consolidadas
+                consolidacao.acrescentar(df)
+    finally:
+        resultados.close()
+        manifesto.gravar()
+        consolidacao.fechar(arquivos_processados, total_titulos, valor_total)
+    
+    if exportar_excel and not consolidacao.vazia:
+        exibir(f"\nExcel consolidado gerado: {os.path.basename(caminho_excel_consolidado)}")
+    
+    return {
+        'pasta_saida': os.path.abspath(pasta_saida),
+        'processos': processos,
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'arquivos_encontrados': total_arquivos,
+        'arquivos_processados': arquivos_processados,
+        'arquivos_sem_alteracao': sum(1 for item in por_arquivo if item['situacao'] == 'sem_alteracao'),
+        'arquivos_com_erro': total_arquivos - arquivos_processados,
+        'total_titulos': total_titulos,
+        'valor_total_centavos': valor_total,
+        'valor_total': formatar_moeda(valor_total),
+        'consolidado': {
+            'csv': None if consolidacao.vazia else os.path.abspath(caminho_csv_consolidado),
+            'xlsx': None if consolidacao.vazia or not exportar_excel else os.path.abspath(caminho_excel_consolidado),
+        },
+        'arquivos': por_arquivo,
+    }
 
-def processar_lote():
+def processar_lote(processos=None, reprocessar=False):
+    """
+    Processa em lote os arquivos .TXT de uma pasta, perguntando ao usuário a
+    pasta e as saídas (para execução agendada, use a linha de comando: main()).
+    
+    As saídas ficam em PASTA/processados; ver executar_lote().
+    """
     print("=" * 70)
     print("PROCESSAMENTO EM LOTE DE ARQUIVOS CNAB 400 - BRADESCO (237)")
     print("=" * 70)
@@ -26,12 +369,18 @@ def processar_lote():
         return
     
     # Buscar arquivos .TXT na pasta
-    arquivos = glob.glob(os.path.join(pasta, "*.TXT"))
+    arquivos = listar_arquivos([pasta])
     
     if not arquivos:
         print(f"Nenhum arquivo .TXT encontrado na pasta: {pasta}")
         return
     
+    # Ex.: RET.TXT e ret.txt, que gravariam as mesmas saídas
+    repetidos = nomes_repetidos(arquivos)
+    if repetidos:
+        print(mensagem_nomes_repetidos(repetidos))
+        return
+    
     print(f"Encontrados {len(arquivos)} arquivos para processamento.")
     
     # Perguntar sobre a exportação para Excel
@@ -40,151 +389,80 @@ def processar_lote():
     # Perguntar sobre a geração de arquivos CNAB de retorno
     gerar_cnab = input("Deseja gerar arquivos CNAB de retorno sem juros? (s/n): ").lower() == 's'
     
-    # Criar pasta de saída
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    pasta_saida = os.path.join(pasta, f"processados_{timestamp}")
-    os.makedirs(pasta_saida, exist_ok=True)
-    
-    # Resultados consolidados
-    total_arquivos = len(arquivos)
-    arquivos_processados = 0
-    total_titulos = 0
-    valor_total = 0
-    
-    # DataFrame consolidado para todos os arquivos
-    df_consolidado = pd.DataFrame()
-    
-    # Processar cada arquivo
-    for i, arquivo in enumerate(arquivos, 1):
-        nome_arquivo = os.path.basename(arquivo)
-        print(f"\n[{i}/{total_arquivos}] Processando: {nome_arquivo}")
-        
-        # Criar instância do processador CNAB
-        processador = CNABBradesco(arquivo)
-        
-        # Ler e processar o arquivo
-        if processador.ler_arquivo():
-            arquivos_processados += 1
-            qtd_titulos = len(processador.detalhes)
-            total_titulos += qtd_titulos
-            
-            # Calcular valor total
-            valor_arquivo = sum(detalhe['valor_principal'] for detalhe in processador.detalhes)
-            valor_total += valor_arquivo
-            
-            print(f"  Títulos processados: {qtd_titulos}")
-            print(f"  Valor total: {processador.formatar_moeda(valor_arquivo)}")
-            
-            # Criar nome base para os arquivos de saída
-            nome_base = re.sub(r'\.TXT$', '', nome_arquivo, flags=re.IGNORECASE)
-            
-            # Exportar para CSV
-            df = pd.DataFrame(processador.detalhes)
-            if 'linha_original' in df.columns:
-                df = df.drop('linha_original', axis=1)
-                
-            caminho_csv = os.path.join(pasta_saida, f"{nome_base}_processado.csv")
-            df.to_csv(caminho_csv, index=False, sep=';')
-            print(f"  CSV exportado: {os.path.basename(caminho_csv)}")
-            
-            # Exportar para Excel se solicitado
-            if exportar_excel:
-                caminho_excel = os.path.join(pasta_saida, f"{nome_base}_processado.xlsx")
-                sucesso, mensagem = processador.exportar_para_excel(caminho_excel)
-                if sucesso:
-                    print(f"  Excel exportado: {os.path.basename(caminho_excel)}")
-                else:
-                    print(f"  Erro ao exportar Excel: {mensagem}")
-            
-            # Gerar arquivo CNAB de retorno se solicitado
-            if gerar_cnab:
-                caminho_cnab = os.path.join(pasta_saida, f"{nome_base}_retorno.TXT")
-                sucesso, mensagem = processador.gerar_cnab_retorno(caminho_cnab)
-                if sucesso:
-                    print(f"  CNAB de retorno gerado: {os.path.basename(caminho_cnab)}")
-                else:
-                    print(f"  Erro ao gerar CNAB: {mensagem}")
-            
-            # Adicionar ao DataFrame consolidado
-            df['arquivo_origem'] = nome_arquivo
-            df_consolidado = pd.concat([df_consolidado, df], ignore_index=True)
-        else:
-            print(f"  Erro ao processar o arquivo.")
-    
-    # Salvar resultados consolidados
-    if not df_consolidado.empty:
-        # Exportar CSV consolidado
-        caminho_consolidado = os.path.join(pasta_saida, f"consolidado_{timestamp}.csv")
-        df_consolidado.to_csv(caminho_consolidado, index=False, sep=';')
-        
-        # Exportar Excel consolidado se solicitado
-        if exportar_excel:
-            caminho_excel_consolidado = os.path.join(pasta_saida, f"consolidado_{timestamp}.xlsx")
-            
-            # Criar o escritor Excel
-            writer = pd.ExcelWriter(caminho_excel_consolidado, engine='openpyxl')
-            
-            # Exportar dados detalhados
-            df_consolidado.to_excel(writer, sheet_name='Detalhes', index=False)
-            
-            # Criar resumo por arquivo
-            resumo_por_arquivo = df_consolidado.groupby('arquivo_origem').agg(
-                qtd_titulos=('nosso_numero', 'count'),
-                valor_total=('valor_principal', 'sum')
-            ).reset_index()
-            
-            resumo_por_arquivo.to_excel(writer, sheet_name='Resumo_por_Arquivo', index=False)
-            
-            # Criar resumo geral
-            dados_resumo = {
-                'Informação': [
-                    'Total de Arquivos Processados',
-                    'Total de Títulos',
-                    'Valor Total',
-                    'Data de Processamento'
-                ],
-                'Valor': [
-                    arquivos_processados,
-                    total_titulos,
-                    f"R$ {valor_total:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.'),
-                    datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-                ]
-            }
-            
-            pd.DataFrame(dados_resumo).to_excel(writer, sheet_name='Resumo_Geral', index=False)
-            
-            # Salvar o arquivo Excel
-            writer.close()
-            print(f"\nExcel consolidado gerado: {os.path.basename(caminho_excel_consolidado)}")
+    # Pasta de saída: a mesma a cada execução, para retomar pelo manifesto
+    resumo = executar_lote(arquivos, os.path.join(pasta, "processados"), exportar_excel, gerar_cnab,
+                           processos, reprocessar)
     
     # Exibir resumo do processamento
     print("\n" + "=" * 70)
     print("RESUMO DO PROCESSAMENTO")
     print("=" * 70)
-    print(f"Total de arquivos encontrados: {total_arquivos}")
-    print(f"Arquivos processados com sucesso: {arquivos_processados}")
-    print(f"Total de títulos processados: {total_titulos}")
-    print(f"Valor total dos títulos: R$ {valor_total:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.'))
-    print(f"\nArquivos gerados na pasta: {pasta_saida}")
+    print(f"Total de arquivos encontrados: {resumo['arquivos_encontrados']}")
+    print(f"Arquivos processados com sucesso: {resumo['arquivos_processados']}")
+    print(f"Total de títulos processados: {resumo['total_titulos']}")
+    print(f"Valor total dos títulos: {resumo['valor_total']}")
+    print(f"\nArquivos gerados na pasta: {resumo['pasta_saida']}")
     print("=" * 70)
 
-def main():
-    print("=" * 60)
-    print("PROCESSADOR EM LOTE DE ARQUIVOS CNAB 400 - BRADESCO")
-    print("=" * 60)
+def main(argv=None):
+    """
+    Linha de comando do lote, para execução agendada (sem nenhuma pergunta).
     
-    if len(sys.argv) > 1:
-        diretorio = sys.argv[1]
-    else:
-        diretorio = input("Digite o caminho do diretório com os arquivos CNAB: ")
-        
-    if not os.path.isdir(diretorio):
-        print(f"Diretório não encontrado: {diretorio}")
-        return
+    O progresso vai para stderr e o resumo em JSON (executar_lote) para stdout.
+    Códigos de saída: 0 se todos os arquivos foram processados, 1 se algum
+    falhou, 2 se nenhum arquivo foi encontrado, se dois arquivos têm o mesmo
+    nome (nomes_repetidos) ou com argumentos inválidos, e 3 em caso de erro
+    inesperado. Sem argumentos, o lote é interativo (processar_lote).
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        processar_lote()
+        return 0
+    
+    parser = argparse.ArgumentParser(description='Processa em lote arquivos CNAB 400 - Bradesco')
+    parser.add_argument('entradas', nargs='+', help='Pastas, padrões glob ou arquivos')
+    parser.add_argument('-p', '--padrao', default=PADRAO_ARQUIVOS,
+                        help=f'Padrão dos arquivos nas pastas, sem diferenciar maiúsculas (padrão: {PADRAO_ARQUIVOS})')
+    parser.add_argument('-o', '--saida', help='Pasta das saídas (padrão: PASTA/processados)')
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=['csv'],
+                        help='Saídas geradas (padrão: csv; o CSV é sempre gerado)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Arquivos processados ao mesmo tempo (padrão: núcleos da máquina)')
+    parser.add_argument('--reprocessar', action='store_true',
+                        help='Ignora o manifesto e processa todos os arquivos de novo')
+    parser.add_argument('--cache', action='store_true',
+                        help='Usa o cache em disco das leituras (guarda dados dos retornos; ver cnab_cache.py)')
+    parser.add_argument('-q', '--silencioso', action='store_true', help='Não exibe o progresso em stderr')
+    args = parser.parse_args(argv)
+    
+    if args.jobs < 1:
+        parser.error('--jobs deve ser pelo menos 1')
+    
+    arquivos = listar_arquivos(args.entradas, args.padrao)
+    if not arquivos:
+        print(f"Nenhum arquivo encontrado em: {', '.join(args.entradas)} (padrão: {args.padrao})", file=sys.stderr)
+        return 2
+    repetidos = nomes_repetidos(arquivos)
+    if repetidos:
+        print(mensagem_nomes_repetidos(repetidos), file=sys.stderr)
+        return 2
+    
+    pasta_saida = args.saida or os.path.join(
+        args.entradas[0] if os.path.isdir(args.entradas[0]) else os.path.dirname(arquivos[0]), "processados")
+    exibir = None if args.silencioso else (lambda *partes: print(*partes, file=sys.stderr))
+    
+    try:
+        resumo = executar_lote(arquivos, pasta_saida, 'xlsx' in args.formatos, 'retorno' in args.formatos,
+                               args.jobs, args.reprocessar, exibir, args.cache)
+    except Exception as e:
+        print(f"Erro no processamento do lote: {e}", file=sys.stderr)
+        return 3
     
-    padrao = input("Digite o padrão dos arquivos (padrão: *.TXT): ") or "*.TXT"
-    processar_lote()
+    json.dump(resumo, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 1 if resumo['arquivos_com_erro'] else 0
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    multiprocessing.freeze_support()
+    sys.exit(main())
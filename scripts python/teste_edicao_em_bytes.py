@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de teste de regressão da edição em bytes
+
+Confere, para arquivos com quebras LF e CRLF, sem quebra no fim, com linhas
+curtas e com caracteres acentuados (latin-1 e UTF-8), que:
+- o zeramento de juros pontual (cnab_pontual.py), a reescrita em uma passagem
+  (cnab_transformacao.py) e gerar_cnab_retorno() geram exatamente os mesmos
+  bytes que a edição linha a linha;
+- verificar_edicao() aceita o arquivo gerado e aponta um byte alterado fora
+  das posições permitidas.
+
+Os arquivos de teste são criados em uma pasta temporária. O código de saída é
+0 se todas as conferências passaram e 1 caso contrário.
+"""
+
+import sys
+import os
+import tempfile
+
+# Adicionar o diretório pai ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cnab_bradesco import CNABBradesco
+from cnab_pontual import zerar_juros_no_local, zerar_juros_em_bytes
+from cnab_transformacao import transformar_arquivo, ZerarJuros, TerminadorFixo, POSICAO_JUROS
+from cnab_verificacao import verificar_edicao
+
+# Posição (0-based) alterada de propósito: coluna 101, fora dos campos editáveis
+POSICAO_ADULTERADA = 100
+
+
+def registro(tipo, sequencial, seu_numero=b'', juros=0):
+    """Linha de 400 bytes (sem quebra) com os campos usados no teste"""
+    linha = bytearray(b' ' * 400)
+    linha[0:1] = tipo
+    if tipo == b'1':
+        linha[70:82] = str(100000 + sequencial).zfill(12).encode('ascii')
+        linha[116:126] = seu_numero.ljust(10)[:10]
+        linha[152:165] = str(1000 * sequencial).zfill(13).encode('ascii')
+        linha[266:279] = str(juros).zfill(13).encode('ascii')
+    linha[394:400] = str(sequencial).zfill(6).encode('ascii')
+    return bytes(linha)
+
+
+def montar_arquivo(quebra=b'\n', quebra_final=True, com_trailer=True, curta=False, seu_numero=b'TITULO'):
+    """Conteúdo de um retorno com header, 5 detalhes com juros e (opcionalmente) trailer"""
+    linhas = [registro(b'0', 1)]
+    linhas += [registro(b'1', i, seu_numero, juros=123 * i) for i in range(2, 7)]
+    if com_trailer:
+        linhas.append(registro(b'9', 7))
+    if curta:
+        linhas[3] = linhas[3][:300]  # Detalhe com os espaços finais removidos
+    conteudo = quebra.join(linhas)
+    return conteudo + quebra if quebra_final else conteudo
+
+
+def zerar_linha_a_linha(conteudo):
+    """Referência: cada detalhe completado até 400 posições, juros zerados e quebra LF"""
+    inicio, fim = POSICAO_JUROS
+    saida = []
+    for linha in conteudo.splitlines(keepends=True):
+        if linha[:1] != b'1':
+            saida.append(linha)
+            continue
+        dados = bytearray(linha.rstrip(b'\r\n').ljust(400))
+        dados[inicio:fim] = b'0' * (fim - inicio)
+        saida.append(bytes(dados) + b'\n')
+    return b''.join(saida)
+
+
+CASOS = {
+    'LF': montar_arquivo(),
+    'CRLF': montar_arquivo(quebra=b'\r\n'),
+    'Sem quebra no fim (trailer)': montar_arquivo(quebra_final=False),
+    'Sem quebra no fim (detalhe)': montar_arquivo(quebra_final=False, com_trailer=False),
+    'Linha curta': montar_arquivo(curta=True),
+    'Latin-1': montar_arquivo(seu_numero='JOSÉ'.encode('latin-1')),
+    'UTF-8 (registro com mais de 400 bytes)': montar_arquivo(seu_numero='JOSÉ ÇÃO'.encode('utf-8')),
+    'Vazio': b'',
+}
+
+
+def conferir(nome, conteudo, pasta):
+    """Executa as conferências de um caso; retorna a lista de falhas"""
+    falhas = []
+    origem = os.path.join(pasta, 'origem.TXT')
+    with open(origem, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    esperado = zerar_linha_a_linha(conteudo)
+
+    def ler(caminho):
+        with open(caminho, 'rb') as arquivo:
+            return arquivo.read()
+
+    # Reescrita em uma passagem
+    reescrito = os.path.join(pasta, 'reescrito.TXT')
+    transformar_arquivo(origem, reescrito, [ZerarJuros(), TerminadorFixo(b'\n')])
+    if ler(reescrito) != esperado:
+        falhas.append("transformar_arquivo difere da edição linha a linha")
+
+    # Edição pontual (cópia ou bytes já lidos): None quando o arquivo precisa ser reescrito
+    pontual = os.path.join(pasta, 'pontual.TXT')
+    registros = zerar_juros_no_local(origem, pontual)
+    if registros is not None and ler(pontual) != esperado:
+        falhas.append("zerar_juros_no_local difere da edição linha a linha")
+    resultado = zerar_juros_em_bytes(conteudo)
+    if (resultado is None) != (registros is None):
+        falhas.append("zerar_juros_em_bytes e zerar_juros_no_local escolheram caminhos diferentes")
+    elif resultado is not None and bytes(resultado[0]) != esperado:
+        falhas.append("zerar_juros_em_bytes difere da edição linha a linha")
+    modo = 'reescrita' if registros is None else 'pontual'
+
+    # Caminho completo usado pela interface e pelo lote
+    gerado = os.path.join(pasta, 'gerado.TXT')
+    sucesso, mensagem = CNABBradesco(origem).gerar_cnab_retorno(gerado)
+    if not sucesso:
+        falhas.append(f"gerar_cnab_retorno falhou: {mensagem}")
+        return modo, falhas
+    if ler(gerado) != esperado:
+        falhas.append("gerar_cnab_retorno difere da edição linha a linha")
+
+    # Verificação: nenhum byte alterado fora das posições permitidas (a troca de CRLF por LF
+    # nos detalhes é relatada como problema de estrutura); um byte adulterado é apontado
+    verificacao = verificar_edicao(origem, gerado)
+    quebras_trocadas = b'\r\n' in conteudo
+    problemas_esperados = all(problema.startswith("Quebra de linha") for problema in verificacao.problemas)
+    if (verificacao.linhas_divergentes or not problemas_esperados
+            or bool(verificacao.problemas) != quebras_trocadas):
+        falhas.append(f"verificar_edicao rejeitou o arquivo gerado: {verificacao.mensagem()}")
+    if conteudo:
+        adulterado = bytearray(ler(gerado))
+        posicao = len(adulterado.split(b'\n', 1)[0]) + 1 + POSICAO_ADULTERADA  # Primeiro detalhe
+        adulterado[posicao:posicao + 1] = b'X'
+        verificacao = verificar_edicao(origem, bytes(adulterado))
+        divergencias = [(d['linha'], d['inicio']) for d in verificacao.divergencias]
+        if verificacao.ok or divergencias != [(2, POSICAO_ADULTERADA + 1)]:
+            falhas.append(f"verificar_edicao não apontou o byte alterado na linha 2, "
+                          f"posição {POSICAO_ADULTERADA + 1}: {divergencias}")
+    return modo, falhas
+
+
+def main():
+    print("=" * 80)
+    print("TESTE DE REGRESSÃO - EDIÇÃO EM BYTES E VERIFICAÇÃO")
+    print("=" * 80)
+
+    total_falhas = 0
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, conteudo in CASOS.items():
+            modo, falhas = conferir(nome, conteudo, pasta)
+            if falhas:
+                print(f"❌ {nome} ({modo})")
+                for falha in falhas:
+                    print(f"   • {falha}")
+            else:
+                print(f"✅ {nome} ({modo})")
+            total_falhas += len(falhas)
+
+    print("=" * 80)
+    if total_falhas:
+        print(f"❌ {total_falhas} conferência(s) falharam")
+        return 1
+    print(f"✅ Todos os {len(CASOS)} casos conferidos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de teste de regressão do trailer em excel_para_cnab com arquivo de referência
+
+Os totais gravados pelo banco no trailer nem sempre batem com a soma dos
+detalhes. Convertendo de volta o Excel exportado, sem nenhuma alteração, o
+trailer era recalculado e os totais (posições 18-83) mudavam. Este script
+confere que:
+- sem alterações, o arquivo gerado é idêntico à referência, trailer incluído;
+- com um valor alterado, só o total de cobrança simples muda no trailer;
+- com uma linha removida, mudam a quantidade, o valor e o sequencial.
+
+Os arquivos de teste são criados em uma pasta temporária. O código de saída é
+0 se todas as conferências passaram e 1 caso contrário.
+"""
+
+import sys
+import os
+import tempfile
+
+import pandas as pd
+
+# Adicionar o diretório pai ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cnab_bradesco import CNABBradesco
+from cnab_montagem import POSICOES_TRAILER
+
+# Totais do banco diferentes da soma dos detalhes (cobrança simples)
+QTD_BANCO = '00099999'
+VALOR_BANCO = '00000012345678'
+
+
+def registro(tipo, sequencial):
+    """Linha de 400 caracteres (sem quebra) com carteira 09 e valor do título nos detalhes"""
+    linha = [' '] * 400
+    linha[0] = tipo
+    if tipo == '0':
+        linha[1:9] = list('2RETORNO')
+    elif tipo == '1':
+        linha[70:82] = list(str(sequencial).zfill(12))
+        linha[107:109] = list('09')
+        linha[152:165] = list(str(1000 * sequencial).zfill(13))
+    elif tipo == '9':
+        for nome, texto in (('qtd_titulos_simples', QTD_BANCO), ('valor_total_simples', VALOR_BANCO)):
+            inicio, fim = POSICOES_TRAILER[nome]
+            linha[inicio:fim] = list(texto)
+    linha[394:400] = list(str(sequencial).zfill(6))
+    return ''.join(linha)
+
+
+def trailer(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return [linha for linha in arquivo.read().split(b'\n') if linha[:1] == b'9'][0]
+
+
+def posicoes_diferentes(a, b):
+    """Posições (1-based) em que os dois registros diferem"""
+    return [posicao + 1 for posicao in range(max(len(a), len(b))) if a[posicao:posicao + 1] != b[posicao:posicao + 1]]
+
+
+def faixa(*nomes):
+    return sorted(posicao + 1 for nome in nomes for posicao in range(*POSICOES_TRAILER[nome]))
+
+
+def main():
+    print("=" * 80)
+    print("TESTE DE REGRESSÃO - TRAILER DA REFERÊNCIA EM EXCEL → CNAB")
+    print("=" * 80)
+
+    falhas = []
+    with tempfile.TemporaryDirectory() as pasta:
+        referencia = os.path.join(pasta, 'referencia.TXT')
+        linhas = [registro('0', 1)] + [registro('1', i) for i in range(2, 12)] + [registro('9', 12)]
+        with open(referencia, 'w', encoding='ascii', newline='') as arquivo:
+            arquivo.write('\n'.join(linhas) + '\n')
+        excel = os.path.join(pasta, 'referencia.xlsx')
+        processador = CNABBradesco(referencia)
+        processador.ler_arquivo()
+        processador.exportar_para_excel(excel)
+        df = pd.read_excel(excel)
+
+        def converter(nome, tabela):
+            caminho_excel = os.path.join(pasta, f'{nome}.xlsx')
+            caminho_cnab = os.path.join(pasta, f'{nome}.TXT')
+            tabela.to_excel(caminho_excel, index=False)
+            sucesso, mensagem = CNABBradesco(referencia).excel_para_cnab(caminho_excel, caminho_cnab, referencia)
+            if not sucesso:
+                falhas.append(f"{nome}: {mensagem}")
+                return None
+            return caminho_cnab
+
+        casos = []
+        alterado = df.copy()
+        alterado.loc[0, 'valor_titulo'] = alterado.loc[0, 'valor_titulo'] + 1
+        casos.append(('sem_alteracao', df, []))
+        casos.append(('valor_alterado', alterado, faixa('valor_total_simples')))
+        casos.append(('linha_removida', df.iloc[1:],
+                      faixa('qtd_titulos_simples', 'valor_total_simples', 'sequencial')))
+
+        for nome, tabela, esperadas in casos:
+            gerado = converter(nome, tabela)
+            if gerado is None:
+                continue
+            diferentes = posicoes_diferentes(trailer(referencia), trailer(gerado))
+            # Posições dentro dos campos esperados; com zeros à esquerda nem todas mudam
+            if not esperadas and diferentes:
+                falhas.append(f"{nome}: trailer alterado nas posições {diferentes}")
+            elif esperadas and not diferentes:
+                falhas.append(f"{nome}: trailer não foi atualizado")
+            elif not set(diferentes) <= set(esperadas):
+                falhas.append(f"{nome}: posições {sorted(set(diferentes) - set(esperadas))} do trailer "
+                              f"alteradas fora de {esperadas[0]}-{esperadas[-1]}")
+            if nome == 'sem_alteracao':
+                with open(referencia, 'rb') as a, open(gerado, 'rb') as b:
+                    if a.read() != b.read():
+                        falhas.append("sem_alteracao: arquivo gerado difere da referência")
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    print("=" * 80)
+    if falhas:
+        print(f"❌ {len(falhas)} conferência(s) falharam")
+        return 1
+    print("✅ Trailer da referência preservado; só os totais afetados recalculados")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de teste de regressão da leitura de arquivos com caracteres acentuados
+
+Em UTF-8, um nome como 'JOÃO DA SILVA' ocupa mais bytes do que caracteres, e
+recortar os campos pelas posições em bytes desloca todos os campos seguintes.
+Este script confere que a leitura linha a linha (ler_arquivo), a leitura
+colunar (dataframe_detalhes, com e sem linha_original) e a leitura colunar em
+paralelo dão os mesmos detalhes, header e trailer que decodificar cada linha
+como texto e recortar os campos pelos caracteres.
+
+Os arquivos de teste são criados em uma pasta temporária. O código de saída é
+0 se todas as conferências passaram e 1 caso contrário.
+"""
+
+import sys
+import os
+import tempfile
+
+# Adicionar o diretório pai ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cnab_paralelo
+from cnab_bradesco import CNABBradesco
+from cnab_layout import decodificar_header, decodificar_detalhe, decodificar_trailer
+
+NOMES = ['JOÃO DA SILVA', 'MARIA', 'JOSÉ ÇÃO ÜBER', 'ANA']
+
+
+def registro(tipo, sequencial, nome=''):
+    """Linha de 400 caracteres (sem quebra) com nome do sacado (38-70) e campos numéricos"""
+    linha = [' '] * 400
+    linha[0] = tipo
+    if tipo == '0':
+        linha[46:76] = list('EMPRESA ÁGIL LTDA'.ljust(30))
+    elif tipo == '1':
+        for inicio, fim, valor in ((37, 70, nome.ljust(33)),
+                                   (70, 82, str(sequencial).zfill(12)),
+                                   (146, 152, '311224'),
+                                   (152, 165, str(12345 * sequencial).zfill(13)),
+                                   (266, 279, str(77 * sequencial).zfill(13)),
+                                   (295, 301, '150124')):
+            linha[inicio:fim] = list(valor)
+    elif tipo == '9':
+        linha[17:25] = list('00000004')
+    linha[394:400] = list(str(sequencial).zfill(6))
+    return ''.join(linha)
+
+
+def montar_arquivo(caminho, codificacao, quebra='\n', repeticoes=1):
+    """Grava header, detalhes (NOMES, 'repeticoes' vezes) e trailer na codificação informada"""
+    nomes = NOMES * repeticoes
+    linhas = [registro('0', 1)]
+    linhas += [registro('1', i + 2, nome) for i, nome in enumerate(nomes)]
+    linhas.append(registro('9', len(nomes) + 2))
+    with open(caminho, 'w', encoding=codificacao, newline='') as arquivo:
+        arquivo.write(quebra.join(linhas) + quebra)
+
+
+def ler_como_texto(caminho, codificacao):
+    """Referência: cada linha decodificada como texto e os campos recortados pelos caracteres"""
+    header, detalhes, trailer = None, [], None
+    with open(caminho, encoding=codificacao, newline='') as arquivo:
+        for linha in arquivo.read().splitlines():
+            linha = linha.strip()
+            if linha.startswith('0'):
+                header = decodificar_header(linha)
+            elif linha.startswith('1'):
+                detalhes.append(decodificar_detalhe(linha))
+            elif linha.startswith('9'):
+                trailer = decodificar_trailer(linha)
+    return header, detalhes, trailer
+
+
+def comparar_detalhes(nome, esperados, obtidos, campos):
+    """Falhas de 'obtidos' (lista de dicionários) em relação aos esperados, campo a campo"""
+    if len(obtidos) != len(esperados):
+        return [f"{nome}: {len(obtidos)} detalhe(s), esperados {len(esperados)}"]
+    falhas = []
+    for indice, (esperado, obtido) in enumerate(zip(esperados, obtidos)):
+        for campo in campos:
+            if str(obtido.get(campo)) != str(esperado[campo]):
+                falhas.append(f"{nome}: detalhe {indice + 1}, {campo} = {obtido.get(campo)!r}, "
+                              f"esperado {esperado[campo]!r}")
+    return falhas
+
+
+def conferir(caminho, codificacao):
+    """Executa as conferências de um arquivo; retorna a lista de falhas"""
+    header, esperados, trailer = ler_como_texto(caminho, codificacao)
+    campos = [campo for campo in esperados[0] if campo != 'linha_original']
+    falhas = []
+
+    processador = CNABBradesco(caminho)
+    if not processador.ler_arquivo():
+        return ["ler_arquivo falhou"]
+    falhas += comparar_detalhes("ler_arquivo", esperados, [dict(d) for d in processador.detalhes],
+                                campos + ['linha_original'])
+    if processador.header != header or processador.trailer != trailer:
+        falhas.append("ler_arquivo: header ou trailer diferente")
+
+    for incluir_linha_original in (True, False):
+        processador = CNABBradesco(caminho)
+        df = processador.dataframe_detalhes(incluir_linha_original=incluir_linha_original)
+        nome = f"dataframe_detalhes(incluir_linha_original={incluir_linha_original})"
+        falhas += comparar_detalhes(nome, esperados, df.to_dict('records'),
+                                    campos + (['linha_original'] if incluir_linha_original else []))
+        if processador.header != header or processador.trailer != trailer:
+            falhas.append(f"{nome}: header ou trailer diferente")
+
+    # Leitura em paralelo: faixas pequenas para que o arquivo seja dividido
+    tamanho_faixa = cnab_paralelo.TAMANHO_MINIMO_FAIXA
+    cnab_paralelo.TAMANHO_MINIMO_FAIXA = 4096
+    try:
+        processador = CNABBradesco(caminho)
+        if not processador.ler_arquivo_paralelo(processos=2):
+            falhas.append("ler_arquivo_paralelo falhou")
+        else:
+            falhas += comparar_detalhes("ler_arquivo_paralelo", esperados,
+                                        processador.df_detalhes.to_dict('records'), campos)
+    finally:
+        cnab_paralelo.TAMANHO_MINIMO_FAIXA = tamanho_faixa
+    return falhas
+
+
+CASOS = {
+    'UTF-8 (LF)': ('utf-8', '\n'),
+    'UTF-8 (CRLF)': ('utf-8', '\r\n'),
+    'Latin-1': ('latin-1', '\n'),
+}
+
+
+def main():
+    print("=" * 80)
+    print("TESTE DE REGRESSÃO - LEITURA COM CARACTERES ACENTUADOS")
+    print("=" * 80)
+
+    total_falhas = 0
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, (codificacao, quebra) in CASOS.items():
+            caminho = os.path.join(pasta, 'retorno.TXT')
+            montar_arquivo(caminho, codificacao, quebra, repeticoes=10)
+            falhas = conferir(caminho, codificacao)
+            if falhas:
+                print(f"❌ {nome}")
+                for falha in falhas[:10]:
+                    print(f"   • {falha}")
+            else:
+                print(f"✅ {nome}")
+            total_falhas += len(falhas)
+
+    print("=" * 80)
+    if total_falhas:
+        print(f"❌ {total_falhas} conferência(s) falharam")
+        return 1
+    print(f"✅ Todos os {len(CASOS)} casos conferidos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
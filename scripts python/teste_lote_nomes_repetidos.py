@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de teste de regressão: arquivos com o mesmo nome em entradas diferentes
+
+As saídas do lote ({nome_base}_processado.csv...) e o manifesto usam o nome de
+cada arquivo. Com a/RET.TXT e b/RET.TXT no mesmo lote, as saídas de um
+sobrescreviam as do outro e os totais ficavam errados; no zeramento de juros em
+lote, os dois gravavam ao mesmo tempo o mesmo RET_retorno.TXT. Este script
+confere que:
+- as linhas de comando (processar_lote.py e zerar_juros_lote.py) recusam o lote
+  (código 2) sem gravar nenhuma saída;
+- executar_lote() e zerar_juros_lote() geram ValueError;
+- cada arquivo processado sozinho continua com os próprios totais.
+
+Os arquivos de teste são criados em uma pasta temporária. O código de saída é
+0 se todas as conferências passaram e 1 caso contrário.
+"""
+
+import sys
+import os
+import io
+import contextlib
+import tempfile
+
+# Adicionar o diretório pai ao path para importar os módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import processar_lote
+import zerar_juros_lote
+
+
+def registro(tipo, sequencial, valor=0):
+    """Linha de 400 caracteres (sem quebra) com o valor do título (153-165) nos detalhes"""
+    linha = [' '] * 400
+    linha[0] = tipo
+    if tipo == '1':
+        linha[70:82] = list(str(sequencial).zfill(12))
+        linha[152:165] = list(str(valor).zfill(13))
+    linha[394:400] = list(str(sequencial).zfill(6))
+    return ''.join(linha)
+
+
+def gravar_retorno(caminho, valores):
+    """Retorno com um detalhe para cada valor (em centavos)"""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    linhas = [registro('0', 1)]
+    linhas += [registro('1', i + 2, valor) for i, valor in enumerate(valores)]
+    linhas.append(registro('9', len(valores) + 2))
+    with open(caminho, 'w', encoding='ascii', newline='') as arquivo:
+        arquivo.write('\n'.join(linhas) + '\n')
+
+
+def executar_main(argv, modulo=processar_lote):
+    """Código de saída e stderr de modulo.main"""
+    erros = io.StringIO()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(erros):
+        codigo = modulo.main(argv)
+    return codigo, erros.getvalue()
+
+
+def main():
+    print("=" * 80)
+    print("TESTE DE REGRESSÃO - LOTE COM ARQUIVOS DE MESMO NOME")
+    print("=" * 80)
+
+    falhas = []
+    with tempfile.TemporaryDirectory() as pasta:
+        entrada_a = os.path.join(pasta, 'a', 'RET.TXT')
+        entrada_b = os.path.join(pasta, 'b', 'RET.TXT')
+        gravar_retorno(entrada_a, [100])
+        gravar_retorno(entrada_b, [300, 477])
+        saida = os.path.join(pasta, 'saida')
+
+        # Linha de comando: recusado antes de gravar qualquer saída
+        codigo, erros = executar_main([os.path.dirname(entrada_a), os.path.dirname(entrada_b),
+                                       '-o', saida, '-j', '1', '-q'])
+        if codigo != 2 or entrada_a not in erros or entrada_b not in erros:
+            falhas.append(f"main: código {codigo} (esperado 2), mensagem: {erros.strip()!r}")
+        if os.path.exists(saida) and os.listdir(saida):
+            falhas.append(f"main: saídas gravadas mesmo com o lote recusado: {os.listdir(saida)}")
+
+        # Padrão glob que encontra os dois arquivos
+        codigo, _ = executar_main([os.path.join(pasta, '*', 'RET.TXT'), '-o', saida, '-j', '1', '-q'])
+        if codigo != 2:
+            falhas.append(f"main com padrão glob: código {codigo} (esperado 2)")
+
+        # Função do lote
+        try:
+            processar_lote.executar_lote([entrada_a, entrada_b], saida, processos=1, exibir=None)
+            falhas.append("executar_lote: arquivos de mesmo nome aceitos")
+        except ValueError:
+            pass
+
+        # Zeramento de juros: os dois gravariam o mesmo RET_retorno.TXT
+        codigo, erros = executar_main([os.path.dirname(entrada_a), os.path.dirname(entrada_b),
+                                       '-o', saida, '-j', '2'], zerar_juros_lote)
+        if codigo != 2 or entrada_a not in erros or entrada_b not in erros:
+            falhas.append(f"zerar_juros_lote.main: código {codigo} (esperado 2), mensagem: {erros.strip()!r}")
+        if os.path.exists(saida) and os.listdir(saida):
+            falhas.append(f"zerar_juros_lote.main: retornos gravados mesmo com o lote recusado: {os.listdir(saida)}")
+        try:
+            zerar_juros_lote.zerar_juros_lote([entrada_a, entrada_b], saida, jobs=2)
+            falhas.append("zerar_juros_lote: arquivos de mesmo nome aceitos")
+        except ValueError:
+            pass
+
+        # Cada arquivo sozinho, em pastas de saída próprias: os próprios totais
+        for entrada, esperado in ((entrada_a, 100), (entrada_b, 777)):
+            resumo = processar_lote.executar_lote([entrada], saida + os.path.basename(os.path.dirname(entrada)),
+                                                  processos=1, exibir=None)
+            if resumo['valor_total_centavos'] != esperado:
+                falhas.append(f"{entrada}: total {resumo['valor_total_centavos']}, esperado {esperado}")
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    print("=" * 80)
+    if falhas:
+        print(f"❌ {len(falhas)} conferência(s) falharam")
+        return 1
+    print("✅ Arquivos de mesmo nome recusados; arquivos isolados com os próprios totais")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
